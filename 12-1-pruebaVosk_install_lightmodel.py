@@ -7,11 +7,8 @@ Este script graba audio del micrófono y lo convierte a texto localmente usando
 
 import os
 import sys
-import json
-import wave
 import subprocess
 import time
-import signal
 import logging
 
 # Configurar logging
@@ -29,6 +26,9 @@ AUDIO_FILE = "/tmp/recording.wav"
 # Duración de la grabación en segundos (0 para grabar hasta detener manualmente)
 RECORD_DURATION = 0
 
+# Guardar también la grabación en AUDIO_FILE (se escribe en segundo plano)
+SAVE_RECORDING = True
+
 def check_and_install_vosk():
     """Verifica si Vosk está instalado y lo instala si es necesario"""
     try:
@@ -117,12 +117,48 @@ def record_audio(duration=0):
         logger.error(f"Error al grabar audio: {e}")
         return None
 
+def record_and_recognize(duration=0):
+    """Graba con arecord y reconoce en streaming.
+    
+    El audio se pasa al reconocedor a medida que llega por la tubería, así que
+    el texto está listo casi en cuanto termina la grabación.
+    
+    Args:
+        duration: Duración en segundos (0 para grabar hasta Ctrl+C)
+    
+    Returns:
+        Texto reconocido o None si hay error
+    """
+    logger.info(f"Iniciando grabación y reconocimiento {'hasta Ctrl+C' if duration == 0 else f'por {duration} segundos'}...")
+    
+    try:
+        from grabacion_stream import grabar_y_reconocer
+        
+        if duration == 0:
+            print("Grabando... Presiona Ctrl+C para detener.")
+        resultado = grabar_y_reconocer(MODEL_PATH, duration, AUDIO_FILE if SAVE_RECORDING else None)
+        
+        logger.info(f"Audio de {resultado['duracion_audio']:.1f} segundos; texto listo "
+                    f"{resultado['tiempo_tras_detener']:.2f} segundos después de detener la grabación")
+        if SAVE_RECORDING:
+            logger.info(f"Audio guardándose en segundo plano en {AUDIO_FILE}")
+        logger.info(f"Texto reconocido: '{resultado['texto']}'")
+        
+        return resultado["texto"]
+    except KeyboardInterrupt:
+        # Ctrl+C antes de empezar a grabar (p. ej. mientras se carga el modelo)
+        logger.info("Grabación cancelada antes de empezar")
+        return None
+    except Exception as e:
+        logger.error(f"Error al grabar o reconocer: {e}")
+        return None
+
 def recognize_with_vosk(audio_file):
     """Reconoce texto desde un archivo de audio usando Vosk"""
     logger.info(f"Procesando audio con Vosk: {audio_file}")
     
     try:
-        from vosk import Model, KaldiRecognizer
+        from servidor_vosk import transcribir
         
         # Verificar que el modelo existe
         if not os.path.exists(MODEL_PATH) or not os.path.isdir(MODEL_PATH):
@@ -131,52 +167,17 @@ def recognize_with_vosk(audio_file):
             logger.info(f"Contenido del directorio actual: {os.listdir(os.getcwd())}")
             return None
         
-        # Listar contenido del directorio del modelo para depuración
-        logger.info(f"Contenido del directorio del modelo: {os.listdir(MODEL_PATH)}")
-        
-        # Cargar el modelo
-        logger.info(f"Cargando modelo desde {MODEL_PATH}")
-        model = Model(MODEL_PATH)
-        
-        # Abrir el archivo de audio
-        wf = wave.open(audio_file, "rb")
-        
-        # Verificar formato (debe ser mono 16kHz 16-bit para Vosk)
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-            logger.error("El formato de audio no es compatible con Vosk")
-            logger.info(f"Canales: {wf.getnchannels()}, Ancho: {wf.getsampwidth()}, Compresión: {wf.getcomptype()}")
-            return None
-        
-        # Crear reconocedor
-        recognizer = KaldiRecognizer(model, wf.getframerate())
-        recognizer.SetWords(True)  # Para obtener marcas de tiempo por palabra
-        
-        # Procesar el audio en fragmentos
-        results = []
-        chunk_size = 4000  # Tamaño del fragmento en bytes
-        
+        # Transcribir con el servidor Vosk (el modelo ya está cargado allí);
+        # si el servidor no está activo se carga el modelo localmente
         logger.info("Reconociendo audio...")
         start_time = time.time()
-        
-        data = wf.readframes(chunk_size)
-        while len(data) > 0:
-            if recognizer.AcceptWaveform(data):
-                result = json.loads(recognizer.Result())
-                if "text" in result and result["text"].strip():
-                    results.append(result["text"])
-            data = wf.readframes(chunk_size)
-        
-        # Obtener resultado final
-        final_result = json.loads(recognizer.FinalResult())
-        if "text" in final_result and final_result["text"].strip():
-            results.append(final_result["text"])
-        
+        resultado = transcribir(audio_file, MODEL_PATH)
         end_time = time.time()
         
-        # Unir todos los resultados
-        full_text = " ".join(results)
+        full_text = resultado["texto"]
         
-        logger.info(f"Reconocimiento completado en {end_time - start_time:.2f} segundos")
+        logger.info(f"Reconocimiento completado en {end_time - start_time:.2f} segundos "
+                    f"(decodificación: {resultado['tiempo_decodificacion']:.2f} s)")
         logger.info(f"Texto reconocido: '{full_text}'")
         
         return full_text
@@ -200,17 +201,9 @@ def main():
     
     print(f"Usando modelo en: {MODEL_PATH}")
     
-    # Grabar audio
+    # Grabar y reconocer al mismo tiempo
     print("\nVamos a grabar audio. Habla algo cuando estés listo.")
-    audio_file = record_audio(RECORD_DURATION)
-    
-    if not audio_file:
-        print("No se pudo grabar audio. Saliendo.")
-        return
-    
-    # Reconocer texto
-    print("\nProcesando audio con Vosk...")
-    text = recognize_with_vosk(audio_file)
+    text = record_and_recognize(RECORD_DURATION)
     
     if text:
         print("\n=== Resultado ===")
@@ -7,8 +7,6 @@ Graba audio y lo reconoce usando Vosk
 
 import os
 import sys
-import json
-import wave
 import subprocess
 import time
 
@@ -16,6 +14,9 @@ import time
 MODEL_PATH = os.path.join(os.getcwd(), "vosk-model-small-es-0.42")
 AUDIO_FILE = "/tmp/recording.wav"
 
+# Guardar también la grabación en AUDIO_FILE (se escribe en segundo plano)
+GUARDAR_GRABACION = False
+
 def record_audio():
     """Graba audio hasta que se presione Ctrl+C"""
     print("Iniciando grabación... Habla y presiona Ctrl+C cuando termines.")
@@ -38,59 +39,38 @@ def record_audio():
         print(f"Error al grabar audio: {e}")
         return None
 
+def record_and_recognize():
+    """Graba con arecord y reconoce en streaming: el texto está listo al detener la grabación"""
+    print("Iniciando grabación... Habla y presiona Ctrl+C cuando termines.")
+    
+    try:
+        from grabacion_stream import grabar_y_reconocer
+        
+        resultado = grabar_y_reconocer(MODEL_PATH, guardar_en=AUDIO_FILE if GUARDAR_GRABACION else None)
+        print(f"\nGrabación detenida. Texto listo {resultado['tiempo_tras_detener']:.2f} segundos después")
+        return resultado["texto"]
+    except Exception as e:
+        print(f"Error al grabar o reconocer: {e}")
+        return None
+
 def recognize_speech(audio_file):
     """Reconoce el habla en el archivo de audio usando Vosk"""
     print(f"Procesando audio con Vosk...")
     
     try:
-        from vosk import Model, KaldiRecognizer
-        
-        # Cargar el modelo
-        print(f"Cargando modelo desde {MODEL_PATH}")
-        model = Model(MODEL_PATH)
-        
-        # Abrir el archivo de audio
-        wf = wave.open(audio_file, "rb")
-        
-        # Verificar formato del audio
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-            print("El formato de audio no es compatible")
-            return None
-        
-        # Crear reconocedor
-        recognizer = KaldiRecognizer(model, wf.getframerate())
-        recognizer.SetWords(True)
-        
-        # Procesar el audio
-        results = []
+        from servidor_vosk import transcribir
         
         # Medir tiempo de procesamiento
         start_time = time.time()
         
-        # Procesar todo el archivo
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            
-            if recognizer.AcceptWaveform(data):
-                result = json.loads(recognizer.Result())
-                if "text" in result and result["text"].strip():
-                    results.append(result["text"])
-        
-        # Obtener el resultado final
-        final_result = json.loads(recognizer.FinalResult())
-        if "text" in final_result and final_result["text"].strip():
-            results.append(final_result["text"])
+        # Transcribir con el servidor Vosk (o cargando el modelo localmente si no está activo)
+        resultado = transcribir(audio_file, MODEL_PATH)
         
         # Calcular tiempo total
         elapsed_time = time.time() - start_time
         
-        # Unir todos los resultados
-        full_text = " ".join(results)
-        
         print(f"Reconocimiento completado en {elapsed_time:.2f} segundos")
-        return full_text
+        return resultado["texto"]
     
     except Exception as e:
         print(f"Error en el reconocimiento: {e}")
@@ -105,14 +85,8 @@ def main():
         print("Ejecuta primero el script completo para descargar el modelo")
         return
     
-    # Grabar audio
-    audio_file = record_audio()
-    if not audio_file:
-        print("No se pudo grabar audio")
-        return
-    
-    # Reconocer texto
-    text = recognize_speech(audio_file)
+    # Grabar y reconocer al mismo tiempo
+    text = record_and_recognize()
     
     if text:
         print("\n=== Resultado ===")
@@ -1,88 +1,63 @@
 #!/usr/bin/env python3
-import gpiod
-import time
-from gpiod.line import Direction, Value, Bias, Edge
+import sys
+from hal_gpio import abrir_hal
+from boton_gpio import simular_pulsaciones
 
 # Configuración
 CHIP = "/dev/gpiochip0"  # Ruta completa al chip
 BUTTON_PIN = 23         # Botón en GPIO23
 LED_PIN = 25            # LED en GPIO25
+SIMULADO = "--falso" in sys.argv  # Probar sin hardware (botón y LED simulados)
 
 try:
-    print(f"=== Prueba de Botón GPIO en {CHIP} ===")
+    # Backend de menor latencia disponible (libgpiod 2.x, 1.x, gpiozero o simulado)
+    gpio = abrir_hal("simulado" if SIMULADO else None, CHIP)
+    print(f"=== Prueba de Botón GPIO en {CHIP} ({gpio.nombre}) ===")
     print(f"Botón en pin {BUTTON_PIN}, LED en pin {LED_PIN}")
     print("Presiona el botón para encender el LED")
     print("Presiona Ctrl+C para salir")
-    
-    # Configurar botón como entrada con pull-up
-    button_config = {
-        BUTTON_PIN: gpiod.LineSettings(
-            direction=Direction.INPUT,
-            bias=Bias.PULL_UP,
-            edge_detection=Edge.BOTH
-        )
-    }
-    
-    # Configurar LED como salida
-    led_config = {
-        LED_PIN: gpiod.LineSettings(
-            direction=Direction.OUTPUT,
-            output_value=Value.INACTIVE
-        )
-    }
-    
-    # Solicitar líneas
-    button_request = gpiod.request_lines(
-        CHIP,
-        consumer="Button Test",
-        config=button_config
-    )
-    
-    led_request = gpiod.request_lines(
-        CHIP,
-        consumer="LED Test",
-        config=led_config
-    )
-    
-    print("\nMonitoreando estado del botón...")
-    
-    last_state = None
-    count = 0
-    
-    while True:
-        # Leer estado del botón
-        button_state = button_request.get_value(BUTTON_PIN)
-        
-        # Detectar cambio de estado
-        if button_state != last_state:
-            if button_state == Value.INACTIVE:  # Con pull-up, INACTIVE significa presionado
-                print("Botón PRESIONADO - Encendiendo LED")
-                led_request.set_value(LED_PIN, Value.ACTIVE)  # Encender LED
-            else:
-                print("Botón LIBERADO - Apagando LED")
-                led_request.set_value(LED_PIN, Value.INACTIVE)  # Apagar LED
-            
-            last_state = button_state
-        
-        # Mostrar que seguimos vivos
-        count += 1
-        if count % 10 == 0:
-            print(".", end="", flush=True)
-        
-        # Pequeña pausa
-        time.sleep(0.1)
+
+    # Botón como entrada con pull-up y detección de flancos (sin sondeo: el
+    # proceso duerme hasta que llega un flanco)
+    led = gpio.led(LED_PIN)
+    botones = gpio.boton(BUTTON_PIN)
+
+    def on_event(evento):
+        latencia = evento["latencia"] * 1000
+        if evento["tipo"] == "presionado":
+            print(f"Botón PRESIONADO - Encendiendo LED ({latencia:.2f} ms)")
+            led.encender()
+        elif evento["tipo"] == "liberado":
+            print(f"Botón LIBERADO - Apagando LED (presionado {evento['duracion']:.3f}s)")
+            led.apagar()
+        else:
+            print(f"Pulsación {evento['tipo'].upper()}")
+
+    botones.suscribir(on_event)
+
+    print("\nEsperando eventos del botón...")
+    if SIMULADO:
+        import threading
+        detener = threading.Event()
+
+        def simular():
+            simular_pulsaciones(botones.solicitud, BUTTON_PIN)
+            detener.set()
+        threading.Thread(target=simular, daemon=True).start()
+        botones.botones.ejecutar(detener)
+    else:
+        botones.botones.ejecutar()
 
 except KeyboardInterrupt:
     print("\nPrueba finalizada por el usuario")
 except Exception as e:
     print(f"\nError: {e}")
 finally:
-    # Limpiar recursos
-    if 'led_request' in locals():
-        led_request.set_value(LED_PIN, Value.INACTIVE)  # Apagar LED al salir
-        led_request.release()
-    
-    if 'button_request' in locals():
-        button_request.release()
-    
-    print("Recursos GPIO liberados")
\ No newline at end of file
+    # Limpiar recursos (apaga el LED y libera las líneas)
+    if 'botones' in globals():
+        e = botones.estadisticas()
+        print(f"Flancos: {e['flancos']}, rebotes descartados: {e['rebotes']}, "
+              f"latencia media {e['latencia_media'] * 1000:.2f} ms")
+    if 'gpio' in globals():
+        gpio.cerrar()
+    print("Recursos GPIO liberados")
@@ -3,20 +3,30 @@
 
 """
 Script de prueba para la funcionalidad de reconocimiento de voz (speech-to-text)
-Graba audio y lo convierte a texto utilizando la biblioteca SpeechRecognition.
+Graba audio y lo convierte a texto con el motor disponible más rápido
+(Vosk local o Google con SpeechRecognition, ver reconocedores.py).
+STT_MOTOR=vosk|google fuerza un motor.
 """
 
 import os
 import time
-import speech_recognition as sr
 import subprocess
 
+from reconocedores import EnrutadorSTT, ErrorReconocimiento, MotorVosk, MotorGoogle
+from calibracion_ruido import obtener_perfil
+
+# El ruido ambiental se calibra una vez (ruido.wav o perfil guardado), no en cada archivo
+perfil = obtener_perfil()
+
+# Se crea una vez: conserva las latencias medidas entre grabaciones
+enrutador = EnrutadorSTT([MotorVosk(), MotorGoogle(perfil=perfil)])
+
 def record_audio_with_arecord(duration=5, output_path="/tmp/test_recording.wav"):
     """Graba audio utilizando arecord."""
     print(f"Grabando audio durante {duration} segundos...")
     try:
-        # Usar arecord para grabar audio
-        cmd = f"arecord -D pulse -f cd -d {duration} -V mono {output_path}"
+        # Usar arecord para grabar audio (mono a 16 kHz: lo que esperan Vosk y Google)
+        cmd = f"arecord -D pulse -f S16_LE -r 16000 -c 1 -d {duration} {output_path}"
         subprocess.run(cmd, shell=True, check=True)
         print(f"Audio grabado y guardado en {output_path}")
         return output_path
@@ -27,27 +37,19 @@ def record_audio_with_arecord(duration=5, output_path="/tmp/test_recording.wav")
 def speech_to_text(audio_path):
     """Convierte un archivo de audio a texto."""
     print("Convirtiendo audio a texto...")
-    
-    recognizer = sr.Recognizer()
+
     try:
-        with sr.AudioFile(audio_path) as source:
-            # Ajustar para ruido ambiental (opcional)
-            print("Ajustando para ruido ambiental...")
-            recognizer.adjust_for_ambient_noise(source)
-            
-            # Obtener los datos de audio
-            print("Procesando audio...")
-            audio_data = recognizer.record(source)
-            
-            # Intentar reconocimiento con Google Speech Recognition
-            print("Enviando a Google Speech Recognition...")
-            text = recognizer.recognize_google(audio_data, language="es-ES")
-            return text
-    except sr.UnknownValueError:
-        print("Google Speech Recognition no pudo entender el audio")
-        return None
-    except sr.RequestError as e:
-        print(f"Error en la solicitud a Google Speech Recognition: {e}")
+        resultado = enrutador.transcribir(audio_path, os.getenv("STT_MOTOR"))
+        if perfil is not None:
+            # Refinar el perfil con los silencios de esta grabación
+            perfil.actualizar_desde_wav(audio_path)
+        print(f"Motor: {resultado['motor']}, {resultado['latencia']:.2f}s (RTF {resultado['rtf']:.2f})")
+        if not resultado["texto"]:
+            print(f"{resultado['motor']} no pudo entender el audio")
+            return None
+        return resultado["texto"]
+    except ErrorReconocimiento as e:
+        print(f"Error de reconocimiento: {e}")
         return None
     except Exception as e:
         print(f"Error inesperado: {e}")
@@ -86,6 +88,12 @@ def main():
     except Exception as e:
         print(f"Error: {e}")
     finally:
+        for nombre, e in enrutador.estadisticas().items():
+            if e["llamadas"] or e["errores"]:
+                print(f"{nombre}: {e['llamadas']} llamadas, {e['errores']} errores, "
+                      f"latencia media {e['latencia_media']:.2f}s")
+        if perfil is not None:
+            perfil.guardar()
         print("Prueba finalizada.")
 
 if __name__ == "__main__":
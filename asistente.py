@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Asistente de voz con asyncio
+Une en un solo bucle de eventos la captura del micrófono, el reconocimiento
+con Vosk, la síntesis con Eleven Labs y el botón/LED. Cada etapa es una
+corrutina conectada a la siguiente por una cola acotada; el trabajo que
+bloquea (decodificación de Kaldi, peticiones HTTP, sd.wait()) se ejecuta en
+executors, así que pulsar el botón interrumpe la reproducción y una frase
+nueva se puede decodificar mientras se habla la respuesta anterior.
+
+Uso:
+    python asistente.py [ruta_modelo] [--archivo test.wav] [--sin-gpio] [--sin-voz] [--comandos]
+                        [--gobernador [--ups-falso] [--registro-energia energia.jsonl]]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from servidor_vosk import crear_reconocedor, identidad_modelo, liberar_modelo_local
+from detector_voz import DetectorVoz
+from calibracion_ruido import obtener_perfil
+from captura_audio import FlujoArchivoFalso, FRAMES_CALLBACK, PA_CONTINUE, PA_INPUT_OVERFLOW
+
+# Configuración
+FRAME_RATE = 16000
+BUTTON_PIN = 23             # Botón en GPIO23
+LED_PIN = 25                # LED en GPIO25
+MAX_BLOQUES_AUDIO = 64      # ~4 s de audio pendiente como máximo antes de descartar
+MAX_TEXTOS = 4
+MAX_RESPUESTAS = 4
+
+
+def responder_eco(texto):
+    """Respuesta predeterminada: repetir lo reconocido"""
+    return f"Dijiste: {texto}"
+
+
+class Asistente:
+    """Orquestador de las etapas captura -> STT -> respuesta -> TTS.
+
+    Args:
+        model_path: Ruta del modelo de Vosk
+        responder: Función (o corrutina) que recibe el texto reconocido y
+            devuelve el texto a decir
+        archivo: WAV mono que sustituye al micrófono
+        usar_gpio: Usar el botón y el LED (hal_gpio elige el backend; el LED
+            indica escuchando/pensando/hablando con led_estados.MotorLed)
+        usar_voz: Sintetizar las respuestas con Eleven Labs (si no, se imprimen)
+        usar_vad: Filtrar los bloques en silencio antes del reconocedor
+        comandos: Diccionario {intención: [frases]} para reconocer con vocabulario
+            cerrado (comandos_voz.ReconocedorComandos); lo que no sea un comando
+            pasa por el dictado libre. La intención "detener" equivale al botón.
+        gobernador: gobernador_energia.GobernadorEnergia; sus perfiles cambian el
+            modelo, el VAD, el tamaño de bloque y la voz según la batería, y
+            registra la energía estimada de cada transcripción
+    """
+
+    def __init__(self, model_path, responder=responder_eco, archivo=None, usar_gpio=True,
+                 usar_voz=True, usar_vad=True, comandos=None, gobernador=None):
+        self.model_path = model_path
+        self.comandos = comandos
+        self.gobernador = gobernador
+        self.responder = responder
+        self.archivo = archivo
+        self.usar_gpio = usar_gpio
+        self.usar_voz = usar_voz
+
+        self.frecuencia = FRAME_RATE
+        if archivo:
+            import wave
+            with wave.open(archivo, "rb") as wf:
+                self.frecuencia = wf.getframerate()
+        self.vad = DetectorVoz(self.frecuencia) if usar_vad else None
+        self.perfil_ruido = None
+        self._filtro = None
+        if self.vad is not None:
+            self._filtro = self.vad.filtrar
+            self.perfil_ruido = obtener_perfil()
+            if self.perfil_ruido is not None:
+                # Piso inicial del perfil guardado, refinado con los silencios de la sesión
+                self._filtro = self.perfil_ruido.filtro(self.vad)
+        self._filtro_pedido = self._filtro
+
+        # Ajustes que cambia el gobernador de energía
+        self._bytes_bloque = self.frecuencia // 2 * 2      # Bloques de 0.5 s para el reconocedor
+        self._modelo_actual = model_path
+        self._modelo_perfil = None
+        self._reposo_led = "escuchando"
+        self._cpu_frase = 0.0
+        self._audio_frase = 0.0
+
+        # Un hilo para Kaldi (el reconocedor no admite llamadas concurrentes),
+        # otro para HTTP y otro para la reproducción
+        self._executor_stt = ThreadPoolExecutor(1, thread_name_prefix="stt")
+        self._executor_http = ThreadPoolExecutor(2, thread_name_prefix="http")
+        self._executor_audio = ThreadPoolExecutor(1, thread_name_prefix="audio")
+
+        self._loop = None
+        self._cola_audio = None
+        self._cola_textos = None
+        self._cola_respuestas = None
+        self._reproduccion = None
+        self._pensando = False
+        self._voz = None
+        self._gpio = None
+        self._led = None
+        self._boton = None
+        self._stream = None
+        self._pyaudio = None
+
+        # Métricas
+        self.bloques_descartados = 0
+        self.desbordes_entrada = 0
+        self.interrupciones = 0
+
+    # --- Captura -----------------------------------------------------------
+
+    def _callback_audio(self, in_data, frame_count, time_info, status):
+        # Hilo de audio: solo pasar el bloque al bucle de eventos
+        if status & PA_INPUT_OVERFLOW:
+            self.desbordes_entrada += 1
+        self._loop.call_soon_threadsafe(self._encolar_audio, in_data)
+        return (None, PA_CONTINUE)
+
+    def _encolar_audio(self, data):
+        if self._cola_audio.full():
+            # Contrapresión: si el reconocedor no da abasto se pierde el audio más antiguo
+            self._cola_audio.get_nowait()
+            self.bloques_descartados += 1
+        self._cola_audio.put_nowait(data)
+
+    def _abrir_captura(self):
+        if self.archivo:
+            self._stream = FlujoArchivoFalso(self.archivo, self._callback_audio)
+        else:
+            import pyaudio
+            self._pyaudio = pyaudio.PyAudio()
+            self._stream = self._pyaudio.open(
+                format=pyaudio.paInt16, channels=1, rate=self.frecuencia, input=True,
+                frames_per_buffer=FRAMES_CALLBACK, stream_callback=self._callback_audio, start=False,
+            )
+        self._stream.start_stream()
+
+    async def _vigilar_fin_archivo(self):
+        # Con un archivo, avisar al reconocedor cuando se termine
+        while self._stream.is_active():
+            await asyncio.sleep(0.1)
+        await self._cola_audio.put(None)
+
+    # --- Reconocimiento ----------------------------------------------------
+
+    def _texto(self, resultado):
+        resultado = json.loads(resultado)
+        if resultado.get("intencion") == "detener":
+            # Orden de voz equivalente a pulsar el botón
+            self._loop.call_soon_threadsafe(self.interrumpir)
+            return None
+        return resultado.get("text")
+
+    def _decodificar(self, reconocedor, data):
+        """Se ejecuta en el executor de STT; devuelve el texto final o None"""
+        if self.gobernador is None:
+            return self._decodificar_bloque(reconocedor, data)
+        # CPU de este hilo y audio con voz de la frase en curso, para la energía estimada
+        inicio = time.thread_time()
+        texto = self._decodificar_bloque(reconocedor, data)
+        self._cpu_frase += time.thread_time() - inicio
+        if self._en_voz or texto:
+            self._audio_frase += len(data) / 2 / self.frecuencia
+        if texto:
+            registro = self.gobernador.registrar_transcripcion(self._audio_frase, self._cpu_frase, texto)
+            print(f"Energía estimada: {registro['energia_j']:.2f} J (perfil {registro['perfil']})")
+            self._cpu_frase = self._audio_frase = 0.0
+        return texto
+
+    def _decodificar_bloque(self, reconocedor, data):
+        if self._filtro is not None:
+            data = self._filtro(data)
+        if data is None:
+            if self._en_voz:
+                self._en_voz = False
+                return self._texto(reconocedor.FinalResult())
+            return None
+        self._en_voz = True
+        if reconocedor.AcceptWaveform(data):
+            return self._texto(reconocedor.Result())
+        return None
+
+    def _crear_reconocedor(self):
+        if self.comandos is not None:
+            from comandos_voz import ReconocedorComandos
+            return ReconocedorComandos(self._modelo_actual, self.frecuencia, self.comandos)
+        return crear_reconocedor(self._modelo_actual, self.frecuencia)
+
+    async def _etapa_reconocimiento(self):
+        reconocedor = await self._loop.run_in_executor(self._executor_stt, self._crear_reconocedor)
+        self._en_voz = False
+        pendiente = b""
+
+        while True:
+            data = await self._cola_audio.get()
+            if data is None:
+                if pendiente:
+                    texto = await self._loop.run_in_executor(
+                        self._executor_stt, self._decodificar, reconocedor, pendiente)
+                    if texto:
+                        await self._cola_textos.put(texto)
+                texto = await self._loop.run_in_executor(
+                    self._executor_stt, lambda: self._texto(reconocedor.FinalResult()))
+                if texto:
+                    await self._cola_textos.put(texto)
+                await self._cola_textos.put(None)
+                return
+
+            modelo = self._modelo_perfil or self.model_path
+            if modelo != self._modelo_actual and not self._en_voz:
+                # Cambio de perfil de energía: otro modelo, entre frases. El anterior se
+                # descarga para no tener los dos en memoria
+                anterior, self._modelo_actual = self._modelo_actual, modelo
+                cerrar = getattr(reconocedor, "close", None)
+                if cerrar:
+                    cerrar()
+                reconocedor = None
+                liberar_modelo_local(anterior)
+                reconocedor = await self._loop.run_in_executor(self._executor_stt, self._crear_reconocedor)
+                print(f"Modelo de reconocimiento: {modelo}")
+
+            pendiente += data
+            if len(pendiente) < self._bytes_bloque:
+                continue
+            bloque, pendiente = pendiente, b""
+            texto = await self._loop.run_in_executor(self._executor_stt, self._decodificar, reconocedor, bloque)
+            if texto:
+                print(f"Reconocido: {texto}")
+                await self._cola_textos.put(texto)
+
+    # --- Respuesta ---------------------------------------------------------
+
+    async def _etapa_respuesta(self):
+        while True:
+            texto = await self._cola_textos.get()
+            if texto is None:
+                await self._cola_respuestas.put(None)
+                return
+            # Mientras suena la respuesta anterior el LED lo lleva la etapa de voz
+            self._pensando = True
+            if self._reproduccion is None:
+                self._estado_led("pensando")
+            try:
+                if asyncio.iscoroutinefunction(self.responder):
+                    respuesta = await self.responder(texto)
+                else:
+                    respuesta = await self._loop.run_in_executor(self._executor_http, self.responder, texto)
+            finally:
+                self._pensando = False
+            if respuesta:
+                await self._cola_respuestas.put(respuesta)
+            if not (respuesta and self._voz) and self._reproduccion is None:
+                self._estado_led(self._reposo_led)
+
+    # --- Voz ---------------------------------------------------------------
+
+    async def _etapa_voz(self):
+        while True:
+            respuesta = await self._cola_respuestas.get()
+            if respuesta is None:
+                self._estado_led(self._reposo_led)
+                return
+            print(f"Respuesta: {respuesta}")
+            if not self._voz:
+                continue
+
+            self._estado_led("hablando")
+            try:
+                # La descarga y la reproducción van juntas: suena desde el primer chunk
+                # de la primera frase mientras se piden las siguientes
+                self._reproduccion = self._loop.run_in_executor(
+                    self._executor_audio, self._voz.reproducir_por_frases, respuesta)
+                metricas = await self._reproduccion
+                if metricas["tiempo_primer_audio"] is not None:
+                    print(f"Primer audio a los {metricas['tiempo_primer_audio']:.2f}s")
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                print(f"Error generando/reproduciendo audio: {e}")
+            finally:
+                self._reproduccion = None
+                # Con otra respuesta en cola se sigue hablando; si se está generando una, pensando
+                if self._cola_respuestas.empty():
+                    self._estado_led("pensando" if self._pensando else self._reposo_led)
+
+    # --- GPIO --------------------------------------------------------------
+
+    def _abrir_gpio(self):
+        from hal_gpio import abrir_hal
+        from led_estados import abrir_motor
+
+        self._gpio = abrir_hal()
+        # Los patrones del LED los reproduce un hilo de baja prioridad (o el PWM)
+        self._led = abrir_motor(self._gpio, LED_PIN)
+        self._led.iniciar()
+        self._led.fijar_estado(self._reposo_led)
+        self._boton = self._gpio.boton(BUTTON_PIN)
+        # Los flancos se atienden en el propio bucle de eventos (add_reader)
+        self._boton.suscribir(lambda evento: evento["tipo"] == "presionado" and self.interrumpir())
+        self._boton.conectar(self._loop)
+
+    def _estado_led(self, estado):
+        if self._led:
+            self._led.fijar_estado(estado)
+
+    # --- Energía -----------------------------------------------------------
+
+    def _aplicar_perfil(self, perfil):
+        """Aplica un perfil de gobernador_energia (en el bucle de eventos)"""
+        self._bytes_bloque = int(perfil.duracion_bloque * self.frecuencia) * 2
+        if perfil.usar_vad and self._filtro is None:
+            if self.vad is None:
+                self.vad = DetectorVoz(self.frecuencia)
+            self._filtro = self.vad.filtrar
+        elif not perfil.usar_vad:
+            self._filtro = self._filtro_pedido
+        # El modelo se cambia en la etapa de reconocimiento, al terminar la frase en curso;
+        # si el ligero es una copia del pedido no hay nada que cambiar
+        modelo = perfil.modelo if perfil.modelo and os.path.isdir(perfil.modelo) else None
+        if modelo and identidad_modelo(modelo) == identidad_modelo(self.model_path):
+            modelo = None
+        self._modelo_perfil = modelo
+        if self._voz:
+            self._voz.selector.preferir_local = perfil.tts == "local"
+        reposo_anterior = self._reposo_led
+        self._reposo_led = "bateria_baja" if perfil.nombre == "critico" else "escuchando"
+        if self._led and self._led.estado == reposo_anterior:
+            self._estado_led(self._reposo_led)
+        print(f"Perfil de energía: {perfil.nombre}")
+
+    def interrumpir(self):
+        """Corta la respuesta que se está diciendo y descarta las pendientes"""
+        while not self._cola_respuestas.empty():
+            if self._cola_respuestas.get_nowait() is None:
+                # Conservar la marca de fin
+                self._cola_respuestas.put_nowait(None)
+                break
+        if self._reproduccion is not None and self._voz:
+            self.interrupciones += 1
+            print("Reproducción interrumpida")
+            self._voz.detener()
+
+    # --- Ciclo de vida -----------------------------------------------------
+
+    async def ejecutar(self):
+        """Arranca todas las etapas y espera a que terminen (fin del archivo o Ctrl+C)"""
+        self._loop = asyncio.get_running_loop()
+        self._cola_audio = asyncio.Queue(MAX_BLOQUES_AUDIO)
+        self._cola_textos = asyncio.Queue(MAX_TEXTOS)
+        self._cola_respuestas = asyncio.Queue(MAX_RESPUESTAS)
+
+        if self.usar_voz:
+            from sintesis_voz import ElevenSpeech
+            self._voz = await self._loop.run_in_executor(self._executor_http, ElevenSpeech)
+        if self.usar_gpio:
+            self._abrir_gpio()
+        if self.gobernador is not None:
+            self._aplicar_perfil(self.gobernador.perfil)
+            self.gobernador.suscribir(lambda perfil: self._loop.call_soon_threadsafe(self._aplicar_perfil, perfil))
+
+        tareas = [
+            asyncio.create_task(self._etapa_reconocimiento()),
+            asyncio.create_task(self._etapa_respuesta()),
+            asyncio.create_task(self._etapa_voz()),
+        ]
+        self._abrir_captura()
+        if self.archivo:
+            tareas.append(asyncio.create_task(self._vigilar_fin_archivo()))
+
+        try:
+            await asyncio.gather(*tareas)
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            self.cerrar()
+
+    def cerrar(self):
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pyaudio:
+            self._pyaudio.terminate()
+            self._pyaudio = None
+        if self._voz:
+            self._voz.detener()
+        if self.perfil_ruido is not None:
+            self.perfil_ruido.guardar()
+        if self._led:
+            self._led.detener()
+        if self._gpio:
+            self._gpio.cerrar()
+            self._gpio = self._led = self._boton = None
+        for executor in (self._executor_stt, self._executor_http, self._executor_audio):
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asistente de voz con asyncio")
+    parser.add_argument("ruta_modelo", nargs="?", default="modelo_vosk_es", help="Ruta del modelo de Vosk")
+    parser.add_argument("--archivo", help="WAV mono que sustituye al micrófono")
+    parser.add_argument("--sin-gpio", action="store_true", help="No usar el botón ni el LED")
+    parser.add_argument("--sin-voz", action="store_true", help="Imprimir las respuestas en lugar de decirlas")
+    parser.add_argument("--sin-vad", action="store_true", help="Enviar todo el audio al reconocedor")
+    parser.add_argument("--comandos", nargs="?", const=True, metavar="JSON",
+                        help="Reconocer primero los comandos de comandos.json (o del archivo indicado)")
+    parser.add_argument("--gobernador", action="store_true",
+                        help="Adaptar modelo, VAD, bloques y voz a la batería del UPS")
+    parser.add_argument("--ups-falso", action="store_true", help="Con --gobernador, simular un UPS descargándose")
+    parser.add_argument("--registro-energia", metavar="JSONL", help="Archivo para la energía de cada transcripción")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta_modelo):
+        print(f"Error: El modelo en {args.ruta_modelo} no existe.")
+        sys.exit(1)
+
+    comandos = None
+    if args.comandos:
+        from comandos_voz import cargar_comandos
+        comandos = cargar_comandos() if args.comandos is True else cargar_comandos(args.comandos)
+
+    gobernador = None
+    if args.gobernador:
+        from gobernador_energia import GobernadorEnergia, conectar_ups
+        gobernador = GobernadorEnergia(registro=args.registro_energia)
+        conectar_ups(gobernador, falso=args.ups_falso, descarga_por_hora=7200.0)
+
+    asistente = Asistente(args.ruta_modelo, archivo=args.archivo, usar_gpio=not args.sin_gpio,
+                          usar_voz=not args.sin_voz, usar_vad=not args.sin_vad, comandos=comandos,
+                          gobernador=gobernador)
+    print("Escuchando... (Habla en español, presiona Ctrl+C para salir)")
+    try:
+        asyncio.run(asistente.ejecutar())
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        print(f"Bloques de audio descartados: {asistente.bloques_descartados}, "
+              f"interrupciones: {asistente.interrupciones}")
+        if gobernador is not None:
+            e = gobernador.estadisticas()
+            print(f"Perfil final: {e['perfil']}, {e['transcripciones']} transcripciones, "
+                  f"{e['energia_total_j']:.1f} J estimados ({e['energia_media_j']:.2f} J por transcripción)")
+        print("Asistente finalizado.")
+
+
+if __name__ == "__main__":
+    main()
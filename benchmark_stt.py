@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de los caminos de reconocimiento de voz
+Pasa el corpus de WAV del repositorio por cada punto de entrada de STT y
+mide el factor de tiempo real (RTF), la memoria máxima (RSS), el tiempo de
+carga del modelo, la latencia del primer resultado parcial y el WER contra
+transcripciones de referencia. Cada punto de entrada corre en un proceso
+nuevo para que la memoria y la carga del modelo se midan por separado.
+
+Las referencias se leen de referencias_stt.json ({"test.wav": "texto", ...})
+o de un archivo <wav>.txt junto a cada WAV; sin referencia no se calcula WER.
+Todos los puntos reciben el mismo audio (los WAV estéreo se pasan a una copia
+mono) y los totales se calculan solo con los archivos que completaron todos.
+
+Uso:
+    python benchmark_stt.py [archivos...] [--modelo modelo_vosk_es]
+                            [--puntos vosk_archivo,vosk_stream] [--json resultados.json]
+                            [--comparar anterior.json]
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+
+from servidor_vosk import MODELOS_PREDETERMINADOS
+from lector_wav import copia_mono
+
+CORPUS = ["test.wav", "prueba_audio.wav", "nomas.wav", "ruido.wav",
+          "grabacion_pulse_*.wav", "raspiaudioDebug/*.wav"]
+ARCHIVO_REFERENCIAS = "referencias_stt.json"
+FRAMES_BLOQUE = 8000        # Como CHUNK_SIZE de test_vosk.py
+
+
+# --- WER -------------------------------------------------------------------
+
+def normalizar(texto):
+    """Minúsculas y sin puntuación, para comparar palabra por palabra"""
+    return re.sub(r"[^\w\s]", " ", texto.lower()).split()
+
+
+def distancia_palabras(referencia, hipotesis):
+    """Distancia de edición (sustituciones + borrados + inserciones) entre listas de palabras"""
+    anterior = list(range(len(hipotesis) + 1))
+    for i, r in enumerate(referencia, 1):
+        actual = [i]
+        for j, h in enumerate(hipotesis, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (r != h)))
+        anterior = actual
+    return anterior[-1]
+
+
+def wer(referencia, hipotesis):
+    """Word error rate; con referencia vacía es 0 si no se reconoció nada y 1 si sí"""
+    ref, hip = normalizar(referencia), normalizar(hipotesis)
+    if not ref:
+        return 0.0 if not hip else 1.0
+    return distancia_palabras(ref, hip) / len(ref)
+
+
+def cargar_referencias(archivos, ruta=ARCHIVO_REFERENCIAS):
+    referencias = {}
+    if os.path.exists(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            referencias.update(json.load(f))
+    for archivo in archivos:
+        txt = os.path.splitext(archivo)[0] + ".txt"
+        if archivo not in referencias and os.path.exists(txt):
+            with open(txt, encoding="utf-8") as f:
+                referencias[archivo] = f.read().strip()
+    return referencias
+
+
+# --- Puntos de entrada (se ejecutan en el proceso hijo) ---------------------
+
+def _rss_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _reconocer_stream(model, ruta, filtro=None):
+    """Como test_vosk.py: bloques de FRAMES_BLOQUE al reconocedor, con VAD opcional"""
+    import numpy as np
+    from vosk import KaldiRecognizer
+    from detector_voz import leer_mono
+
+    muestras, frecuencia = leer_mono(ruta)
+    rec = KaldiRecognizer(model, frecuencia)
+    segmentos = []
+    primer_parcial = None
+    en_voz = False
+    inicio = time.perf_counter()
+    for pos in range(0, len(muestras), FRAMES_BLOQUE):
+        data = np.ascontiguousarray(muestras[pos:pos + FRAMES_BLOQUE]).tobytes()
+        if filtro is not None:
+            data = filtro(data)
+        if data is None:
+            if en_voz:
+                en_voz = False
+                segmentos.append(json.loads(rec.FinalResult()).get("text", ""))
+            continue
+        en_voz = True
+        if rec.AcceptWaveform(data):
+            texto = json.loads(rec.Result()).get("text", "")
+            segmentos.append(texto)
+        else:
+            texto = json.loads(rec.PartialResult()).get("partial", "")
+        if texto and primer_parcial is None:
+            # Posición en el audio y tiempo de proceso hasta el primer texto
+            primer_parcial = {"audio": (pos + FRAMES_BLOQUE) / frecuencia,
+                              "proceso": time.perf_counter() - inicio}
+    segmentos.append(json.loads(rec.FinalResult()).get("text", ""))
+    return " ".join(s for s in segmentos if s), len(muestras) / frecuencia, primer_parcial
+
+
+def _punto_vosk_archivo(model, ruta):
+    from servidor_vosk import transcribir_wav
+
+    r = transcribir_wav(model, ruta, palabras=False)
+    return r["texto"], r["duracion_audio"], None
+
+
+def _punto_vosk_stream(model, ruta):
+    return _reconocer_stream(model, ruta)
+
+
+def _punto_vosk_stream_vad(model, ruta):
+    from detector_voz import DetectorVoz, leer_mono
+    from calibracion_ruido import obtener_perfil
+
+    _, frecuencia = leer_mono(ruta)
+    vad = DetectorVoz(frecuencia)
+    perfil = obtener_perfil()
+    if perfil is not None:
+        perfil.aplicar_detector(vad)
+    return _reconocer_stream(model, ruta, vad.filtrar)
+
+
+def _punto_vosk_servidor(modelo, ruta):
+    from servidor_vosk import transcribir_archivo
+
+    r = transcribir_archivo(ruta, modelo, palabras=False)
+    return r["texto"], r["duracion_audio"], None
+
+
+def _punto_google(_, ruta):
+    from reconocedores import MotorGoogle, duracion_wav
+
+    return MotorGoogle().transcribir(ruta), duracion_wav(ruta), None
+
+
+# nombre -> (función, carga el modelo de Vosk en el proceso)
+PUNTOS = {
+    "vosk_archivo": (_punto_vosk_archivo, True),
+    "vosk_stream": (_punto_vosk_stream, True),
+    "vosk_stream_vad": (_punto_vosk_stream_vad, True),
+    "vosk_servidor": (_punto_vosk_servidor, False),
+    "google": (_punto_google, False),
+}
+
+
+def _disponible(nombre, modelo):
+    if nombre == "vosk_servidor":
+        from servidor_vosk import servidor_disponible
+        return servidor_disponible()
+    if nombre == "google":
+        from reconocedores import MotorGoogle
+        return MotorGoogle().disponible()
+    return os.path.exists(modelo)
+
+
+def _ejecutar_punto(nombre, modelo, archivos, conexion):
+    """Proceso hijo: carga el modelo (si corresponde) y pasa todos los archivos.
+
+    archivos son pares (nombre en el corpus, ruta del WAV mono a decodificar).
+    """
+    funcion, carga_modelo = PUNTOS[nombre]
+    resultado = {"rss_base_mb": _rss_mb(), "carga_modelo": None, "archivos": []}
+    objetivo = modelo
+    if carga_modelo:
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        inicio = time.perf_counter()
+        objetivo = Model(modelo)
+        resultado["carga_modelo"] = time.perf_counter() - inicio
+
+    for archivo, ruta in archivos:
+        inicio = time.perf_counter()
+        try:
+            texto, duracion, primer_parcial = funcion(objetivo, ruta)
+        except Exception as e:
+            resultado["archivos"].append({"archivo": archivo, "error": str(e)})
+            continue
+        tiempo = time.perf_counter() - inicio
+        resultado["archivos"].append({
+            "archivo": archivo,
+            "texto": texto,
+            "duracion_audio": duracion,
+            "tiempo": tiempo,
+            "rtf": tiempo / duracion if duracion else 0.0,
+            "primer_parcial": primer_parcial,
+        })
+    resultado["rss_pico_mb"] = _rss_mb()
+    conexion.send(resultado)
+    conexion.close()
+
+
+def medir_punto(nombre, modelo, archivos):
+    """Ejecuta un punto de entrada en un proceso nuevo y devuelve sus medidas"""
+    contexto = multiprocessing.get_context("spawn")
+    receptor, emisor = contexto.Pipe(duplex=False)
+    proceso = contexto.Process(target=_ejecutar_punto, args=(nombre, modelo, archivos, emisor))
+    proceso.start()
+    emisor.close()
+    try:
+        resultado = receptor.recv()
+    except EOFError:
+        resultado = {"error": f"el proceso terminó con código {proceso.exitcode}", "archivos": []}
+    proceso.join()
+    return resultado
+
+
+def completados(resultado):
+    return {a["archivo"] for a in resultado["archivos"] if "error" not in a}
+
+
+def resumir(resultado, referencias, comunes=None):
+    """Agrega RTF global y WER medio a las medidas de un punto de entrada.
+
+    Con comunes, los agregados usan solo esos archivos (los que completaron
+    todos los puntos), para que los puntos se comparen sobre el mismo audio.
+    """
+    correctos = [a for a in resultado["archivos"] if "error" not in a]
+    for a in correctos:
+        if a["archivo"] in referencias:
+            a["wer"] = wer(referencias[a["archivo"]], a["texto"])
+    if comunes is not None:
+        correctos = [a for a in correctos if a["archivo"] in comunes]
+    duracion = sum(a["duracion_audio"] for a in correctos)
+    resultado["rtf"] = sum(a["tiempo"] for a in correctos) / duracion if duracion else None
+    errores_wer = [a["wer"] for a in correctos if "wer" in a]
+    resultado["archivos_agregados"] = len(correctos)
+    resultado["wer"] = sum(errores_wer) / len(errores_wer) if errores_wer else None
+    parciales = [a["primer_parcial"]["proceso"] for a in correctos if a.get("primer_parcial")]
+    resultado["primer_parcial_medio"] = sum(parciales) / len(parciales) if parciales else None
+    return resultado
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _formato(valor, patron):
+    return patron.format(valor) if valor is not None else "-"
+
+
+def comparar(actual, anterior):
+    """Imprime las diferencias de las métricas globales respecto a una ejecución anterior"""
+    print(f"\nComparación con {anterior.get('git') or anterior.get('fecha')}:")
+    for nombre, r in actual["puntos"].items():
+        previo = anterior.get("puntos", {}).get(nombre)
+        if not previo:
+            continue
+        cambios = []
+        for clave, unidad in (("rtf", ""), ("rss_pico_mb", " MB"), ("carga_modelo", "s"), ("wer", "")):
+            if r.get(clave) is not None and previo.get(clave) is not None:
+                cambios.append(f"{clave} {previo[clave]:.3f} -> {r[clave]:.3f}{unidad}")
+        print(f"  {nombre}: {', '.join(cambios)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los caminos de STT con el corpus de WAV")
+    parser.add_argument("archivos", nargs="*", help="WAV a usar (por defecto el corpus del repositorio)")
+    parser.add_argument("--modelo", default=next((m for m in MODELOS_PREDETERMINADOS if os.path.exists(m)),
+                                                 MODELOS_PREDETERMINADOS[0]), help="Ruta del modelo de Vosk")
+    parser.add_argument("--puntos", default=",".join(PUNTOS), help="Puntos de entrada separados por comas")
+    parser.add_argument("--referencias", default=ARCHIVO_REFERENCIAS, help="JSON con las transcripciones esperadas")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    archivos = args.archivos or sorted({a for patron in CORPUS for a in glob.glob(patron)})
+    if not archivos:
+        print("Error: No se encontraron archivos WAV.")
+        sys.exit(1)
+    referencias = cargar_referencias(archivos, args.referencias)
+
+    salida = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_commit(),
+        "modelo": args.modelo,
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "puntos": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="benchmark_stt_") as temporal:
+        # Mismo audio mono para todos los puntos (LectorWav solo acepta mono)
+        pares = []
+        for archivo in archivos:
+            try:
+                pares.append((archivo, copia_mono(archivo, temporal)))
+            except (OSError, ValueError, EOFError) as e:
+                print(f"{archivo}: se omite ({e})")
+        for nombre in args.puntos.split(","):
+            if nombre not in PUNTOS:
+                print(f"Punto de entrada desconocido: {nombre}")
+                continue
+            if not _disponible(nombre, args.modelo):
+                print(f"{nombre}: no disponible, se omite")
+                continue
+            print(f"{nombre}: {len(pares)} archivos...")
+            salida["puntos"][nombre] = medir_punto(nombre, args.modelo, pares)
+
+    # Totales solo sobre los archivos que completaron todos los puntos
+    comunes = set.intersection(*(completados(r) for r in salida["puntos"].values())) \
+        if salida["puntos"] else set()
+    salida["archivos_comunes"] = sorted(comunes)
+    print(f"\nArchivos completados por todos los puntos: {len(comunes)} de {len(pares)}")
+
+    for nombre, r in salida["puntos"].items():
+        resumir(r, referencias, comunes)
+        print(f"{nombre}:")
+        for a in r["archivos"]:
+            if "error" in a:
+                print(f"  {a['archivo']}: error: {a['error']}")
+                continue
+            parcial = a["primer_parcial"]["proceso"] if a.get("primer_parcial") else None
+            print(f"  {a['archivo']}: RTF {a['rtf']:.3f}, primer parcial {_formato(parcial, '{:.3f}s')}, "
+                  f"WER {_formato(a.get('wer'), '{:.2f}')}")
+        print(f"  Total ({r['archivos_agregados']} archivos): RTF {_formato(r.get('rtf'), '{:.3f}')}, carga del modelo "
+              f"{_formato(r.get('carga_modelo'), '{:.2f}s')}, RSS máximo {r.get('rss_pico_mb', 0):.0f} MB "
+              f"(base {r.get('rss_base_mb', 0):.0f} MB), WER {_formato(r.get('wer'), '{:.2f}')}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(salida, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.json}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(salida, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tamaño de bloque adaptativo para la decodificación en vivo
+Con CHUNK_SIZE fijo (0.5 s) el primer parcial no puede llegar antes de medio
+segundo, y con bloques pequeños el costo fijo de cada AcceptWaveform se
+multiplica. TamanoBloqueAdaptativo elige el tamaño de cada bloque:
+- en silencio (según el VAD) bloques grandes: pocas llamadas, nadie espera
+  un parcial (no más de DURACION_SILENCIO, que es lo que tarda en notarse
+  el inicio de una frase)
+- con voz, bloques pequeños para bajar la latencia, mientras el tiempo de
+  decodificación por segundo de audio (RTF del bloque), la carga de la CPU
+  y el audio pendiente en el buffer lo permitan; si no, se agrandan
+
+Uso:
+    python bloque_adaptativo.py [ruta_modelo] [--archivo test.wav]   (compara fijo contra adaptativo)
+"""
+
+import os
+import sys
+import time
+
+DURACIONES_BLOQUE = (0.0625, 0.125, 0.25, 0.5, 1.0)     # Segundos de audio por bloque
+DURACION_VOZ = 0.25         # Tamaño con el que se empieza cada frase
+DURACION_SILENCIO = 0.5     # Tamaño en silencio (como el CHUNK_SIZE fijo de 8000 frames a 16 kHz)
+RTF_MAXIMO = 0.6            # Por encima, la decodificación no da abasto con ese tamaño
+RTF_MINIMO = 0.25           # Por debajo, hay margen para bloques más pequeños
+CARGA_MAXIMA = 0.9          # Carga media por CPU a partir de la cual se agranda el bloque
+SUAVIZADO = 0.3             # Peso de la última medida en la media de RTF
+INTERVALO_CARGA = 1.0       # Segundos entre lecturas de la carga del sistema
+
+
+def carga_cpu():
+    """Carga media del último minuto por CPU (0 si el sistema no la expone)"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return 0.0
+
+
+def _nivel_cercano(duraciones, duracion):
+    return min(range(len(duraciones)), key=lambda i: abs(duraciones[i] - duracion))
+
+
+class TamanoBloqueAdaptativo:
+    """Elige los frames del siguiente bloque a partir de lo medido en los anteriores.
+
+    Args:
+        frecuencia: Frecuencia de muestreo
+        duraciones: Tamaños posibles en segundos, de menor a mayor
+        duracion_voz: Tamaño con el que se empieza al pasar de silencio a voz
+        duracion_silencio: Tamaño mientras el VAD no detecta voz
+    """
+
+    def __init__(self, frecuencia, duraciones=DURACIONES_BLOQUE, duracion_voz=DURACION_VOZ,
+                 duracion_silencio=DURACION_SILENCIO, rtf_maximo=RTF_MAXIMO, rtf_minimo=RTF_MINIMO,
+                 carga_maxima=CARGA_MAXIMA):
+        self.frecuencia = frecuencia
+        self.tamanos = [max(1, int(d * frecuencia)) for d in duraciones]
+        self.rtf_maximo = rtf_maximo
+        self.rtf_minimo = rtf_minimo
+        self.carga_maxima = carga_maxima
+        self._nivel_silencio = _nivel_cercano(duraciones, duracion_silencio)
+        self._nivel_voz = _nivel_cercano(duraciones, duracion_voz)
+        self._nivel = self._nivel_silencio
+        self._en_voz = False
+        self._rtf = {}                              # frames -> media móvil del RTF con ese tamaño
+        self._carga = (0.0, 0.0)                    # (instante de la lectura, carga)
+
+        # Métricas
+        self.bloques = {frames: 0 for frames in self.tamanos}
+        self.cambios = 0
+        self._latencias_voz = []
+
+    @property
+    def frames_bloque(self):
+        """Frames que se deben pasar al reconocedor en el siguiente bloque"""
+        return self.tamanos[self._nivel]
+
+    def _carga_actual(self):
+        instante, carga = self._carga
+        if time.monotonic() - instante >= INTERVALO_CARGA:
+            carga = carga_cpu()
+            self._carga = (time.monotonic(), carga)
+        return carga
+
+    def registrar(self, frames, tiempo, es_voz, frames_pendientes=0, latencia=None):
+        """Registra un bloque decodificado y ajusta el tamaño del siguiente.
+
+        Args:
+            frames: Frames del bloque
+            tiempo: Segundos que tardó su decodificación
+            es_voz: Si el bloque se envió al reconocedor (el VAD lo consideró voz)
+            frames_pendientes: Audio que sigue esperando en el buffer
+            latencia: Latencia de captura a resultado del bloque (para las métricas)
+        """
+        self.bloques[frames] = self.bloques.get(frames, 0) + 1
+        anterior = self._nivel
+
+        if not es_voz:
+            self._en_voz = False
+            self._nivel = self._nivel_silencio
+        else:
+            if latencia is not None:
+                self._latencias_voz.append(latencia)
+            rtf = tiempo * self.frecuencia / frames if frames else 0.0
+            previo = self._rtf.get(frames, rtf)
+            self._rtf[frames] = previo + SUAVIZADO * (rtf - previo)
+            if not self._en_voz:
+                # Empieza una frase: pasar directamente al tamaño de voz
+                self._en_voz = True
+                self._nivel = self._nivel_voz
+            elif (self._rtf[frames] > self.rtf_maximo or frames_pendientes > 2 * frames
+                  or self._carga_actual() > self.carga_maxima):
+                self._nivel = min(self._nivel + 1, len(self.tamanos) - 1)
+            elif self._rtf[frames] < self.rtf_minimo and self._nivel > 0:
+                # Solo bajar si el tamaño menor no se midió ya como demasiado lento
+                menor = self.tamanos[self._nivel - 1]
+                if self._rtf.get(menor, 0.0) <= self.rtf_maximo:
+                    self._nivel -= 1
+            # Lo aprendido se usa como tamaño inicial de la próxima frase
+            self._nivel_voz = self._nivel
+
+        if self._nivel != anterior:
+            self.cambios += 1
+
+    def estadisticas(self):
+        """Bloques por tamaño (en segundos), cambios, RTF por tamaño y latencia con voz"""
+        latencias = self._latencias_voz
+        return {
+            "bloques": {round(f / self.frecuencia, 4): n for f, n in self.bloques.items() if n},
+            "cambios": self.cambios,
+            "rtf": {round(f / self.frecuencia, 4): r for f, r in self._rtf.items()},
+            "latencia_media_voz": sum(latencias) / len(latencias) if latencias else 0.0,
+            "latencia_maxima_voz": max(latencias, default=0.0),
+            "carga_cpu": self._carga[1],
+        }
+
+
+def main():
+    import argparse
+    import wave
+    from servidor_vosk import crear_reconocedor
+    from detector_voz import DetectorVoz
+    from calibracion_ruido import obtener_perfil
+    from captura_audio import CapturaMicrofono, CHUNK_SIZE, FRAME_RATE
+
+    parser = argparse.ArgumentParser(description="Compara bloques fijos con bloques adaptativos")
+    parser.add_argument("ruta_modelo", nargs="?", default="modelo_vosk_es", help="Ruta del modelo de Vosk")
+    parser.add_argument("--archivo", default="test.wav", help="WAV mono que sustituye al micrófono")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta_modelo):
+        print(f"Error: El modelo en {args.ruta_modelo} no existe.")
+        sys.exit(1)
+    with wave.open(args.archivo, "rb") as wf:
+        frecuencia = wf.getframerate()
+
+    # Bloque fijo con la misma duración que CHUNK_SIZE a 16 kHz
+    frames_fijos = CHUNK_SIZE * frecuencia // FRAME_RATE
+    perfil = obtener_perfil()
+    for adaptativo in (False, True):
+        vad = DetectorVoz(frecuencia)
+        if perfil is not None:
+            perfil.aplicar_detector(vad)
+        captura = CapturaMicrofono(crear_reconocedor(args.ruta_modelo, frecuencia), frecuencia, frames_fijos,
+                                   archivo=args.archivo, filtro=vad.filtrar, adaptativo=adaptativo,
+                                   al_resultado=lambda texto: None, al_parcial=lambda texto: None)
+        captura.iniciar()
+        captura.esperar()
+        captura.detener()
+        m = captura.metricas()
+        print(f"{'Adaptativo' if adaptativo else f'Fijo ({frames_fijos} frames)'}: "
+              f"{m['bloques_decodificados']} bloques, latencia media {m['latencia_media']:.3f}s, "
+              f"máxima {m['latencia_maxima']:.3f}s")
+        if adaptativo:
+            e = captura.tamano.estadisticas()
+            print(f"  Bloques por tamaño (s): {e['bloques']}, cambios: {e['cambios']}")
+            print(f"  Latencia con voz: media {e['latencia_media_voz']:.3f}s, máxima {e['latencia_maxima_voz']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
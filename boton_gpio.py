@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Botones por eventos de flanco con libgpiod 2.x
+En lugar de leer el valor del botón cada 100 ms, se pide la línea con
+detección de flancos (Edge.BOTH) y reloj MONOTONIC y se espera en el
+descriptor de archivo de la solicitud: el proceso duerme hasta que el kernel
+registra un flanco, y cada evento trae la marca de tiempo del kernel, así
+la duración de las pulsaciones no depende de cuándo se atiende el evento.
+
+Sobre esos flancos Botones aplica antirrebote por software (y comprueba el
+nivel cuando se asienta) y emite eventos de alto nivel:
+    presionado, liberado, corta, doble, larga
+Se puede usar con un bucle bloqueante (ejecutar) o dentro de asyncio
+(conectar registra el fd con add_reader). SolicitudGpiodFalsa imita una
+gpiod.LineRequest para probar sin hardware.
+
+Uso:
+    python boton_gpio.py [--chip /dev/gpiochip0] [--pin 23] [--asyncio] [--falso]
+"""
+
+import os
+import enum
+import time
+import select
+import asyncio
+import argparse
+import threading
+from datetime import timedelta
+from collections import deque, namedtuple
+
+CHIP = "/dev/gpiochip0"
+BUTTON_PIN = 23             # Botón en GPIO23
+REBOTE = 0.02               # Segundos tras un flanco aceptado en los que se ignoran los demás
+PULSACION_LARGA = 0.8       # Segundos presionado para una pulsación larga
+DOBLE_PULSACION = 0.35      # Segundos máximos entre soltar y volver a presionar para una doble
+MAX_EVENTOS = 64            # Flancos leídos por llamada a read_edge_events
+ESPERA_MAXIMA = 1.0         # Segundos máximos bloqueado en ejecutar() antes de revisar detener
+
+
+def solicitar_botones(chip=CHIP, pines=(BUTTON_PIN,), rebote_kernel=None, consumidor="Botones"):
+    """Pide las líneas como entradas con pull-up, flancos de subida y bajada y reloj MONOTONIC.
+
+    rebote_kernel (segundos) activa además el antirrebote del kernel, si el driver lo admite.
+    """
+    import gpiod
+    from gpiod.line import Direction, Bias, Edge, Clock
+
+    ajustes = {"direction": Direction.INPUT, "bias": Bias.PULL_UP, "edge_detection": Edge.BOTH,
+               "event_clock": Clock.MONOTONIC}
+    if rebote_kernel:
+        ajustes["debounce_period"] = timedelta(seconds=rebote_kernel)
+    return gpiod.request_lines(chip, consumer=consumidor, config={tuple(pines): gpiod.LineSettings(**ajustes)})
+
+
+class _EstadoPin:
+    def __init__(self, presionado):
+        self.presionado = presionado
+        self.ultimo_flanco = 0          # ns del último flanco aceptado
+        self.inicio = 0                 # ns del inicio de la pulsación en curso
+        self.larga_emitida = False
+        self.clic_pendiente = None      # ns de la liberación de una pulsación corta sin confirmar
+        self.duracion_clic = None
+        self.verificar_en = None        # ns en que se comprueba el nivel asentado
+
+
+class Botones:
+    """Convierte los flancos de una solicitud de libgpiod en eventos de botón.
+
+    Cada evento es un diccionario con:
+        tipo: "presionado", "liberado", "corta", "doble" o "larga"
+        pin: Línea del botón
+        instante_ns: Marca de tiempo (CLOCK_MONOTONIC) del flanco o del vencimiento
+        duracion: Segundos presionado (en liberado, corta y larga)
+        latencia: Segundos entre el flanco en el kernel y la entrega del evento
+
+    Args:
+        solicitud: gpiod.LineRequest (o SolicitudGpiodFalsa) con detección de flancos
+        pines: Líneas de la solicitud que son botones
+        activo_bajo: El botón conecta la línea a masa (pull-up): presionado es nivel bajo
+    """
+
+    def __init__(self, solicitud, pines=(BUTTON_PIN,), activo_bajo=True, rebote=REBOTE,
+                 pulsacion_larga=PULSACION_LARGA, doble_pulsacion=DOBLE_PULSACION):
+        self.solicitud = solicitud
+        self.activo_bajo = activo_bajo
+        self.rebote_ns = int(rebote * 1e9)
+        self.larga_ns = int(pulsacion_larga * 1e9)
+        self.doble_ns = int(doble_pulsacion * 1e9)
+        self._estados = {pin: _EstadoPin(self._leer_presionado(pin)) for pin in pines}
+        self._suscriptores = []
+        self._lock = threading.Lock()
+        self._loop = None
+        self._temporizador = None
+
+        # Métricas
+        self.flancos = 0
+        self.rebotes = 0
+        self.eventos = {}
+        self._latencias = deque(maxlen=1000)
+
+    def _leer_presionado(self, pin):
+        return bool(self.solicitud.get_value(pin)) != self.activo_bajo
+
+    # --- Suscripción -------------------------------------------------------
+
+    def suscribir(self, callback):
+        """Registra callback(evento); devuelve una función que cancela la suscripción"""
+        with self._lock:
+            self._suscriptores.append(callback)
+
+        def cancelar():
+            with self._lock:
+                if callback in self._suscriptores:
+                    self._suscriptores.remove(callback)
+        return cancelar
+
+    async def eventos_async(self):
+        """Iterador asíncrono de eventos (los callbacks pueden llegar de otro hilo)"""
+        loop = asyncio.get_running_loop()
+        cola = asyncio.Queue()
+        cancelar = self.suscribir(lambda evento: loop.call_soon_threadsafe(cola.put_nowait, evento))
+        try:
+            while True:
+                yield await cola.get()
+        finally:
+            cancelar()
+
+    def _emitir(self, tipo, pin, instante_ns, duracion=None):
+        latencia = max(0, time.monotonic_ns() - instante_ns) / 1e9
+        self.eventos[tipo] = self.eventos.get(tipo, 0) + 1
+        evento = {"tipo": tipo, "pin": pin, "instante_ns": instante_ns, "duracion": duracion,
+                  "latencia": latencia}
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for callback in suscriptores:
+            callback(evento)
+
+    # --- Máquina de estados ------------------------------------------------
+
+    def procesar(self, flancos):
+        """Procesa una lista de gpiod.EdgeEvent leídos de la solicitud"""
+        ahora = time.monotonic_ns()
+        for flanco in flancos:
+            estado = self._estados.get(flanco.line_offset)
+            if estado is None:
+                continue
+            self.flancos += 1
+            instante = flanco.timestamp_ns
+            presionado = (flanco.event_type.name == "RISING_EDGE") != self.activo_bajo
+            if instante - estado.ultimo_flanco < self.rebote_ns or presionado == estado.presionado:
+                # Rebote: el nivel real se comprueba cuando se asienta (verificar_en)
+                self.rebotes += 1
+                continue
+            self._latencias.append(ahora - instante)
+            self._cambiar(flanco.line_offset, estado, presionado, instante)
+        self.vencer(ahora)
+
+    def _cambiar(self, pin, estado, presionado, instante):
+        estado.presionado = presionado
+        estado.ultimo_flanco = instante
+        estado.verificar_en = instante + self.rebote_ns
+        if presionado:
+            estado.inicio = instante
+            estado.larga_emitida = False
+            self._emitir("presionado", pin, instante)
+            return
+
+        duracion = (instante - estado.inicio) / 1e9
+        self._emitir("liberado", pin, instante, duracion)
+        if estado.larga_emitida:
+            return
+        if instante - estado.inicio >= self.larga_ns:
+            self._emitir("larga", pin, instante, duracion)
+        elif estado.clic_pendiente is not None and estado.inicio - estado.clic_pendiente <= self.doble_ns:
+            estado.clic_pendiente = None
+            self._emitir("doble", pin, instante, duracion)
+        else:
+            # Puede ser la primera de una doble: se confirma como corta al vencer la espera
+            estado.clic_pendiente = instante
+            estado.duracion_clic = duracion
+
+    def vencer(self, ahora=None):
+        """Emite los eventos que dependen del tiempo (larga mientras se mantiene, corta confirmada)"""
+        ahora = ahora or time.monotonic_ns()
+        for pin, estado in self._estados.items():
+            if estado.verificar_en is not None and ahora >= estado.verificar_en:
+                estado.verificar_en = None
+                if self._leer_presionado(pin) != estado.presionado:
+                    # El último flanco se tomó como rebote pero el nivel cambió de verdad
+                    self._cambiar(pin, estado, not estado.presionado, ahora)
+            if estado.presionado and not estado.larga_emitida and ahora - estado.inicio >= self.larga_ns:
+                self._confirmar_corta(pin, estado)
+                estado.larga_emitida = True
+                self._emitir("larga", pin, ahora, (ahora - estado.inicio) / 1e9)
+            if (estado.clic_pendiente is not None and ahora - estado.clic_pendiente >= self.doble_ns
+                    and not (estado.presionado and estado.inicio - estado.clic_pendiente <= self.doble_ns)):
+                self._confirmar_corta(pin, estado)
+
+    def _confirmar_corta(self, pin, estado):
+        if estado.clic_pendiente is not None:
+            instante, estado.clic_pendiente = estado.clic_pendiente, None
+            self._emitir("corta", pin, instante, estado.duracion_clic)
+
+    def proximo_vencimiento(self):
+        """Instante (ns, CLOCK_MONOTONIC) en que vencer() tiene algo que hacer, o None"""
+        vencimientos = []
+        for estado in self._estados.values():
+            if estado.verificar_en is not None:
+                vencimientos.append(estado.verificar_en)
+            if estado.presionado and not estado.larga_emitida:
+                vencimientos.append(estado.inicio + self.larga_ns)
+            if estado.clic_pendiente is not None:
+                vencimientos.append(estado.clic_pendiente + self.doble_ns)
+        return min(vencimientos, default=None)
+
+    # --- Bucles ------------------------------------------------------------
+
+    def ejecutar(self, detener=None):
+        """Bucle bloqueante: duerme en el fd hasta el próximo flanco o vencimiento"""
+        detener = detener or threading.Event()
+        while not detener.is_set():
+            vence = self.proximo_vencimiento()
+            espera = ESPERA_MAXIMA
+            if vence is not None:
+                espera = min(espera, max(0.0, (vence - time.monotonic_ns()) / 1e9))
+            if self.solicitud.wait_edge_events(espera):
+                self.procesar(self.solicitud.read_edge_events(MAX_EVENTOS))
+            else:
+                self.vencer()
+
+    def conectar(self, loop=None):
+        """Atiende los flancos desde un bucle de asyncio (add_reader sobre el fd de la solicitud)"""
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop.add_reader(self.solicitud.fd, self._al_leer)
+
+    def desconectar(self):
+        if self._loop is not None:
+            self._loop.remove_reader(self.solicitud.fd)
+            if self._temporizador:
+                self._temporizador.cancel()
+            self._loop = None
+
+    def _al_leer(self):
+        self.procesar(self.solicitud.read_edge_events(MAX_EVENTOS))
+        self._programar_vencimiento()
+
+    def _al_vencer(self):
+        self._temporizador = None
+        self.vencer()
+        self._programar_vencimiento()
+
+    def _programar_vencimiento(self):
+        if self._temporizador:
+            self._temporizador.cancel()
+            self._temporizador = None
+        vence = self.proximo_vencimiento()
+        if vence is not None and self._loop is not None:
+            self._temporizador = self._loop.call_later(max(0.0, (vence - time.monotonic_ns()) / 1e9),
+                                                       self._al_vencer)
+
+    def estadisticas(self):
+        """Flancos, rebotes descartados, eventos por tipo y latencia del kernel a Python"""
+        latencias = self._latencias
+        return {
+            "flancos": self.flancos,
+            "rebotes": self.rebotes,
+            "eventos": dict(self.eventos),
+            "latencia_media": sum(latencias) / len(latencias) / 1e9 if latencias else 0.0,
+            "latencia_maxima": max(latencias, default=0) / 1e9,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Backend falso
+# ---------------------------------------------------------------------------
+
+class TipoFlanco(enum.Enum):
+    RISING_EDGE = 1
+    FALLING_EDGE = 2
+
+
+class ValorFalso(enum.Enum):
+    INACTIVE = 0
+    ACTIVE = 1
+
+    def __bool__(self):
+        return self is ValorFalso.ACTIVE
+
+
+Flanco = namedtuple("Flanco", "event_type timestamp_ns line_offset global_seqno line_seqno")
+
+
+class SolicitudGpiodFalsa:
+    """Sustituto de gpiod.LineRequest (2.x) para líneas de entrada con detección de flancos.
+
+    Tiene un fd real (un pipe) que se vuelve legible con cada flanco, así
+    wait_edge_events, select y add_reader funcionan igual que con el kernel.
+    Los botones se simulan con fijar_nivel() o pulsar().
+    """
+
+    def __init__(self, pines=(BUTTON_PIN,), activo_bajo=True):
+        self.activo_bajo = activo_bajo
+        self._niveles = {pin: activo_bajo for pin in pines}     # Reposo: pull-up, nivel alto
+        self._flancos = deque()
+        self._lock = threading.Lock()
+        self._secuencia = 0
+        self.liberada = False
+        self._lectura, self._escritura = os.pipe()
+        os.set_blocking(self._lectura, False)
+
+    @property
+    def fd(self):
+        return self._lectura
+
+    def get_value(self, pin):
+        return ValorFalso.ACTIVE if self._niveles[pin] else ValorFalso.INACTIVE
+
+    def wait_edge_events(self, timeout=None):
+        if isinstance(timeout, timedelta):
+            timeout = timeout.total_seconds()
+        return bool(select.select([self._lectura], [], [], timeout)[0])
+
+    def read_edge_events(self, max_events=None):
+        with self._lock:
+            n = len(self._flancos) if max_events is None else min(max_events, len(self._flancos))
+            flancos = [self._flancos.popleft() for _ in range(n)]
+        if n:
+            os.read(self._lectura, n)
+        return flancos
+
+    def release(self):
+        if not self.liberada:
+            self.liberada = True
+            os.close(self._lectura)
+            os.close(self._escritura)
+
+    # --- Simulación --------------------------------------------------------
+
+    def fijar_nivel(self, pin, alto):
+        """Cambia el nivel de una línea y genera el flanco correspondiente"""
+        with self._lock:
+            if self.liberada or self._niveles[pin] == alto:
+                return
+            self._niveles[pin] = alto
+            self._secuencia += 1
+            self._flancos.append(Flanco(
+                TipoFlanco.RISING_EDGE if alto else TipoFlanco.FALLING_EDGE,
+                time.monotonic_ns(), pin, self._secuencia, self._secuencia))
+        os.write(self._escritura, b"\0")
+
+    def pulsar(self, pin=BUTTON_PIN, duracion=0.1, rebotes=0, intervalo_rebote=0.002):
+        """Simula una pulsación (bloquea durante duracion), con rebotes al presionar y al soltar"""
+        presionado = not self.activo_bajo
+        for nivel in (presionado, not presionado):
+            for _ in range(rebotes):
+                self.fijar_nivel(pin, nivel)
+                time.sleep(intervalo_rebote)
+                self.fijar_nivel(pin, not nivel)
+                time.sleep(intervalo_rebote)
+            self.fijar_nivel(pin, nivel)
+            if nivel == presionado:
+                time.sleep(duracion)
+
+
+def simular_pulsaciones(solicitud, pin=BUTTON_PIN):
+    """Secuencia de prueba: corta con rebotes, doble y larga"""
+    time.sleep(0.2)
+    solicitud.pulsar(pin, 0.08, rebotes=3)
+    time.sleep(0.6)
+    solicitud.pulsar(pin, 0.08)
+    time.sleep(0.1)
+    solicitud.pulsar(pin, 0.08)
+    time.sleep(0.6)
+    solicitud.pulsar(pin, 1.2)
+    time.sleep(0.6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Botón por eventos de flanco de libgpiod")
+    parser.add_argument("--chip", default=CHIP)
+    parser.add_argument("--pin", type=int, default=BUTTON_PIN)
+    parser.add_argument("--asyncio", action="store_true", help="Atender el botón desde un bucle de asyncio")
+    parser.add_argument("--falso", action="store_true", help="Simular pulsaciones sin hardware")
+    args = parser.parse_args()
+
+    solicitud = SolicitudGpiodFalsa((args.pin,)) if args.falso else solicitar_botones(args.chip, (args.pin,))
+    botones = Botones(solicitud, (args.pin,))
+
+    def imprimir(evento):
+        duracion = f", {evento['duracion']:.3f}s" if evento["duracion"] is not None else ""
+        print(f"{evento['tipo']}{duracion} (latencia {evento['latencia'] * 1000:.2f} ms)")
+    botones.suscribir(imprimir)
+
+    print(f"Esperando el botón en {'la línea simulada' if args.falso else args.chip} {args.pin}... (Ctrl+C para salir)")
+
+    try:
+        if args.asyncio:
+            async def principal():
+                botones.conectar()
+                try:
+                    if args.falso:
+                        await asyncio.to_thread(simular_pulsaciones, solicitud, args.pin)
+                    else:
+                        await asyncio.Event().wait()
+                finally:
+                    botones.desconectar()
+            asyncio.run(principal())
+        else:
+            detener = threading.Event()
+            if args.falso:
+                def simular():
+                    simular_pulsaciones(solicitud, args.pin)
+                    detener.set()
+                threading.Thread(target=simular, daemon=True).start()
+            botones.ejecutar(detener)
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        solicitud.release()
+        e = botones.estadisticas()
+        print(f"Flancos: {e['flancos']}, rebotes descartados: {e['rebotes']}, eventos: {e['eventos']}")
+        print(f"Latencia flanco -> evento: media {e['latencia_media'] * 1000:.2f} ms, "
+              f"máxima {e['latencia_maxima'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché en disco del audio sintetizado
+Guarda el PCM de cada frase en un archivo cuyo nombre es el hash de
+(texto, voz, modelo, formato), así que las frases repetidas (avisos fijos del
+asistente, respuestas frecuentes) no vuelven a llamar a la API. Los aciertos
+se leen con mmap y se pasan al reproductor sin copiar. El tamaño total está
+acotado: al superarlo se borran las entradas usadas hace más tiempo (LRU,
+según la fecha de modificación, que se actualiza en cada acierto).
+
+Uso:
+    python cache_voz.py [--directorio DIR] [--limpiar]
+"""
+
+import os
+import mmap
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+
+DIRECTORIO_CACHE = os.getenv("TTS_CACHE_DIR", os.path.expanduser("~/.cache/reliczero/tts"))
+TAMANO_MAXIMO = int(float(os.getenv("TTS_CACHE_MB", "200")) * 1024 * 1024)
+BYTES_CHUNK = 8192
+EXTENSION = ".pcm"
+
+
+def clave(texto, voz, modelo, formato):
+    """Hash que identifica el audio de una frase"""
+    datos = json.dumps([texto, voz, modelo, formato], ensure_ascii=False)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+class CacheVoz:
+    """Caché LRU en disco de PCM sintetizado.
+
+    Args:
+        directorio: Carpeta donde se guardan los archivos
+        tamano_maximo: Bytes máximos que puede ocupar la caché
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE, tamano_maximo=TAMANO_MAXIMO):
+        self.directorio = directorio
+        self.tamano_maximo = tamano_maximo
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()      # clave -> tamaño, de la menos a la más reciente
+        self.tamano_total = 0
+
+        # Estadísticas
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.bytes_servidos = 0
+
+        archivos = []
+        for nombre in os.listdir(directorio):
+            if nombre.endswith(EXTENSION):
+                info = os.stat(os.path.join(directorio, nombre))
+                archivos.append((info.st_mtime, nombre[:-len(EXTENSION)], info.st_size))
+        for _, k, tamano in sorted(archivos):
+            self._entradas[k] = tamano
+            self.tamano_total += tamano
+
+    def _ruta(self, k):
+        return os.path.join(self.directorio, k + EXTENSION)
+
+    def contiene(self, k):
+        return k in self._entradas
+
+    def leer(self, k, bytes_chunk=BYTES_CHUNK):
+        """Generador de memoryviews del PCM guardado (mmap, sin copias); None si no está"""
+        with self._lock:
+            if k not in self._entradas:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(k)
+            self.aciertos += 1
+        ruta = self._ruta(k)
+        try:
+            # La fecha de modificación conserva el orden LRU entre ejecuciones
+            os.utime(ruta)
+            archivo = open(ruta, "rb")
+        except FileNotFoundError:
+            # Borrada desde fuera: contarla como fallo
+            with self._lock:
+                self.aciertos -= 1
+                self.fallos += 1
+                self.tamano_total -= self._entradas.pop(k, 0)
+            return None
+        return self._chunks_mmap(archivo, bytes_chunk)
+
+    def _chunks_mmap(self, archivo, bytes_chunk):
+        with archivo:
+            datos = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        vista = memoryview(datos)
+        chunk = None
+        try:
+            for inicio in range(0, len(vista), bytes_chunk):
+                chunk = vista[inicio:inicio + bytes_chunk]
+                self.bytes_servidos += len(chunk)
+                yield chunk
+        finally:
+            chunk = None
+            vista.release()
+            try:
+                datos.close()
+            except BufferError:
+                # Quien consume aún tiene una vista; el mmap se libera al soltarla
+                pass
+
+    def guardar_mientras(self, k, chunks):
+        """Devuelve los chunks tal como llegan y, si el generador termina, los guarda.
+
+        Si la reproducción se interrumpe el archivo parcial se descarta.
+        """
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        completo = False
+        try:
+            with os.fdopen(fd, "wb") as salida:
+                for chunk in chunks:
+                    salida.write(chunk)
+                    yield chunk
+            completo = True
+        finally:
+            if completo and os.path.getsize(temporal) > 0:
+                self._agregar(k, temporal)
+            else:
+                os.unlink(temporal)
+
+    def _agregar(self, k, temporal):
+        tamano = os.path.getsize(temporal)
+        os.replace(temporal, self._ruta(k))
+        with self._lock:
+            self.tamano_total += tamano - self._entradas.pop(k, 0)
+            self._entradas[k] = tamano
+            self._desalojar()
+
+    def _desalojar(self):
+        while self.tamano_total > self.tamano_maximo and len(self._entradas) > 1:
+            k, tamano = self._entradas.popitem(last=False)
+            self.tamano_total -= tamano
+            self.desalojos += 1
+            try:
+                os.unlink(self._ruta(k))
+            except FileNotFoundError:
+                pass
+
+    def limpiar(self):
+        """Borra todas las entradas"""
+        with self._lock:
+            for k in self._entradas:
+                try:
+                    os.unlink(self._ruta(k))
+                except FileNotFoundError:
+                    pass
+            self._entradas.clear()
+            self.tamano_total = 0
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "tamano_total": self.tamano_total,
+            "tamano_maximo": self.tamano_maximo,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "desalojos": self.desalojos,
+            "bytes_servidos": self.bytes_servidos,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estado de la caché de audio sintetizado")
+    parser.add_argument("--directorio", default=DIRECTORIO_CACHE)
+    parser.add_argument("--limpiar", action="store_true", help="Borrar todas las entradas")
+    args = parser.parse_args()
+
+    cache = CacheVoz(args.directorio)
+    if args.limpiar:
+        cache.limpiar()
+        print(f"Caché {args.directorio} vaciada.")
+        return
+
+    estado = cache.estadisticas()
+    print(f"Caché: {args.directorio}")
+    print(f"Entradas: {estado['entradas']}, {estado['tamano_total'] / 2**20:.1f} MB "
+          f"de {estado['tamano_maximo'] / 2**20:.0f} MB")
+    if cache._entradas:
+        mas_reciente = os.path.getmtime(cache._ruta(next(reversed(cache._entradas))))
+        print(f"Último uso: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mas_reciente))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calibración del ruido ambiental guardada en disco
+El perfil de ruido (piso en dB) se calcula una vez a partir de una muestra
+dedicada (ruido.wav o unos segundos de micrófono al arrancar), se guarda en
+JSON y se refina poco a poco con los tramos de silencio que se detectan
+después. Se aplica a los dos caminos de reconocimiento:
+- Vosk: piso inicial del DetectorVoz (VAD) delante del reconocedor
+- SpeechRecognition: se recorta el ruido previo a la voz antes de record()
+  (que no mira energy_threshold), en lugar de llamar a
+  adjust_for_ambient_noise() en cada archivo (que consume su primer segundo)
+
+Uso:
+    python calibracion_ruido.py [--wav ruido.wav | --microfono 3] [--mostrar]
+    python calibracion_ruido.py --comprobar      (verifica el recorte con audio sintético)
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+from detector_voz import (DetectorVoz, energia_db, leer_mono, UMBRAL_DB, DURACION_TRAMA, PISO_MINIMO_DB,
+                          MIN_TRAMAS_VOZ)
+
+RUTA_PERFIL = os.getenv("RUIDO_PERFIL", os.path.expanduser("~/.cache/reliczero/ruido.json"))
+ARCHIVO_RUIDO = "ruido.wav"
+RELACION_ENERGIA = 1.5          # Margen sobre el ruido, como dynamic_energy_ratio de SpeechRecognition
+ADAPTACION = 0.02               # Peso de cada trama de silencio nueva en el piso guardado
+MIN_TRAMAS_SILENCIO = 10        # Tramas de silencio necesarias para actualizar
+INTERVALO_GUARDADO = 60.0       # Segundos mínimos entre escrituras del perfil
+MARGEN_RECORTE = 0.2            # Segundos que se conservan antes del inicio de la voz
+
+
+class PerfilRuido:
+    """Piso de ruido en dB (energía media por trama de 20 ms, como DetectorVoz).
+
+    Args:
+        piso_db: Piso de ruido
+        fuente: De dónde salió la calibración (archivo, micrófono...)
+        ruta: Archivo JSON donde se guarda
+    """
+
+    def __init__(self, piso_db, fuente="", ruta=RUTA_PERFIL, actualizado=None):
+        self.piso_db = piso_db
+        self.fuente = fuente
+        self.ruta = ruta
+        self.actualizado = actualizado or time.time()
+        self.actualizaciones = 0
+        self._guardado_en = 0.0
+
+    @classmethod
+    def desde_muestras(cls, muestras, frecuencia, fuente="", ruta=RUTA_PERFIL):
+        piso = DetectorVoz(frecuencia).calibrar(muestras)
+        if piso is None:
+            raise ValueError(f"La muestra de ruido ({fuente}) es demasiado corta")
+        return cls(piso, fuente, ruta)
+
+    @classmethod
+    def desde_wav(cls, ruta_wav, ruta=RUTA_PERFIL):
+        muestras, frecuencia = leer_mono(ruta_wav)
+        return cls.desde_muestras(muestras, frecuencia, ruta_wav, ruta)
+
+    @classmethod
+    def desde_microfono(cls, segundos=3, frecuencia=16000, ruta=RUTA_PERFIL):
+        """Graba unos segundos de ambiente con arecord (hay que estar en silencio)"""
+        cmd = ["arecord", "-q", "-t", "raw", "--format=S16_LE", f"--rate={frecuencia}", "-c1",
+               f"--duration={segundos}"]
+        data = subprocess.run(cmd, stdout=subprocess.PIPE, check=True).stdout
+        return cls.desde_muestras(np.frombuffer(data, dtype=np.int16), frecuencia, "micrófono", ruta)
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_PERFIL):
+        """Perfil guardado, o None si no existe o está dañado"""
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                datos = json.load(f)
+            return cls(float(datos["piso_db"]), datos.get("fuente", ""), ruta, datos.get("actualizado"))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def guardar(self):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(self.ruta) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"piso_db": self.piso_db, "fuente": self.fuente, "actualizado": self.actualizado}, f)
+        os.replace(temporal, self.ruta)
+        self._guardado_en = time.monotonic()
+
+    def _guardar_si_toca(self):
+        if time.monotonic() - self._guardado_en >= INTERVALO_GUARDADO:
+            self.guardar()
+
+    @property
+    def rms(self):
+        """Amplitud RMS del ruido (energia_db es 10·log10 de la potencia media)"""
+        return 10.0 ** (self.piso_db / 20.0)
+
+    @property
+    def umbral_energia(self):
+        """energy_threshold equivalente para speech_recognition.Recognizer"""
+        return self.rms * RELACION_ENERGIA
+
+    # --- Actualización -----------------------------------------------------
+
+    def actualizar(self, piso_db):
+        """Reemplaza el piso por uno ya refinado (p. ej. el de un DetectorVoz) y lo guarda cada tanto"""
+        self.piso_db = max(piso_db, PISO_MINIMO_DB)
+        self.actualizado = time.time()
+        self.actualizaciones += 1
+        self._guardar_si_toca()
+
+    def actualizar_desde_silencio(self, muestras, frecuencia):
+        """Refina el piso con las tramas de muestras que están por debajo del umbral de voz"""
+        energias = energia_db(np.asarray(muestras, dtype=np.int16), max(1, int(frecuencia * DURACION_TRAMA)))
+        silencio = energias[energias < self.piso_db + UMBRAL_DB]
+        if len(silencio) < MIN_TRAMAS_SILENCIO:
+            return False
+        peso = (1.0 - ADAPTACION) ** len(silencio)
+        self.actualizar(peso * self.piso_db + (1.0 - peso) * float(np.mean(silencio)))
+        return True
+
+    def actualizar_desde_wav(self, ruta_wav):
+        muestras, frecuencia = leer_mono(ruta_wav)
+        return self.actualizar_desde_silencio(muestras, frecuencia)
+
+    # --- Aplicación --------------------------------------------------------
+
+    def aplicar_detector(self, detector):
+        """Usa el perfil como piso inicial del VAD (camino de Vosk)"""
+        detector.piso_db = self.piso_db
+        return detector
+
+    def filtro(self, detector):
+        """Envuelve detector.filtrar: en los bloques de silencio el piso adaptado vuelve al perfil"""
+        self.aplicar_detector(detector)
+
+        def filtrar(data):
+            datos = detector.filtrar(data)
+            if datos is None:
+                self.actualizar(detector.piso_db)
+            return datos
+        return filtrar
+
+    def aplicar_speech_recognition(self, recognizer):
+        """Fija energy_threshold sin pasar por adjust_for_ambient_noise().
+
+        Solo lo usa Recognizer.listen(); para record() hay que recortar el audio.
+        """
+        recognizer.energy_threshold = self.umbral_energia
+        return recognizer
+
+    def inicio_voz(self, muestras, frecuencia, min_tramas=MIN_TRAMAS_VOZ):
+        """Primera muestra de voz según el perfil, o None si todo es ruido.
+
+        La voz empieza en la primera racha de min_tramas tramas seguidas por encima
+        del piso + UMBRAL_DB (los golpes sueltos no cuentan).
+        """
+        tamano_trama = max(1, int(frecuencia * DURACION_TRAMA))
+        activas = energia_db(np.asarray(muestras, dtype=np.int16), tamano_trama) >= self.piso_db + UMBRAL_DB
+        if len(activas) < min_tramas:
+            return 0 if activas.all() and len(activas) else None
+        rachas = np.convolve(activas.astype(np.int32), np.ones(min_tramas, dtype=np.int32), mode="valid")
+        indices = np.flatnonzero(rachas == min_tramas)
+        return int(indices[0]) * tamano_trama if len(indices) else None
+
+    def recortar(self, muestras, frecuencia, margen=MARGEN_RECORTE):
+        """Quita el ruido anterior a la voz, dejando margen segundos; vacío si no hay voz"""
+        inicio = self.inicio_voz(muestras, frecuencia)
+        if inicio is None:
+            return muestras[:0]
+        return muestras[max(0, inicio - int(margen * frecuencia)):]
+
+    def audio_speech_recognition(self, ruta_wav):
+        """speech_recognition.AudioData de ruta_wav sin el ruido inicial, o None si no hay voz"""
+        import speech_recognition as sr
+
+        muestras, frecuencia = leer_mono(ruta_wav)
+        muestras = self.recortar(muestras, frecuencia)
+        if not len(muestras):
+            return None
+        return sr.AudioData(muestras.tobytes(), frecuencia, 2)
+
+
+def obtener_perfil(ruta=RUTA_PERFIL, archivo_ruido=ARCHIVO_RUIDO, segundos_microfono=0):
+    """Perfil guardado; si no hay, se calibra con archivo_ruido o con el micrófono y se guarda.
+
+    Returns:
+        PerfilRuido, o None si no hay de dónde calibrar
+    """
+    perfil = PerfilRuido.cargar(ruta)
+    if perfil is not None:
+        return perfil
+    if archivo_ruido and os.path.exists(archivo_ruido):
+        perfil = PerfilRuido.desde_wav(archivo_ruido, ruta)
+    elif segundos_microfono > 0:
+        perfil = PerfilRuido.desde_microfono(segundos_microfono, ruta=ruta)
+    else:
+        return None
+    perfil.guardar()
+    return perfil
+
+
+def comprobar_recorte(frecuencia=16000, segundos_ruido=1.5):
+    """Genera ruido + tono y comprueba que recortar() quita el ruido inicial; devuelve los segundos quitados"""
+    rng = np.random.default_rng(0)
+    ruido = rng.normal(0, 60, int(frecuencia * segundos_ruido))
+    t = np.arange(frecuencia) / frecuencia
+    voz = 6000 * np.sin(2 * np.pi * 220 * t) + rng.normal(0, 60, frecuencia)
+    muestras = np.concatenate([ruido, voz]).astype(np.int16)
+
+    perfil = PerfilRuido.desde_muestras(muestras[:int(frecuencia * segundos_ruido)], frecuencia, "sintético",
+                                        ruta=os.devnull)
+    recortadas = perfil.recortar(muestras, frecuencia)
+    quitado = (len(muestras) - len(recortadas)) / frecuencia
+    esperado = segundos_ruido - MARGEN_RECORTE
+    if abs(quitado - esperado) > 2 * DURACION_TRAMA:
+        raise AssertionError(f"Recorte de {quitado:.2f}s, se esperaban {esperado:.2f}s")
+    if len(perfil.recortar(muestras[:len(ruido)], frecuencia)):
+        raise AssertionError("Un archivo solo de ruido no debería dejar audio")
+    return quitado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra y guarda el perfil de ruido ambiental")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--wav", help="Recalibrar con este archivo de ruido")
+    grupo.add_argument("--microfono", type=float, metavar="SEGUNDOS", help="Recalibrar grabando el ambiente")
+    parser.add_argument("--mostrar", action="store_true", help="Solo mostrar el perfil guardado")
+    parser.add_argument("--ruta", default=RUTA_PERFIL, help="Archivo del perfil")
+    parser.add_argument("--comprobar", action="store_true",
+                        help="Comprobar que se recorta el ruido inicial de un audio sintético")
+    args = parser.parse_args()
+
+    if args.comprobar:
+        print(f"Recorte correcto: {comprobar_recorte():.2f}s de ruido inicial quitados")
+        return
+
+    if args.mostrar:
+        perfil = PerfilRuido.cargar(args.ruta)
+    elif args.wav or args.microfono:
+        if args.wav:
+            perfil = PerfilRuido.desde_wav(args.wav, args.ruta)
+        else:
+            print(f"Grabando {args.microfono:g}s de ambiente, no hables...")
+            perfil = PerfilRuido.desde_microfono(args.microfono, ruta=args.ruta)
+        perfil.guardar()
+    else:
+        perfil = obtener_perfil(args.ruta)
+
+    if perfil is None:
+        print(f"No hay perfil en {args.ruta} ni {ARCHIVO_RUIDO} para calibrar.")
+        return
+    print(f"Perfil de ruido ({perfil.fuente}): piso {perfil.piso_db:.1f} dB, "
+          f"energy_threshold {perfil.umbral_energia:.0f}")
+    print(f"Guardado en {perfil.ruta}, actualizado "
+          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(perfil.actualizado))}")
+
+
+if __name__ == "__main__":
+    main()
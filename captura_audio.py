@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Captura de micrófono no bloqueante con buffer circular
+PyAudio escribe en modo callback sobre un buffer circular preasignado y un
+hilo aparte consume el audio y lo pasa al reconocedor. Así una llamada lenta
+a AcceptWaveform no provoca desbordes en la entrada de audio.
+
+Para pruebas sin micrófono, FlujoArchivoFalso reproduce un WAV del
+repositorio llamando al callback a ritmo de tiempo real.
+
+Uso:
+    python captura_audio.py [ruta_modelo] [--archivo test.wav]
+"""
+
+import os
+import sys
+import time
+import wave
+import threading
+
+from resultados_stt import PublicadorResultados, INTERVALO_PARCIALES
+from bloque_adaptativo import TamanoBloqueAdaptativo
+
+# Configuración de audio
+FRAME_RATE = 16000
+CHUNK_SIZE = 8000           # Frames que se entregan al reconocedor en cada bloque
+FRAMES_CALLBACK = 1024      # Frames por llamada al callback de PyAudio
+SEGUNDOS_BUFFER = 10        # Capacidad del buffer circular
+
+# Constantes de PyAudio (se repiten aquí para no importar pyaudio con el flujo falso)
+PA_CONTINUE = 0
+PA_COMPLETE = 1
+PA_INPUT_OVERFLOW = 0x2
+
+
+class BufferCircular:
+    """Buffer circular de un productor y un consumidor sobre un bytearray preasignado.
+
+    El productor (callback de audio) solo modifica la posición de escritura y el
+    consumidor solo la de lectura, así que no se necesitan locks: cada posición es
+    un entero que se reemplaza de forma atómica. Si el consumidor se retrasa, los
+    datos nuevos que no caben se descartan y se cuentan como desborde.
+    """
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self._datos = bytearray(capacidad)
+        self._vista = memoryview(self._datos)
+        self._escritos = 0      # Total de bytes escritos (solo productor)
+        self._leidos = 0        # Total de bytes leídos (solo consumidor)
+        self.bytes_descartados = 0
+        self.desbordes = 0
+
+    def disponibles(self):
+        return self._escritos - self._leidos
+
+    def escribir(self, data):
+        """Copia data al buffer; devuelve False si hubo que descartar audio"""
+        n = len(data)
+        libres = self.capacidad - (self._escritos - self._leidos)
+        completo = n <= libres
+        if not completo:
+            self.desbordes += 1
+            self.bytes_descartados += n - libres
+            n = libres
+        inicio = self._escritos % self.capacidad
+        primera = min(n, self.capacidad - inicio)
+        self._vista[inicio:inicio + primera] = data[:primera]
+        if primera < n:
+            self._vista[0:n - primera] = data[primera:n]
+        self._escritos += n
+        return completo
+
+    def leer(self, n):
+        """Devuelve exactamente n bytes, o None si aún no hay suficientes"""
+        if self.disponibles() < n:
+            return None
+        inicio = self._leidos % self.capacidad
+        primera = min(n, self.capacidad - inicio)
+        salida = bytes(self._vista[inicio:inicio + primera])
+        if primera < n:
+            salida += bytes(self._vista[0:n - primera])
+        self._leidos += n
+        return salida
+
+
+class FlujoArchivoFalso:
+    """Sustituto de un stream de PyAudio que lee un WAV y llama al callback en tiempo real.
+
+    El audio se entrega siempre mono de 16 bits, como el stream del micrófono:
+    los WAV estéreo se promedian (como detector_voz.leer_mono) y, si se indica
+    frecuencia y el archivo tiene otra, se remuestrea por interpolación lineal.
+    """
+
+    def __init__(self, ruta, callback, frames_por_buffer=FRAMES_CALLBACK, velocidad=1.0, frecuencia=None):
+        import numpy as np
+        from detector_voz import leer_mono
+
+        muestras, frecuencia_archivo = leer_mono(ruta)
+        if frecuencia and frecuencia != frecuencia_archivo and len(muestras):
+            n = int(round(len(muestras) * frecuencia / frecuencia_archivo))
+            posiciones = np.arange(n) * (frecuencia_archivo / frecuencia)
+            muestras = np.interp(posiciones, np.arange(len(muestras)), muestras).astype(np.int16)
+        self.frecuencia = frecuencia or frecuencia_archivo
+        self._datos = muestras.tobytes()
+        self._posicion = 0
+        self._callback = callback
+        self._frames = frames_por_buffer
+        self._velocidad = velocidad
+        self._activo = False
+        self._hilo = None
+
+    def _ejecutar(self):
+        periodo = self._frames / self.frecuencia / self._velocidad
+        siguiente = time.monotonic()
+        while self._activo:
+            data = self._datos[self._posicion:self._posicion + self._frames * 2]
+            self._posicion += len(data)
+            if not data:
+                break
+            info = {"input_buffer_adc_time": time.monotonic(), "current_time": time.monotonic()}
+            if self._callback(data, len(data) // 2, info, 0)[1] != PA_CONTINUE:
+                break
+            siguiente += periodo
+            espera = siguiente - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+        self._activo = False
+
+    def start_stream(self):
+        self._activo = True
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+
+    def is_active(self):
+        return self._activo
+
+    def stop_stream(self):
+        self._activo = False
+        if self._hilo:
+            self._hilo.join()
+
+    def close(self):
+        self._datos = b""
+
+
+class CapturaMicrofono:
+    """Captura en modo callback y decodificación en un hilo consumidor.
+
+    Args:
+        reconocedor: Objeto con la interfaz de KaldiRecognizer
+        frecuencia: Frecuencia de muestreo
+        frames_bloque: Frames que se pasan al reconocedor en cada llamada
+        archivo: Si se indica, se usa FlujoArchivoFalso en lugar del micrófono
+        al_resultado: Función llamada con el texto de cada resultado final
+        al_parcial: Función llamada con cada resultado parcial
+        filtro: Función opcional (p. ej. DetectorVoz.filtrar) que devuelve los
+            bytes que se envían al reconocedor (con el pre-roll al empezar la voz)
+            o None para descartar el bloque; al terminar una frase se pide
+            FinalResult() para no dejar texto pendiente
+        intervalo_parciales: Segundos mínimos entre parciales
+        adaptativo: Ajustar el tamaño de cada bloque (TamanoBloqueAdaptativo) en
+            lugar de usar siempre frames_bloque: pequeños con voz, grandes en silencio
+
+    Los resultados también se pueden recibir como eventos suscribiéndose a
+    self.resultados (PublicadorResultados), con callbacks o con
+    "async for evento in captura.resultados.eventos()".
+    """
+
+    def __init__(self, reconocedor, frecuencia=FRAME_RATE, frames_bloque=CHUNK_SIZE, archivo=None,
+                 al_resultado=None, al_parcial=None, filtro=None, intervalo_parciales=INTERVALO_PARCIALES,
+                 adaptativo=False):
+        self.reconocedor = reconocedor
+        self.frecuencia = frecuencia
+        self.bytes_bloque = frames_bloque * 2
+        self.tamano = TamanoBloqueAdaptativo(frecuencia) if adaptativo else None
+        self.buffer = BufferCircular(frecuencia * 2 * SEGUNDOS_BUFFER)
+        self.archivo = archivo
+        self.al_resultado = al_resultado or (lambda texto: print(f"Reconocido: {texto}"))
+        self.al_parcial = al_parcial or (lambda texto: print(f"Parcial: {texto}", end='\r'))
+        self.filtro = filtro
+        self.resultados = PublicadorResultados(intervalo_parciales)
+        self.resultados.suscribir(self._al_evento)
+
+        self._pyaudio = None
+        self._stream = None
+        self._hilo = None
+        self._detener = threading.Event()
+        self._hay_datos = threading.Event()
+        self._en_voz = False
+
+        # Métricas
+        self.desbordes_entrada = 0      # Reportados por PortAudio (paInputOverflow)
+        self.bloques_decodificados = 0
+        self.latencia_maxima = 0.0      # Segundos entre la captura y el fin de la decodificación
+        self._latencia_total = 0.0
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        # Solo copiar al buffer: nada de trabajo pesado en el hilo de audio
+        if status & PA_INPUT_OVERFLOW:
+            self.desbordes_entrada += 1
+        self.buffer.escribir(in_data)
+        self._hay_datos.set()
+        return (None, PA_CONTINUE)
+
+    def _al_evento(self, evento):
+        if evento["tipo"] == "final":
+            self.al_resultado(evento["texto"])
+        elif evento["tipo"] == "parcial":
+            self.al_parcial(evento["texto"])
+
+    def _decodificar(self):
+        while not self._detener.is_set():
+            data = self.buffer.leer(self.tamano.frames_bloque * 2 if self.tamano else self.bytes_bloque)
+            if data is None:
+                if self.archivo and not self._stream.is_active():
+                    # Fin del archivo: vaciar lo que quede en el buffer
+                    data = self.buffer.leer(self.buffer.disponibles())
+                    if data:
+                        self._procesar_bloque(data)
+                    break
+                self._hay_datos.wait(0.1)
+                self._hay_datos.clear()
+                continue
+            self._procesar_bloque(data)
+
+        self.resultados.final(self.reconocedor.FinalResult())
+        self.resultados.cerrar()
+
+    def _procesar_bloque(self, data):
+        # El bloque más antiguo que contiene data entró al buffer hace:
+        retraso = (self.buffer.disponibles() + len(data)) / (self.frecuencia * 2)
+        inicio = time.monotonic()
+
+        datos = data if self.filtro is None else self.filtro(data)
+        es_voz = datos is not None
+        if not es_voz:
+            if self._en_voz:
+                self._en_voz = False
+                self.resultados.final(self.reconocedor.FinalResult())
+        else:
+            self._en_voz = True
+            if self.reconocedor.AcceptWaveform(datos):
+                self.resultados.final(self.reconocedor.Result())
+            elif self.resultados.quiere_parcial():
+                # Solo se pide el parcial si ya pasó el intervalo mínimo; si no cambió no se emite
+                self.resultados.parcial(self.reconocedor.PartialResult())
+
+        tiempo = time.monotonic() - inicio
+        latencia = retraso + tiempo
+        if self.tamano is not None:
+            self.tamano.registrar(len(data) // 2, tiempo, es_voz, self.buffer.disponibles() // 2, latencia)
+        self.bloques_decodificados += 1
+        self._latencia_total += latencia
+        self.latencia_maxima = max(self.latencia_maxima, latencia)
+
+    def iniciar(self):
+        """Abre el stream de entrada y arranca el hilo decodificador"""
+        if self.archivo:
+            self._stream = FlujoArchivoFalso(self.archivo, self._callback, frecuencia=self.frecuencia)
+        else:
+            import pyaudio
+            self._pyaudio = pyaudio.PyAudio()
+            self._stream = self._pyaudio.open(
+                format=pyaudio.paInt16, channels=1, rate=self.frecuencia, input=True,
+                frames_per_buffer=FRAMES_CALLBACK, stream_callback=self._callback,
+                start=False,
+            )
+        self._stream.start_stream()
+        self._hilo = threading.Thread(target=self._decodificar, daemon=True)
+        self._hilo.start()
+
+    def esperar(self, timeout=None):
+        """Espera a que termine el hilo decodificador (fin del archivo o detener())"""
+        self._hilo.join(timeout)
+        return not self._hilo.is_alive()
+
+    def detener(self):
+        """Detiene la captura y el hilo decodificador, y libera el dispositivo"""
+        self._detener.set()
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+        if self._hilo:
+            self._hilo.join()
+        if self._pyaudio:
+            self._pyaudio.terminate()
+
+    def metricas(self):
+        """Contadores de desborde y latencia de decodificación"""
+        return {
+            "desbordes_entrada": self.desbordes_entrada,
+            "desbordes_buffer": self.buffer.desbordes,
+            "bytes_descartados": self.buffer.bytes_descartados,
+            "bloques_decodificados": self.bloques_decodificados,
+            "latencia_media": self._latencia_total / self.bloques_decodificados if self.bloques_decodificados else 0.0,
+            "latencia_maxima": self.latencia_maxima,
+            "ocupacion_buffer": self.buffer.disponibles() / self.buffer.capacidad,
+            **self.resultados.estadisticas(),
+        }
+
+
+def main():
+    import argparse
+    from servidor_vosk import crear_reconocedor
+
+    parser = argparse.ArgumentParser(description="Reconocimiento en tiempo real con captura no bloqueante")
+    parser.add_argument("ruta_modelo", nargs="?", default="modelo_vosk_es", help="Ruta del modelo de Vosk")
+    parser.add_argument("--archivo", help="WAV que sustituye al micrófono (prueba sin hardware)")
+    parser.add_argument("--adaptativo", action="store_true", help="Tamaño de bloque adaptativo")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta_modelo):
+        print(f"Error: El modelo en {args.ruta_modelo} no existe.")
+        sys.exit(1)
+
+    frecuencia = FRAME_RATE
+    if args.archivo:
+        with wave.open(args.archivo, "rb") as wf:
+            frecuencia = wf.getframerate()
+
+    captura = CapturaMicrofono(crear_reconocedor(args.ruta_modelo, frecuencia), frecuencia, archivo=args.archivo,
+                               adaptativo=args.adaptativo)
+    print(f"Escuchando {'el archivo ' + args.archivo if args.archivo else 'el micrófono'}... (Ctrl+C para salir)")
+    captura.iniciar()
+    try:
+        while not captura.esperar(1.0):
+            pass
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        captura.detener()
+        for nombre, valor in captura.metricas().items():
+            print(f"{nombre}: {valor:.3f}" if isinstance(valor, float) else f"{nombre}: {valor}")
+        if captura.tamano is not None:
+            for nombre, valor in captura.tamano.estadisticas().items():
+                print(f"{nombre}: {valor:.3f}" if isinstance(valor, float) else f"{nombre}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cliente compartido de Eleven Labs con pool de conexiones
+Un solo httpx.Client con keep-alive para todo el proceso: las peticiones
+reutilizan la conexión (sin repetir DNS, TCP y TLS), el id de la voz se
+resuelve una vez en lugar de listar las voces en cada generate(), y un
+semáforo limita cuántas síntesis van a la vez (cada una ocupa su plaza
+solo mientras se recibe la respuesta, no mientras se reproduce). Los errores transitorios
+(conexión, 429, 5xx) se reintentan con espera exponencial mientras no haya
+llegado ningún byte de audio. Se registran histogramas de latencia hasta el
+primer byte y total.
+
+Uso (benchmark contra el servidor falso):
+    python cliente_tts.py [--peticiones 20] [--concurrencia 4] [--retardo-conexion 0.1]
+"""
+
+import re
+import time
+import queue
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Pool y concurrencia
+MAX_CONEXIONES = 4
+MAX_CONCURRENCIA = 2
+KEEPALIVE = 60.0            # Segundos que se conserva una conexión ociosa
+TIMEOUT = 30.0
+TIMEOUT_CONEXION = 5.0
+
+# Reintentos
+REINTENTOS = 3
+ESPERA_INICIAL = 0.25
+ESPERA_MAXIMA = 4.0
+ESTADOS_REINTENTABLES = {408, 409, 429, 500, 502, 503, 504}
+
+BYTES_CHUNK = 4096
+
+_FIN = object()             # Fin de la respuesta en la cola de chunks
+
+
+def es_id_voz(voz):
+    """Los ids de voz de Eleven Labs son 20 caracteres alfanuméricos"""
+    return bool(re.fullmatch(r"[a-zA-Z0-9]{20}", voz))
+
+
+class HistogramaLatencia:
+    """Histograma de latencias con cubetas fijas y percentiles de las últimas muestras"""
+
+    LIMITES = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+    MAX_MUESTRAS = 1000
+
+    def __init__(self):
+        self.cubetas = [0] * (len(self.LIMITES) + 1)
+        self._muestras = []
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos):
+        with self._lock:
+            i = 0
+            while i < len(self.LIMITES) and segundos > self.LIMITES[i]:
+                i += 1
+            self.cubetas[i] += 1
+            self._muestras.append(segundos)
+            if len(self._muestras) > self.MAX_MUESTRAS:
+                del self._muestras[0]
+
+    def percentil(self, p):
+        with self._lock:
+            if not self._muestras:
+                return 0.0
+            ordenadas = sorted(self._muestras)
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+    def resumen(self):
+        return {
+            "n": sum(self.cubetas),
+            "p50": self.percentil(50),
+            "p95": self.percentil(95),
+            "p99": self.percentil(99),
+            "max": max(self._muestras, default=0.0),
+        }
+
+    def texto(self, ancho=40):
+        """Representación en barras para imprimir en la terminal"""
+        total = max(1, max(self.cubetas))
+        lineas = []
+        etiquetas = [f"<= {limite * 1000:.0f} ms" for limite in self.LIMITES] + [f">  {self.LIMITES[-1] * 1000:.0f} ms"]
+        for etiqueta, cuenta in zip(etiquetas, self.cubetas):
+            if cuenta:
+                lineas.append(f"{etiqueta:>12} | {'#' * max(1, cuenta * ancho // total)} {cuenta}")
+        return "\n".join(lineas)
+
+
+class ClienteTTS:
+    """Cliente de Eleven Labs reutilizable entre hilos.
+
+    Args:
+        api_key: API key de Eleven Labs
+        base_url: URL base de la API (None para la oficial)
+        max_conexiones: Conexiones abiertas como máximo en el pool
+        max_concurrencia: Síntesis simultáneas como máximo
+        reintentos: Reintentos ante errores transitorios
+    """
+
+    def __init__(self, api_key, base_url=None, max_conexiones=MAX_CONEXIONES,
+                 max_concurrencia=MAX_CONCURRENCIA, reintentos=REINTENTOS):
+        from elevenlabs import ElevenLabs
+
+        self.http = httpx.Client(
+            limits=httpx.Limits(max_connections=max_conexiones, max_keepalive_connections=max_conexiones,
+                                keepalive_expiry=KEEPALIVE),
+            timeout=httpx.Timeout(TIMEOUT, connect=TIMEOUT_CONEXION),
+            follow_redirects=True,
+        )
+        if base_url:
+            self.client = ElevenLabs(api_key=api_key, base_url=base_url, httpx_client=self.http)
+        else:
+            self.client = ElevenLabs(api_key=api_key, httpx_client=self.http)
+        self.reintentos = reintentos
+        self._semaforo = threading.BoundedSemaphore(max_concurrencia)
+        self._ids_voz = {}
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.latencia_primer_byte = HistogramaLatencia()
+        self.latencia_total = HistogramaLatencia()
+        self.peticiones = 0
+        self.reintentos_realizados = 0
+        self.errores = 0
+
+    def id_voz(self, voz):
+        """Id de una voz a partir de su nombre (se consulta la API una sola vez)"""
+        if es_id_voz(voz):
+            return voz
+        with self._lock:
+            if voz not in self._ids_voz:
+                for v in self.client.voices.get_all().voices:
+                    self._ids_voz[v.name] = v.voice_id
+            if voz not in self._ids_voz:
+                raise ValueError(f"No existe la voz {voz!r}")
+            return self._ids_voz[voz]
+
+    def _reintentable(self, error):
+        from elevenlabs.core.api_error import ApiError
+
+        if isinstance(error, ApiError):
+            return error.status_code in ESTADOS_REINTENTABLES
+        return isinstance(error, (httpx.TransportError, httpx.RemoteProtocolError))
+
+    def generar(self, texto, voz, modelo, formato):
+        """Generador de chunks de audio; respeta el límite de concurrencia y reintenta.
+
+        La respuesta se recibe en un hilo propio: la plaza del semáforo se
+        libera y la latencia total se registra al terminar de llegar el cuerpo,
+        sin depender de lo rápido que se consuman (reproduzcan) los chunks.
+        Si se deja de consumir el generador, la descarga se cancela.
+        """
+        voice_id = self.id_voz(voz)
+        cola = queue.Queue()
+        cancelado = threading.Event()
+        threading.Thread(target=self._descargar, args=(voice_id, texto, modelo, formato, cola, cancelado),
+                         name="tts-descarga", daemon=True).start()
+        try:
+            while True:
+                item = cola.get()
+                if item is _FIN:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelado.set()
+
+    def _descargar(self, voice_id, texto, modelo, formato, cola, cancelado):
+        """Hilo de descarga: ocupa una plaza del semáforo solo mientras llega la respuesta"""
+        try:
+            with self._semaforo:
+                self._recibir(voice_id, texto, modelo, formato, cola, cancelado)
+        except Exception as e:
+            cola.put(e)
+        finally:
+            cola.put(_FIN)
+
+    def _recibir(self, voice_id, texto, modelo, formato, cola, cancelado):
+        """Pasa los chunks a la cola. Solo se reintenta antes del primer chunk: una vez
+        que el audio empezó a sonar, repetir la petición duplicaría lo ya reproducido.
+        """
+        intento = 0
+        inicio = time.monotonic()     # Las latencias incluyen las esperas entre reintentos
+        while True:
+            self.peticiones += 1
+            recibido = False
+            try:
+                respuesta = self.client.text_to_speech.convert_as_stream(
+                    voice_id, text=texto, model_id=modelo, output_format=formato,
+                    request_options={"chunk_size": BYTES_CHUNK})
+                for chunk in respuesta:
+                    if cancelado.is_set():
+                        respuesta.close()
+                        return
+                    if not recibido:
+                        recibido = True
+                        self.latencia_primer_byte.registrar(time.monotonic() - inicio)
+                    cola.put(chunk)
+                self.latencia_total.registrar(time.monotonic() - inicio)
+                return
+            except Exception as e:
+                if recibido or intento >= self.reintentos or not self._reintentable(e):
+                    self.errores += 1
+                    raise
+                espera = min(ESPERA_MAXIMA, ESPERA_INICIAL * 2 ** intento) * random.uniform(0.5, 1.0)
+                intento += 1
+                self.reintentos_realizados += 1
+                logger.warning("Error de síntesis (%s); reintento %d en %.2fs", e, intento, espera)
+                if cancelado.wait(espera):
+                    return
+
+    def metricas(self):
+        return {
+            "peticiones": self.peticiones,
+            "reintentos": self.reintentos_realizados,
+            "errores": self.errores,
+            "primer_byte": self.latencia_primer_byte.resumen(),
+            "total": self.latencia_total.resumen(),
+        }
+
+    def cerrar(self):
+        self.http.close()
+
+
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+
+def obtener_cliente(api_key, base_url=None, **opciones):
+    """Cliente compartido por proceso para cada (api_key, base_url)"""
+    with _lock_clientes:
+        if (api_key, base_url) not in _clientes:
+            _clientes[(api_key, base_url)] = ClienteTTS(api_key, base_url, **opciones)
+        return _clientes[(api_key, base_url)]
+
+
+def _sin_pool(base_url, texto, voz, modelo, formato):
+    # Lo que hacía testeleven.py: un cliente nuevo por frase y la voz por nombre
+    from elevenlabs import ElevenLabs
+
+    inicio = time.monotonic()
+    with httpx.Client(timeout=TIMEOUT) as http:
+        client = ElevenLabs(api_key="falsa", base_url=base_url, httpx_client=http)
+        b"".join(client.generate(text=texto, voice=voz, model=modelo, stream=True, output_format=formato))
+    return time.monotonic() - inicio
+
+
+def _con_pool(cliente, texto, voz, modelo, formato):
+    inicio = time.monotonic()
+    b"".join(cliente.generar(texto, voz, modelo, formato))
+    return time.monotonic() - inicio
+
+
+def main():
+    from servidor_eleven_falso import ServidorElevenFalso
+
+    parser = argparse.ArgumentParser(description="Benchmark del cliente de Eleven Labs con y sin pool")
+    parser.add_argument("--peticiones", type=int, default=20)
+    parser.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCIA, help="Hilos que piden a la vez")
+    parser.add_argument("--retardo-conexion", type=float, default=0.1,
+                        help="Coste simulado de abrir una conexión (TCP + TLS)")
+    parser.add_argument("--tasa-error", type=float, default=0.1, help="Probabilidad de 503 en el servidor")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    texto = "Hola, esta es una frase de prueba."
+    voz, modelo, formato = "Rachel", "eleven_multilingual_v2", "pcm_22050"
+    servidor = ServidorElevenFalso(puerto=0, retardo_primer_byte=0.05, retardo_chunk=0.0,
+                                   retardo_conexion=args.retardo_conexion, tasa_error=0.0)
+    servidor.iniciar_en_hilo()
+
+    try:
+        with ThreadPoolExecutor(args.concurrencia) as executor:
+            tiempos = HistogramaLatencia()
+            inicio = time.monotonic()
+            for t in executor.map(lambda _: _sin_pool(servidor.url, texto, voz, modelo, formato),
+                                  range(args.peticiones)):
+                tiempos.registrar(t)
+            duracion = time.monotonic() - inicio
+            r = tiempos.resumen()
+            print(f"Sin pool: {servidor.conexiones} conexiones, {servidor.peticiones} peticiones HTTP, "
+                  f"p50 {r['p50'] * 1000:.0f} ms, p95 {r['p95'] * 1000:.0f} ms, {duracion:.2f}s en total")
+
+            servidor.conexiones = servidor.peticiones = 0
+            servidor.tasa_error = args.tasa_error
+            cliente = ClienteTTS("falsa", servidor.url, max_concurrencia=args.concurrencia)
+            inicio = time.monotonic()
+            list(executor.map(lambda _: _con_pool(cliente, texto, voz, modelo, formato), range(args.peticiones)))
+            duracion = time.monotonic() - inicio
+            m = cliente.metricas()
+            print(f"Con pool: {servidor.conexiones} conexiones, {servidor.peticiones} peticiones HTTP "
+                  f"({servidor.errores} errores simulados, {m['reintentos']} reintentos), "
+                  f"p50 {m['total']['p50'] * 1000:.0f} ms, p95 {m['total']['p95'] * 1000:.0f} ms, "
+                  f"{duracion:.2f}s en total")
+            print("\nLatencia hasta el primer byte (con pool):")
+            print(cliente.latencia_primer_byte.texto())
+            cliente.cerrar()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reconocimiento de comandos con vocabulario cerrado
+Para las órdenes del asistente no hace falta el dictado libre: el
+reconocedor se crea con una gramática (la lista de frases de los comandos
+más "[unk]"), así Kaldi solo busca entre esas frases y decodifica mucho más
+rápido y con menos CPU. Cada frase reconocida se traduce a una intención;
+si lo dicho no es un comando, el mismo audio se pasa al reconocedor de
+dictado libre (respaldo).
+
+Los comandos se leen de comandos.json (o de la variable COMANDOS_VOZ):
+    {"detener": ["para", "detente"], "hora": ["qué hora es"], ...}
+
+ReconocedorComandos tiene la interfaz de KaldiRecognizer, así que se puede
+usar con CapturaMicrofono o con el asistente; Result() devuelve además la
+intención, el modo (gramatica o libre) y la latencia de la decisión.
+
+Uso:
+    python comandos_voz.py [ruta_modelo] [--archivo test.wav] [--comandos comandos.json] [--sin-respaldo]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+
+from servidor_vosk import crear_reconocedor, RUTA_SOCKET
+
+ARCHIVO_COMANDOS = os.getenv("COMANDOS_VOZ", "comandos.json")
+
+# Las palabras tienen que estar en el vocabulario del modelo; Kaldi ignora las que no
+COMANDOS_PREDETERMINADOS = {
+    "detener": ["para", "detente", "silencio", "cállate"],
+    "repetir": ["repite", "otra vez"],
+    "subir_volumen": ["sube el volumen", "más alto"],
+    "bajar_volumen": ["baja el volumen", "más bajo"],
+    "hora": ["qué hora es"],
+    "apagar": ["apágate", "apagar"],
+}
+
+DESCONOCIDO = "[unk]"
+
+
+def normalizar(frase):
+    return " ".join(re.sub(r"[^\w\s]", " ", frase.lower()).split())
+
+
+def cargar_comandos(ruta=ARCHIVO_COMANDOS):
+    """Intenciones y sus frases desde un JSON, o las predeterminadas si no existe"""
+    if not os.path.exists(ruta):
+        return dict(COMANDOS_PREDETERMINADOS)
+    with open(ruta, encoding="utf-8") as f:
+        comandos = json.load(f)
+    if not isinstance(comandos, dict) or not all(isinstance(v, list) for v in comandos.values()):
+        raise ValueError(f"{ruta}: se esperaba un objeto {{intención: [frases]}}")
+    return comandos
+
+
+class ReconocedorComandos:
+    """Reconocedor con gramática de comandos y respaldo de dictado libre.
+
+    Args:
+        modelo: Ruta del modelo de Vosk
+        frecuencia: Frecuencia de muestreo del audio
+        comandos: Diccionario {intención: [frases]} (por defecto cargar_comandos())
+        respaldo: Si lo dicho no es un comando, decodificarlo con el dictado libre
+        al_decision: Función llamada con cada decisión (diccionario)
+    """
+
+    def __init__(self, modelo, frecuencia, comandos=None, respaldo=True, al_decision=None,
+                 ruta_socket=RUTA_SOCKET):
+        self.modelo = modelo
+        self.frecuencia = frecuencia
+        self.respaldo = respaldo
+        self.al_decision = al_decision
+        self.ruta_socket = ruta_socket
+        comandos = comandos if comandos is not None else cargar_comandos()
+        self._intenciones = {normalizar(frase): intencion
+                             for intencion, frases in comandos.items() for frase in frases}
+        self.gramatica = sorted(self._intenciones) + [DESCONOCIDO]
+        self._reconocedor = crear_reconocedor(modelo, frecuencia, ruta_socket, self.gramatica)
+        self._libre = None          # Reconocedor de dictado, se crea con el primer respaldo
+
+        self._audio = bytearray()   # Audio de la frase en curso, por si hace falta el respaldo
+        self._tiempo_frase = 0.0    # Tiempo de decodificación de la frase en curso
+        self._decision = None
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.segundos_audio = 0.0
+        self.tiempo_decodificacion = 0.0
+        self._latencias = {"gramatica": [], "libre": []}
+
+    # --- Interfaz de KaldiRecognizer ---------------------------------------
+
+    def AcceptWaveform(self, data):
+        """Devuelve True cuando hay una decisión disponible en Result()"""
+        inicio = time.monotonic()
+        self._audio += data
+        self.segundos_audio += len(data) / 2 / self.frecuencia
+        fin_frase = self._reconocedor.AcceptWaveform(data)
+        self._tiempo_frase += time.monotonic() - inicio
+        if fin_frase:
+            self._decision = self._decidir(self._reconocedor.Result(), inicio)
+        return self._decision is not None
+
+    def Result(self):
+        decision, self._decision = self._decision, None
+        return json.dumps(decision or {"text": ""}, ensure_ascii=False)
+
+    def PartialResult(self):
+        return self._reconocedor.PartialResult()
+
+    def FinalResult(self):
+        decision = self._decidir(self._reconocedor.FinalResult(), time.monotonic())
+        self._decision = None
+        return json.dumps(decision or {"text": ""}, ensure_ascii=False)
+
+    def SetWords(self, activar):
+        self._reconocedor.SetWords(activar)
+
+    # --- Decisión ----------------------------------------------------------
+
+    def _decidir(self, resultado, inicio):
+        """Traduce el resultado de la gramática a una decisión, con respaldo si no es un comando.
+
+        inicio es el instante en que llegó el último bloque de la frase: la
+        latencia de la decisión es el tiempo desde entonces.
+        """
+        texto = json.loads(resultado).get("text", "")
+        audio, self._audio = self._audio, bytearray()
+        tiempo, self._tiempo_frase = self._tiempo_frase, 0.0
+        if not texto:
+            # Silencio: no hay nada que decidir
+            self.tiempo_decodificacion += tiempo
+            return None
+
+        palabras = texto.split()
+        intencion = None if DESCONOCIDO in palabras else self._intenciones.get(texto)
+        modo = "gramatica"
+        if intencion is None:
+            texto = " ".join(p for p in palabras if p != DESCONOCIDO)
+            if self.respaldo and audio:
+                modo = "libre"
+                antes = time.monotonic()
+                texto = self._dictado(bytes(audio))
+                tiempo += time.monotonic() - antes
+
+        latencia = time.monotonic() - inicio
+        self.tiempo_decodificacion += tiempo
+        decision = {"text": texto, "intencion": intencion, "modo": modo, "latencia": latencia,
+                    "tiempo_decodificacion": tiempo}
+        with self._lock:
+            self._latencias[modo].append(latencia)
+        if self.al_decision:
+            self.al_decision(decision)
+        return decision
+
+    def _dictado(self, audio):
+        if self._libre is None:
+            self._libre = crear_reconocedor(self.modelo, self.frecuencia, self.ruta_socket)
+        segmentos = []
+        for inicio in range(0, len(audio), 16000):
+            if self._libre.AcceptWaveform(audio[inicio:inicio + 16000]):
+                segmentos.append(json.loads(self._libre.Result()).get("text", ""))
+        segmentos.append(json.loads(self._libre.FinalResult()).get("text", ""))
+        return " ".join(s for s in segmentos if s)
+
+    def estadisticas(self):
+        """Decisiones por modo, latencia media y máxima de cada uno y RTF total"""
+        with self._lock:
+            resultado = {modo: {"decisiones": len(l),
+                                "latencia_media": sum(l) / len(l) if l else 0.0,
+                                "latencia_maxima": max(l, default=0.0)}
+                         for modo, l in self._latencias.items()}
+        resultado["rtf"] = self.tiempo_decodificacion / self.segundos_audio if self.segundos_audio else 0.0
+        return resultado
+
+
+def _decodificar_archivo(reconocedor, muestras, frecuencia, frames_bloque=4000):
+    """Pasa el audio completo al reconocedor y devuelve (resultados, tiempo, CPU)"""
+    data = muestras.tobytes()
+    paso = frames_bloque * 2
+    resultados = []
+    inicio, cpu = time.monotonic(), time.process_time()
+    for pos in range(0, len(data), paso):
+        if reconocedor.AcceptWaveform(data[pos:pos + paso]):
+            resultados.append(json.loads(reconocedor.Result()))
+    resultados.append(json.loads(reconocedor.FinalResult()))
+    return [r for r in resultados if r.get("text")], time.monotonic() - inicio, time.process_time() - cpu
+
+
+def _imprimir_decision(decision):
+    intencion = decision["intencion"] or "-"
+    print(f"[{decision['modo']}] intención {intencion}: \"{decision['text']}\" "
+          f"({decision['latencia'] * 1000:.0f} ms)")
+
+
+def main():
+    from detector_voz import leer_mono
+
+    parser = argparse.ArgumentParser(description="Reconocimiento de comandos con vocabulario cerrado")
+    parser.add_argument("ruta_modelo", nargs="?", default="modelo_vosk_es", help="Ruta del modelo de Vosk")
+    parser.add_argument("--archivo", help="WAV a decodificar en lugar del micrófono")
+    parser.add_argument("--comandos", default=ARCHIVO_COMANDOS, help="JSON con las intenciones y sus frases")
+    parser.add_argument("--sin-respaldo", action="store_true", help="No usar el dictado libre si no hay comando")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta_modelo):
+        print(f"Error: El modelo en {args.ruta_modelo} no existe.")
+        sys.exit(1)
+    comandos = cargar_comandos(args.comandos)
+    print(f"{len(comandos)} intenciones: {', '.join(comandos)}")
+
+    if args.archivo:
+        muestras, frecuencia = leer_mono(args.archivo)
+        duracion = len(muestras) / frecuencia
+        comandos_rec = ReconocedorComandos(args.ruta_modelo, frecuencia, comandos, not args.sin_respaldo,
+                                           al_decision=_imprimir_decision)
+        _, tiempo, cpu = _decodificar_archivo(comandos_rec, muestras, frecuencia)
+        stats = comandos_rec.estadisticas()
+        print(f"Comandos: RTF {tiempo / duracion:.3f}, CPU {cpu:.2f}s "
+              f"({stats['gramatica']['decisiones']} por gramática, {stats['libre']['decisiones']} por respaldo)")
+
+        # Mismo audio con dictado libre, para comparar
+        libre = crear_reconocedor(args.ruta_modelo, frecuencia)
+        resultados, tiempo, cpu = _decodificar_archivo(libre, muestras, frecuencia)
+        print(f"Dictado libre: RTF {tiempo / duracion:.3f}, CPU {cpu:.2f}s: "
+              f"\"{' '.join(r['text'] for r in resultados)}\"")
+        print("(con el servidor Vosk activo la CPU se gasta en su proceso, no en este)")
+        return
+
+    from captura_audio import CapturaMicrofono, FRAME_RATE
+
+    reconocedor = ReconocedorComandos(args.ruta_modelo, FRAME_RATE, comandos, not args.sin_respaldo,
+                                      al_decision=_imprimir_decision)
+    captura = CapturaMicrofono(reconocedor, FRAME_RATE, frames_bloque=4000,
+                               al_resultado=lambda texto: None, al_parcial=lambda texto: None)
+    print("Escuchando comandos... (Ctrl+C para salir)")
+    captura.iniciar()
+    try:
+        while not captura.esperar(1.0):
+            pass
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        captura.detener()
+        for modo, e in reconocedor.estadisticas().items():
+            if isinstance(e, dict):
+                print(f"{modo}: {e['decisiones']} decisiones, latencia media {e['latencia_media'] * 1000:.0f} ms, "
+                      f"máxima {e['latencia_maxima'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
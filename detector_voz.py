@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detector de actividad de voz (VAD) por energía
+Se coloca antes de KaldiRecognizer para no decodificar los bloques en
+silencio. Calcula la energía por tramas con NumPy, mantiene un piso de ruido
+adaptativo y aplica un tiempo de retención (hangover) para no cortar el
+final de las palabras. filtrar() además antepone el último bloque descartado
+al primero con voz (pre-roll) para no cortar el comienzo.
+
+Uso:
+    python detector_voz.py [archivo.wav ...]   (calibra con ruido.wav)
+"""
+
+import sys
+import wave
+import numpy as np
+
+# Parámetros predeterminados
+UMBRAL_DB = 8.0             # dB sobre el piso de ruido para considerar voz
+DURACION_TRAMA = 0.02       # Tramas de 20 ms
+MIN_TRAMAS_VOZ = 5          # Tramas activas necesarias en un bloque (descarta golpes aislados)
+RETENCION = 0.6             # Segundos que se sigue considerando voz tras la última trama activa
+ADAPTACION_RUIDO = 0.05     # Velocidad de adaptación del piso en tramas de ruido
+ADAPTACION_VOZ = 0.002      # Adaptación lenta en tramas de voz (ruido que sube poco a poco)
+PISO_MINIMO_DB = 20.0       # Evita que el piso caiga a cero con silencio digital
+
+
+def energia_db(muestras, tamano_trama):
+    """Energía en dB de cada trama completa de un arreglo de muestras int16"""
+    tramas = len(muestras) // tamano_trama
+    if tramas == 0:
+        return np.zeros(0, dtype=np.float32)
+    bloque = muestras[:tramas * tamano_trama].astype(np.float32).reshape(tramas, tamano_trama)
+    return 10.0 * np.log10(np.mean(bloque * bloque, axis=1) + 1e-10)
+
+
+def leer_mono(ruta):
+    """Lee un WAV de 16 bits como int16 mono (promediando canales si es estéreo)"""
+    with wave.open(ruta, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{ruta}: se requieren muestras de 16 bits")
+        canales = wf.getnchannels()
+        frecuencia = wf.getframerate()
+        muestras = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if canales > 1:
+        muestras = muestras.reshape(-1, canales).mean(axis=1).astype(np.int16)
+    return muestras, frecuencia
+
+
+class DetectorVoz:
+    """VAD por energía con piso de ruido adaptativo y retención"""
+
+    def __init__(self, frecuencia=16000, umbral_db=UMBRAL_DB, retencion=RETENCION,
+                 duracion_trama=DURACION_TRAMA, min_tramas_voz=MIN_TRAMAS_VOZ):
+        self.frecuencia = frecuencia
+        self.umbral_db = umbral_db
+        self.min_tramas_voz = min_tramas_voz
+        self.tamano_trama = max(1, int(frecuencia * duracion_trama))
+        self.muestras_retencion = int(frecuencia * retencion)
+        self.piso_db = None
+        self._restante_retencion = 0
+        self._previo = b""          # Último bloque descartado, para el pre-roll
+        self._previo_omitidas = 0   # Muestras de ese bloque que procesar() contó como omitidas
+
+        # Estadísticas
+        self.muestras_totales = 0
+        self.muestras_omitidas = 0
+
+    def calibrar(self, muestras):
+        """Fija el piso de ruido a partir de un fragmento que solo contiene ruido"""
+        energias = energia_db(np.asarray(muestras, dtype=np.int16), self.tamano_trama)
+        if len(energias):
+            self.piso_db = max(float(np.median(energias)), PISO_MINIMO_DB)
+        return self.piso_db
+
+    def calibrar_desde_wav(self, ruta):
+        """Calibra con un archivo de ruido (por ejemplo ruido.wav)"""
+        muestras, _ = leer_mono(ruta)
+        return self.calibrar(muestras)
+
+    def _actualizar_piso(self, energias, es_voz):
+        """Media exponencial del piso, aplicada de forma vectorizada por grupo de tramas"""
+        for grupo, alfa in ((energias[~es_voz], ADAPTACION_RUIDO), (energias[es_voz], ADAPTACION_VOZ)):
+            if len(grupo):
+                peso = (1.0 - alfa) ** len(grupo)
+                self.piso_db = peso * self.piso_db + (1.0 - peso) * float(np.mean(grupo))
+        self.piso_db = max(self.piso_db, PISO_MINIMO_DB)
+
+    def procesar(self, data):
+        """Decide si un bloque de audio PCM 16-bit debe pasar al reconocedor.
+
+        Returns:
+            True si el bloque contiene voz o está dentro del tiempo de retención
+        """
+        muestras = np.frombuffer(data, dtype=np.int16)
+        energias = energia_db(muestras, self.tamano_trama)
+        self.muestras_totales += len(muestras)
+        if len(energias) == 0:
+            return self._restante_retencion > 0
+
+        if self.piso_db is None:
+            # Sin calibrar: estimar el piso con las tramas más silenciosas
+            self.piso_db = max(float(np.percentile(energias, 10)), PISO_MINIMO_DB)
+
+        es_voz = energias > self.piso_db + self.umbral_db
+        activas = np.flatnonzero(es_voz)
+        self._actualizar_piso(energias, es_voz)
+
+        if len(activas) >= min(self.min_tramas_voz, len(energias)):
+            # La retención cuenta desde la última trama con voz del bloque
+            despues = len(muestras) - (activas[-1] + 1) * self.tamano_trama
+            self._restante_retencion = max(0, self.muestras_retencion - despues)
+            return True
+
+        if self._restante_retencion > 0:
+            self._restante_retencion = max(0, self._restante_retencion - len(muestras))
+            return True
+
+        self.muestras_omitidas += len(muestras)
+        return False
+
+    def filtrar(self, data):
+        """Como procesar(), pero devuelve los bytes para el reconocedor (None si se descarta).
+
+        Un bloque solo se acepta con min_tramas_voz tramas activas, así que el
+        comienzo de una palabra suele caer en el bloque anterior, ya descartado:
+        al empezar la voz se entrega ese bloque junto con el primero aceptado.
+        """
+        omitidas_antes = self.muestras_omitidas
+        if not self.procesar(data):
+            self._previo = bytes(data)
+            # Un bloque menor que una trama se descarta sin contarse como omitido
+            self._previo_omitidas = self.muestras_omitidas - omitidas_antes
+            return None
+        previo, self._previo = self._previo, b""
+        if not previo:
+            return data
+        self.muestras_omitidas -= self._previo_omitidas
+        self._previo_omitidas = 0
+        return previo + bytes(data)
+
+    @property
+    def fraccion_omitida(self):
+        """Fracción del audio procesado que no se envió al reconocedor"""
+        return self.muestras_omitidas / self.muestras_totales if self.muestras_totales else 0.0
+
+    def reiniciar_estadisticas(self):
+        self.muestras_totales = 0
+        self.muestras_omitidas = 0
+        self._previo_omitidas = 0   # El bloque retenido ya no está en la cuenta
+
+
+def main():
+    """Calibra con ruido.wav y muestra qué fracción de cada archivo se omitiría"""
+    archivos = sys.argv[1:] or ["nomas.wav", "ruido.wav"]
+    ruido, frecuencia_ruido = leer_mono("ruido.wav")
+
+    for ruta in archivos:
+        muestras, frecuencia = leer_mono(ruta)
+        detector = DetectorVoz(frecuencia)
+        piso = detector.calibrar(ruido)
+        bloque = frecuencia // 2
+        for inicio in range(0, len(muestras), bloque):
+            detector.procesar(muestras[inicio:inicio + bloque].tobytes())
+        print(f"{ruta}: piso inicial {piso:.1f} dB, final {detector.piso_db:.1f} dB, "
+              f"omitido {detector.fraccion_omitida * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gobernador de energía según la batería del UPS
+Con batería el asistente seguía decodificando con el modelo completo y
+sintetizando por red, igual que enchufado. GobernadorEnergia recibe las
+muestras del UPS (del anillo de telemetria_ups.py, sin tráfico I2C, o de un
+MuestreadorUPS propio) y elige un perfil:
+    rendimiento   cargando / con red eléctrica
+    equilibrado   batería por encima de UMBRAL_EQUILIBRADO
+    ahorro        modelo pequeño, VAD, bloques de 1 s, voz en caché o local, 1 trabajador
+    critico       como ahorro, y el LED avisa de batería baja
+Para volver a un perfil de más consumo la capacidad tiene que superar el
+umbral en HISTERESIS puntos, así no oscila alrededor de un umbral.
+
+También estima la energía de cada transcripción (tiempo de CPU de la
+decodificación por la potencia de un núcleo más la duración del audio por la
+potencia base) y la registra en el log y, si se indica, en un archivo JSONL.
+La potencia base es POTENCIA_REPOSO hasta tener VENTANA_POTENCIA segundos
+de descarga; después, la potencia medida con el UPS menos la parte de la
+decodificación.
+
+Uso:
+    python gobernador_energia.py [--falso] [--descarga 3600]     (muestra los cambios de perfil)
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+MODELO_LIGERO = os.getenv("VOSK_MODELO_LIGERO", "vosk-model-small-es-0.42")
+UMBRAL_EQUILIBRADO = 50.0   # % de batería a partir del cual se usa equilibrado
+UMBRAL_AHORRO = 20.0        # % a partir del cual se usa ahorro (por debajo, critico)
+HISTERESIS = 5.0            # Puntos de más para volver a un perfil de más consumo
+
+# Modelo de consumo (Raspberry Pi 4; se pueden ajustar por entorno)
+POTENCIA_REPOSO = float(os.getenv("POTENCIA_REPOSO_W", "2.7"))      # W del sistema sin carga
+POTENCIA_NUCLEO = float(os.getenv("POTENCIA_NUCLEO_W", "0.9"))      # W por núcleo al 100 %
+CAPACIDAD_BATERIA_WH = float(os.getenv("BATERIA_WH", "21.6"))       # X120x con dos 18650 de 3000 mAh
+VENTANA_POTENCIA = 300.0    # Segundos de descarga necesarios para medir la potencia con el UPS
+
+# Cada perfil: modelo (None = el que se pidió), VAD forzado, segundos por bloque,
+# voz ("red" o "local": caché y motor local), trabajadores (None = uno por CPU)
+Perfil = namedtuple("Perfil", "nombre modelo usar_vad duracion_bloque tts trabajadores")
+
+PERFILES = {
+    "rendimiento": Perfil("rendimiento", None, False, 0.25, "red", None),
+    "equilibrado": Perfil("equilibrado", None, False, 0.5, "red", max(1, (os.cpu_count() or 2) // 2)),
+    "ahorro": Perfil("ahorro", MODELO_LIGERO, True, 1.0, "local", 1),
+    "critico": Perfil("critico", MODELO_LIGERO, True, 1.0, "local", 1),
+}
+ORDEN = ("rendimiento", "equilibrado", "ahorro", "critico")     # De más a menos consumo
+
+
+def perfil_para(capacidad, cargando, actual=None, histeresis=HISTERESIS):
+    """Nombre del perfil para una capacidad (%) teniendo en cuenta el perfil actual"""
+    if cargando:
+        return "rendimiento"
+
+    def nivel(margen):
+        if capacidad >= UMBRAL_EQUILIBRADO + margen:
+            return "equilibrado"
+        if capacidad >= UMBRAL_AHORRO + margen:
+            return "ahorro"
+        return "critico"
+
+    candidato = nivel(0.0)
+    if actual in ORDEN and ORDEN.index(candidato) < ORDEN.index(actual):
+        # Subir de consumo solo con margen
+        candidato = nivel(histeresis)
+        if ORDEN.index(candidato) > ORDEN.index(actual):
+            candidato = actual
+    return candidato
+
+
+class GobernadorEnergia:
+    """Elige el perfil del asistente a partir de las muestras del UPS.
+
+    Args:
+        perfiles: Diccionario {nombre: Perfil}, por defecto PERFILES
+        registro: Archivo JSONL donde añadir la energía de cada transcripción
+        inicial: Perfil hasta la primera muestra del UPS
+    """
+
+    def __init__(self, perfiles=None, registro=None, inicial="rendimiento"):
+        self.perfiles = perfiles or PERFILES
+        self.registro = registro
+        self.perfil = self.perfiles[inicial]
+        self.ultima_muestra = None
+        self._muestras = deque()            # (instante_s, capacidad) mientras se descarga
+        self._suscriptores = []
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.cambios = 0
+        self.transcripciones = 0
+        self.energia_total = 0.0
+        self.tiempo_por_perfil = {nombre: 0.0 for nombre in self.perfiles}
+        self._desde = time.monotonic()
+
+    def suscribir(self, callback):
+        """Registra callback(perfil) para cada cambio; devuelve una función que cancela la suscripción"""
+        with self._lock:
+            self._suscriptores.append(callback)
+
+        def cancelar():
+            with self._lock:
+                if callback in self._suscriptores:
+                    self._suscriptores.remove(callback)
+        return cancelar
+
+    # --- Muestras del UPS --------------------------------------------------
+
+    def actualizar(self, muestra):
+        """Procesa una muestra de telemetria_ups (capacidad, cargando, instante_ns)"""
+        self.ultima_muestra = muestra
+        instante = muestra["instante_ns"] / 1e9
+        if muestra["cargando"]:
+            self._muestras.clear()
+        else:
+            self._muestras.append((instante, muestra["capacidad"]))
+            while len(self._muestras) > 2 and instante - self._muestras[1][0] >= VENTANA_POTENCIA:
+                self._muestras.popleft()
+
+        nombre = perfil_para(muestra["capacidad"], muestra["cargando"], self.perfil.nombre)
+        if nombre != self.perfil.nombre:
+            self._cambiar(self.perfiles[nombre], muestra)
+
+    def _cambiar(self, perfil, muestra):
+        ahora = time.monotonic()
+        self.tiempo_por_perfil[self.perfil.nombre] += ahora - self._desde
+        self._desde = ahora
+        anterior, self.perfil = self.perfil, perfil
+        self.cambios += 1
+        logger.info("Perfil %s -> %s (batería %.1f%%, %s)", anterior.nombre, perfil.nombre,
+                    muestra["capacidad"], "cargando" if muestra["cargando"] else "descargando")
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for callback in suscriptores:
+            callback(perfil)
+
+    def potencia_medida(self):
+        """Potencia del sistema en W según la descarga del UPS, o None sin VENTANA_POTENCIA de datos"""
+        if len(self._muestras) >= 2:
+            (t0, c0), (t1, c1) = self._muestras[0], self._muestras[-1]
+            if t1 - t0 >= VENTANA_POTENCIA and c0 > c1:
+                return (c0 - c1) / 100 * CAPACIDAD_BATERIA_WH * 3600 / (t1 - t0)
+        return None
+
+    def potencia(self):
+        """Potencia del sistema en W: medida con la descarga del UPS o, si no hay datos, estimada"""
+        medida = self.potencia_medida()
+        if medida is not None:
+            return medida
+        from bloque_adaptativo import carga_cpu
+        return POTENCIA_REPOSO + POTENCIA_NUCLEO * (os.cpu_count() or 1) * min(1.0, carga_cpu())
+
+    # --- Energía por transcripción -----------------------------------------
+
+    def registrar_transcripcion(self, segundos_audio, segundos_cpu, texto=""):
+        """Estima y registra la energía (J) de una transcripción; devuelve el registro"""
+        # La parte de CPU es lo que cuesta decodificar; la base, mantener el equipo escuchando
+        cpu = POTENCIA_NUCLEO * segundos_cpu
+        medida = self.potencia_medida()
+        if medida is None:
+            potencia = self.potencia()
+            potencia_base = POTENCIA_REPOSO
+        else:
+            # La descarga ya incluye la decodificación: se le resta su parte media
+            # durante el audio para no contarla dos veces
+            potencia = medida
+            cpu_media = cpu / segundos_audio if segundos_audio > 0 else 0.0
+            potencia_base = max(0.0, medida - cpu_media)
+        base = potencia_base * segundos_audio
+        self.transcripciones += 1
+        self.energia_total += base + cpu
+        entrada = {
+            "hora": time.time(),
+            "perfil": self.perfil.nombre,
+            "capacidad": self.ultima_muestra["capacidad"] if self.ultima_muestra else None,
+            "segundos_audio": round(segundos_audio, 3),
+            "segundos_cpu": round(segundos_cpu, 3),
+            "potencia_w": round(potencia, 3),
+            "potencia_base_w": round(potencia_base, 3),
+            "potencia_medida": medida is not None,
+            "energia_j": round(base + cpu, 3),
+            "energia_cpu_j": round(cpu, 3),
+            "palabras": len(texto.split()),
+        }
+        logger.info("Transcripción (%s): %.2f s de audio, %.2f s de CPU, %.2f J estimados",
+                    entrada["perfil"], segundos_audio, segundos_cpu, entrada["energia_j"])
+        if self.registro:
+            with open(self.registro, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        return entrada
+
+    def estadisticas(self):
+        tiempos = dict(self.tiempo_por_perfil)
+        tiempos[self.perfil.nombre] += time.monotonic() - self._desde
+        return {
+            "perfil": self.perfil.nombre,
+            "cambios": self.cambios,
+            "transcripciones": self.transcripciones,
+            "energia_total_j": self.energia_total,
+            "energia_media_j": self.energia_total / self.transcripciones if self.transcripciones else 0.0,
+            "potencia_w": self.potencia(),
+            "segundos_por_perfil": tiempos,
+        }
+
+
+def conectar_ups(gobernador, falso=False, descarga_por_hora=20.0, intervalo=None, detener=None):
+    """Alimenta el gobernador con muestras del UPS en un hilo; devuelve el hilo o None.
+
+    Usa el anillo de telemetria_ups.py si el demonio está en marcha (sin I2C);
+    si no, muestrea el UPS directamente (o SMBusFalso con falso=True).
+    """
+    from telemetria_ups import LectorTelemetria, MuestreadorUPS, SMBusFalso, INTERVALO
+
+    detener = detener or threading.Event()
+    if not falso:
+        try:
+            lector = LectorTelemetria()
+        except FileNotFoundError:
+            lector = None
+        if lector is not None:
+            muestra = lector.ultima()
+            if muestra is not None:
+                gobernador.actualizar(muestra)
+
+            def seguir():
+                for muestra in lector.seguir(detener=detener):
+                    gobernador.actualizar(muestra)
+                lector.cerrar()
+            hilo = threading.Thread(target=seguir, name="gobernador", daemon=True)
+            hilo.start()
+            return hilo
+
+    if falso:
+        bus = SMBusFalso(descarga_por_hora=descarga_por_hora)
+    else:
+        try:
+            from smbus2 import SMBus
+            bus = SMBus(1)
+        except (ImportError, OSError) as e:
+            print(f"Sin UPS ({e}): el gobernador se queda en {gobernador.perfil.nombre}")
+            return None
+    muestreador = MuestreadorUPS(bus, intervalo=intervalo or INTERVALO)
+    muestreador.suscribir(gobernador.actualizar)
+    hilo = threading.Thread(target=muestreador.ejecutar, args=(detener,), name="gobernador", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfiles del asistente según la batería del UPS")
+    parser.add_argument("--falso", action="store_true", help="Simular el UPS con SMBusFalso")
+    parser.add_argument("--descarga", type=float, default=3600.0,
+                        help="Con --falso, puntos de batería por hora (negativo: cargando)")
+    parser.add_argument("--segundos", type=float, default=90.0, help="Duración de la prueba")
+    parser.add_argument("--registro", help="Archivo JSONL para la energía de las transcripciones")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    gobernador = GobernadorEnergia(registro=args.registro)
+    gobernador.suscribir(lambda p: print(f"  modelo={p.modelo or 'el pedido'}, VAD={'sí' if p.usar_vad else 'según CLI'}, "
+                                         f"bloque={p.duracion_bloque}s, voz={p.tts}, "
+                                         f"trabajadores={p.trabajadores or 'uno por CPU'}"))
+    detener = threading.Event()
+    conectar_ups(gobernador, args.falso, args.descarga, intervalo=0.5, detener=detener)
+    try:
+        # Transcripción sintética cada 5 s para ver la energía estimada con cada perfil
+        fin = time.monotonic() + args.segundos
+        while time.monotonic() < fin:
+            time.sleep(5)
+            gobernador.registrar_transcripcion(3.0, 1.0, "texto de prueba")
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        detener.set()
+        for nombre, valor in gobernador.estadisticas().items():
+            print(f"  {nombre}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
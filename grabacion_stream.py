@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reconocimiento en streaming desde arecord
+Lee la salida de arecord (o de cualquier proceso que produzca PCM S16_LE en
+crudo) a medida que llega y la pasa al reconocedor, en lugar de grabar
+primero /tmp/recording.wav y decodificarlo al final. Cuando se detiene la
+grabación solo falta decodificar el último bloque.
+
+Opcionalmente el audio se guarda en un WAV desde un hilo en segundo plano.
+
+Uso:
+    python grabacion_stream.py [ruta_modelo] [--guardar /tmp/recording.wav] [--duracion N]
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import queue
+import signal
+import subprocess
+import threading
+
+# Configuración de audio
+FRAME_RATE = 16000
+BYTES_BLOQUE = 8000         # 0.25 s de audio a 16 kHz mono 16-bit
+
+
+def comando_arecord(frecuencia=FRAME_RATE, duracion=0, dispositivo=None):
+    """Comando de arecord que escribe PCM crudo en stdout"""
+    cmd = ["arecord", "-q", "-t", "raw", "--format=S16_LE", f"--rate={frecuencia}", "-c1"]
+    if dispositivo:
+        cmd += ["-D", dispositivo]
+    if duracion > 0:
+        cmd.append(f"--duration={duracion}")
+    return cmd
+
+
+class EscritorWavSegundoPlano:
+    """Escribe bloques PCM en un WAV desde un hilo propio para no frenar la decodificación"""
+
+    def __init__(self, ruta, frecuencia=FRAME_RATE):
+        self.ruta = ruta
+        self._cola = queue.Queue()
+        self._wf = wave.open(ruta, "wb")
+        self._wf.setnchannels(1)
+        self._wf.setsampwidth(2)
+        self._wf.setframerate(frecuencia)
+        # No es daemon: el intérprete espera a que el WAV quede cerrado al salir
+        self._hilo = threading.Thread(target=self._ejecutar)
+        self._hilo.start()
+
+    def _ejecutar(self):
+        while True:
+            data = self._cola.get()
+            if data is None:
+                break
+            self._wf.writeframes(data)
+        self._wf.close()
+
+    def escribir(self, data):
+        self._cola.put(data)
+
+    def cerrar(self, esperar=False):
+        """Termina la escritura; por defecto no bloquea a quien llama"""
+        self._cola.put(None)
+        if esperar:
+            self._hilo.join()
+
+
+def reconocer_desde_proceso(cmd, reconocedor, frecuencia=FRAME_RATE, bytes_bloque=BYTES_BLOQUE,
+                            guardar_en=None, al_parcial=None):
+    """Lanza cmd y decodifica su stdout (PCM S16_LE mono) de forma incremental.
+
+    Ctrl+C detiene la grabación: mientras dura, SIGINT no interrumpe la
+    decodificación, se reenvía al proceso y se sigue decodificando lo que
+    quede en la tubería hasta EOF antes de pedir el resultado final. Un
+    segundo Ctrl+C termina el proceso sin esperar.
+
+    Args:
+        cmd: Comando a ejecutar (lista)
+        reconocedor: Objeto con la interfaz de KaldiRecognizer
+        frecuencia: Frecuencia de muestreo del audio producido
+        bytes_bloque: Bytes que se leen de la tubería por iteración
+        guardar_en: Ruta de un WAV donde guardar el audio (opcional, en segundo plano)
+        al_parcial: Función llamada con cada resultado parcial
+
+    Returns:
+        Diccionario con el texto, los segmentos, la duración del audio y el
+        tiempo desde que se detuvo la grabación hasta tener el texto
+    """
+    escritor = EscritorWavSegundoPlano(guardar_en, frecuencia) if guardar_en else None
+    # El hilo del escritor no es daemon: hay que cerrarlo en todos los caminos
+    # (arecord inexistente, error del reconocedor) o el intérprete no termina
+    try:
+        proceso = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=0)
+
+        segmentos = []
+        total_bytes = 0
+        detenido_en = None
+        sobrante = b""  # Medio sample que quedó al final de una lectura
+
+        def procesar(data):
+            if escritor:
+                escritor.escribir(data)
+            if reconocedor.AcceptWaveform(data):
+                resultado = json.loads(reconocedor.Result())
+                if resultado.get("text"):
+                    segmentos.append(resultado["text"])
+            elif al_parcial:
+                parcial = json.loads(reconocedor.PartialResult())
+                if parcial.get("partial"):
+                    al_parcial(parcial["partial"])
+
+        def al_interrumpir(signum, frame):
+            # Detener el proceso y seguir decodificando lo que quede en la tubería
+            nonlocal detenido_en
+            if proceso.poll() is not None:
+                return
+            if detenido_en is None:
+                detenido_en = time.time()
+                proceso.send_signal(signal.SIGINT)
+            else:
+                proceso.terminate()
+
+        # Las señales solo se pueden manejar desde el hilo principal; en otros
+        # hilos KeyboardInterrupt no llega nunca
+        manejador_anterior = None
+        if threading.current_thread() is threading.main_thread():
+            manejador_anterior = signal.signal(signal.SIGINT, al_interrumpir)
+
+        try:
+            while True:
+                # Con bufsize=0 read() devuelve en cuanto hay datos en la tubería
+                data = proceso.stdout.read(bytes_bloque)
+                if not data:
+                    break
+                if sobrante or len(data) % 2:
+                    data = sobrante + data
+                    corte = len(data) - len(data) % 2
+                    data, sobrante = data[:corte], data[corte:]
+                total_bytes += len(data)
+                procesar(data)
+        finally:
+            if manejador_anterior is not None:
+                signal.signal(signal.SIGINT, manejador_anterior)
+            if proceso.poll() is None:
+                proceso.terminate()
+            proceso.wait()
+            if detenido_en is None:
+                detenido_en = time.time()
+
+        resultado_final = json.loads(reconocedor.FinalResult())
+        if resultado_final.get("text"):
+            segmentos.append(resultado_final["text"])
+        tiempo_tras_detener = time.time() - detenido_en
+    finally:
+        if escritor:
+            escritor.cerrar()
+
+    return {
+        "texto": " ".join(segmentos),
+        "segmentos": segmentos,
+        "duracion_audio": total_bytes / 2 / frecuencia,
+        "tiempo_tras_detener": tiempo_tras_detener,
+    }
+
+
+def grabar_y_reconocer(model_path, duracion=0, guardar_en=None, frecuencia=FRAME_RATE, al_parcial=None):
+    """Graba con arecord y reconoce al mismo tiempo con el servidor Vosk (o un modelo local)"""
+    from servidor_vosk import crear_reconocedor
+
+    reconocedor = crear_reconocedor(model_path, frecuencia)
+    return reconocer_desde_proceso(comando_arecord(frecuencia, duracion), reconocedor, frecuencia,
+                                   guardar_en=guardar_en, al_parcial=al_parcial)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Graba con arecord y reconoce en streaming")
+    parser.add_argument("ruta_modelo", nargs="?", default="vosk-model-small-es-0.42", help="Ruta del modelo de Vosk")
+    parser.add_argument("--guardar", help="Guardar también el audio en este WAV")
+    parser.add_argument("--duracion", type=int, default=0, help="Segundos de grabación (0 = hasta Ctrl+C)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta_modelo):
+        print(f"Error: El modelo en {args.ruta_modelo} no existe.")
+        sys.exit(1)
+
+    print("Grabando... Habla y presiona Ctrl+C cuando termines.")
+    resultado = grabar_y_reconocer(args.ruta_modelo, args.duracion, args.guardar,
+                                   al_parcial=lambda texto: print(f"Parcial: {texto}", end='\r'))
+    print(f"\nAudio: {resultado['duracion_audio']:.1f}s, texto listo "
+          f"{resultado['tiempo_tras_detener']:.2f}s después de detener la grabación")
+    print(f"Texto reconocido: \"{resultado['texto']}\"")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,819 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capa única de GPIO para botones y LEDs
+El repositorio usa tres APIs incompatibles: gpiozero (test_gpiozero.py,
+test_gpio.py), libgpiod 1.x con chip.get_line (7-3-testGPIOD.py) y
+libgpiod 2.x con request_lines (7-4, 7-5, gpio_test.py). abrir_hal() elige en
+tiempo de ejecución el backend disponible de menor latencia, en este orden:
+- gpiod2: flancos con marca de tiempo MONOTONIC del kernel, antirrebote del
+  kernel y todas las salidas de un grupo en una sola solicitud
+  (set_values = un ioctl)
+- gpiod1: un fd de eventos por línea (agrupados con epoll) y set_values
+  sobre un LineBulk, también un ioctl por escritura
+- gpiozero: callbacks desde su propio hilo, sin marca de tiempo del flanco
+  y una escritura por pin
+- simulado: en el mismo proceso, sin hardware; las salidas se pueden
+  conectar en lazo con las entradas para medir el camino completo
+
+En todos los casos los botones pasan por boton_gpio.Botones (antirrebote,
+corta/doble/larga, bucle bloqueante o asyncio) y las salidas por
+GrupoSalidas, que junta los cambios de varias líneas en una escritura.
+GPIO_BACKEND=gpiod2|gpiod1|gpiozero|simulado fuerza un backend.
+
+Uso:
+    python hal_gpio.py [--backend simulado]                  (botón -> LED)
+    python hal_gpio.py --benchmark [--backend simulado] [--todos] [--lazo 25:23]
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import threading
+import contextlib
+from collections import deque
+
+from boton_gpio import (Botones, solicitar_botones, SolicitudGpiodFalsa, Flanco, TipoFlanco,
+                        simular_pulsaciones, CHIP, BUTTON_PIN)
+
+LED_PIN = 25                # LED en GPIO25
+PWM_SYSFS = "/sys/class/pwm/pwmchip0"
+CANALES_PWM = {12: 0, 18: 0, 13: 1, 19: 1}     # GPIO -> canal con dtoverlay=pwm-2chan (Pi 4 y anteriores)
+FRECUENCIA_PWM = 1000       # Hz de la portadora para regular el brillo
+BACKENDS = ("gpiod2", "gpiod1", "gpiozero", "simulado")    # De menor a mayor latencia
+MAX_HISTORIAL = 10000       # Escrituras que recuerda el backend simulado
+DESFASE_RELOJ = 10.0        # Segundos: marcas de libgpiod 1.x más lejanas son de CLOCK_REALTIME
+
+
+def _version_gpiod():
+    """2 o 1 según la API de los bindings de libgpiod instalados, None si no hay"""
+    try:
+        import gpiod
+    except ImportError:
+        return None
+    if hasattr(gpiod, "request_lines"):
+        return 2
+    if hasattr(gpiod, "Chip") and hasattr(gpiod.Chip, "get_line"):
+        return 1
+    return None
+
+
+def _gpiozero_disponible():
+    try:
+        import gpiozero  # noqa: F401
+    except ImportError:
+        return False
+    return bool(os.environ.get("GPIOZERO_PIN_FACTORY")) or os.path.exists("/dev/gpiomem") \
+        or os.path.exists(CHIP)
+
+
+def backends_disponibles(chip=CHIP):
+    """Backends utilizables en esta máquina, de menor a mayor latencia"""
+    disponibles = []
+    version = _version_gpiod()
+    if version and os.path.exists(chip):
+        disponibles.append(f"gpiod{version}")
+    if _gpiozero_disponible():
+        disponibles.append("gpiozero")
+    disponibles.append("simulado")
+    return disponibles
+
+
+def abrir_hal(backend=None, chip=CHIP, consumidor="hal_gpio"):
+    """Abre el backend indicado (o GPIO_BACKEND) o el de menor latencia que funcione"""
+    backend = backend or os.environ.get("GPIO_BACKEND")
+    if backend:
+        return _CLASES[backend](chip, consumidor)
+    for nombre in backends_disponibles(chip):
+        try:
+            hal = _CLASES[nombre](chip, consumidor)
+        except Exception as e:
+            print(f"Backend GPIO {nombre} no disponible: {e}")
+            continue
+        if nombre == "simulado":
+            print("Sin GPIO disponible: usando el backend simulado")
+        return hal
+
+
+# ---------------------------------------------------------------------------
+# Salidas
+# ---------------------------------------------------------------------------
+
+class GrupoSalidas:
+    """Líneas de salida que se escriben juntas.
+
+    fijar() y escribir() aplican los cambios enseguida, salvo dentro de
+    lote(): ahí se acumulan y al salir se escriben con una sola llamada al
+    backend. Las líneas que ya tienen el valor pedido no se escriben.
+    """
+
+    admite_brillo = False       # Los valores son niveles (bool), no brillos de 0.0 a 1.0
+
+    def __init__(self, pines):
+        self.pines = tuple(pines)
+        self.valores = {pin: False for pin in self.pines}
+        self._pendientes = {}
+        self._diferir = 0
+        self._lock = threading.RLock()
+
+        # Métricas
+        self.escrituras = 0         # Llamadas al backend (ioctls en libgpiod)
+        self.cambios = 0            # Líneas cambiadas
+        self.sin_cambio = 0         # Peticiones que no necesitaron escribir
+        self.tiempo_escritura = 0.0
+
+    def fijar(self, pin, valor):
+        self.escribir({pin: valor})
+
+    def escribir(self, valores):
+        """Fija varias líneas {pin: bool} con una sola escritura"""
+        with self._lock:
+            for pin, valor in valores.items():
+                if pin not in self.valores:
+                    raise ValueError(f"La línea {pin} no pertenece al grupo {self.pines}")
+                self._pendientes[pin] = self._normalizar(valor)
+            if not self._diferir:
+                self.aplicar()
+
+    @contextlib.contextmanager
+    def lote(self):
+        """Acumula los fijar()/escribir() del bloque with y los aplica juntos al salir"""
+        with self._lock:
+            self._diferir += 1
+            try:
+                yield self
+            finally:
+                self._diferir -= 1
+                if not self._diferir:
+                    self.aplicar()
+
+    def aplicar(self):
+        with self._lock:
+            cambios = {pin: v for pin, v in self._pendientes.items() if self.valores[pin] != v}
+            self.sin_cambio += len(self._pendientes) - len(cambios)
+            self._pendientes.clear()
+            if not cambios:
+                return
+            inicio = time.perf_counter()
+            self.valores.update(cambios)
+            self.escrituras += self._escribir(cambios)
+            self.tiempo_escritura += time.perf_counter() - inicio
+            self.cambios += len(cambios)
+
+    def _normalizar(self, valor):
+        return bool(valor)
+
+    def _escribir(self, cambios):
+        """Escribe los cambios en el hardware; devuelve las llamadas que necesitó"""
+        raise NotImplementedError
+
+    def cerrar(self):
+        with contextlib.suppress(Exception):
+            self.escribir({pin: False for pin in self.pines})
+
+    def estadisticas(self):
+        return {
+            "escrituras": self.escrituras,
+            "cambios": self.cambios,
+            "sin_cambio": self.sin_cambio,
+            "tiempo_medio_escritura": self.tiempo_escritura / self.escrituras if self.escrituras else 0.0,
+        }
+
+
+class _SalidasGpiod2(GrupoSalidas):
+    def __init__(self, chip, pines, consumidor):
+        import gpiod
+        from gpiod.line import Direction, Value
+
+        super().__init__(pines)
+        self._activo, self._inactivo = Value.ACTIVE, Value.INACTIVE
+        self._solicitud = gpiod.request_lines(chip, consumer=consumidor, config={
+            self.pines: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.INACTIVE)})
+
+    def _escribir(self, cambios):
+        # GPIO_V2_LINE_SET_VALUES_IOCTL con la máscara de las líneas cambiadas
+        self._solicitud.set_values({pin: self._activo if v else self._inactivo for pin, v in cambios.items()})
+        return 1
+
+    def cerrar(self):
+        super().cerrar()
+        self._solicitud.release()
+
+
+class _SalidasGpiod1(GrupoSalidas):
+    def __init__(self, chip, pines, consumidor):
+        import gpiod
+
+        super().__init__(pines)
+        self._chip = gpiod.Chip(chip)
+        self._lineas = self._chip.get_lines(list(self.pines))
+        self._lineas.request(consumer=consumidor, type=gpiod.LINE_REQ_DIR_OUT, default_vals=[0] * len(self.pines))
+
+    def _escribir(self, cambios):
+        # La API 1.x escribe siempre todas las líneas del LineBulk (un ioctl)
+        self._lineas.set_values([int(self.valores[pin]) for pin in self.pines])
+        return 1
+
+    def cerrar(self):
+        super().cerrar()
+        self._lineas.release()
+        self._chip.close()
+
+
+class _SalidasGpiozero(GrupoSalidas):
+    def __init__(self, pines):
+        from gpiozero import DigitalOutputDevice
+
+        super().__init__(pines)
+        self._dispositivos = {pin: DigitalOutputDevice(pin) for pin in self.pines}
+
+    def _escribir(self, cambios):
+        for pin, valor in cambios.items():
+            self._dispositivos[pin].value = valor
+        return len(cambios)
+
+    def cerrar(self):
+        super().cerrar()
+        for dispositivo in self._dispositivos.values():
+            dispositivo.close()
+
+
+class SalidasSimuladas(GrupoSalidas):
+    """Salidas en memoria: guardan (instante_ns, cambios) de cada escritura en historial.
+
+    al_escribir(cambios), si se indica, recibe cada escritura (el backend
+    simulado lo usa para llevar las salidas en lazo a las entradas).
+    """
+
+    def __init__(self, pines, al_escribir=None):
+        super().__init__(pines)
+        self.historial = deque(maxlen=MAX_HISTORIAL)
+        self._al_escribir = al_escribir
+
+    def _escribir(self, cambios):
+        self.historial.append((time.monotonic_ns(), dict(cambios)))
+        if self._al_escribir:
+            self._al_escribir(cambios)
+        return 1
+
+
+class SalidasPwm(GrupoSalidas):
+    """Salidas con PWM por hardware: los valores son brillos de 0.0 a 1.0.
+
+    parpadear() programa el parpadeo en el propio periférico (periodo largo y
+    ciclo de trabajo), sin ningún hilo despertando para cada cambio.
+    """
+
+    admite_brillo = True
+
+    def __init__(self, pines, frecuencia=FRECUENCIA_PWM):
+        super().__init__(pines)
+        self.periodo_ns = int(1e9 / frecuencia)
+        self.valores = {pin: 0.0 for pin in self.pines}
+
+    def _normalizar(self, valor):
+        return min(1.0, max(0.0, float(valor)))
+
+    def _escribir(self, cambios):
+        for pin, brillo in cambios.items():
+            self._configurar(pin, self.periodo_ns, int(self.periodo_ns * brillo))
+        return len(cambios)
+
+    def parpadear(self, pin, periodo, ciclo):
+        """Parpadeo por hardware: encendido ciclo * periodo de cada periodo (segundos)"""
+        with self._lock:
+            periodo_ns = int(periodo * 1e9)
+            self._configurar(pin, periodo_ns, int(periodo_ns * ciclo))
+            self.escrituras += 1
+            # La siguiente escritura de brillo siempre reconfigura la portadora
+            self.valores[pin] = -1.0
+
+    def _configurar(self, pin, periodo_ns, ciclo_ns):
+        raise NotImplementedError
+
+
+class SalidasPwmSysfs(SalidasPwm):
+    """PWM del kernel por /sys/class/pwm (en la Pi 5 el chip y los canales son otros: ver canales)"""
+
+    def __init__(self, pines, frecuencia=FRECUENCIA_PWM, chip=PWM_SYSFS, canales=CANALES_PWM):
+        super().__init__(pines, frecuencia)
+        self._rutas = {}
+        self._periodos = {}
+        self._ciclos = {}
+        for pin in self.pines:
+            if pin not in canales:
+                raise ValueError(f"GPIO{pin} no tiene PWM por hardware (usa {sorted(canales)})")
+            ruta = f"{chip}/pwm{canales[pin]}"
+            if not os.path.exists(ruta):
+                with open(f"{chip}/export", "w") as f:
+                    f.write(str(canales[pin]))
+            # udev tarda un momento en dar permisos a los archivos del canal exportado
+            limite = time.monotonic() + 1.0
+            while not os.access(f"{ruta}/duty_cycle", os.W_OK) and time.monotonic() < limite:
+                time.sleep(0.01)
+            self._rutas[pin] = ruta
+            self._ciclos[pin] = os.open(f"{ruta}/duty_cycle", os.O_WRONLY)
+            self._configurar(pin, self.periodo_ns, 0)
+            self._escribir_archivo(pin, "enable", 1)
+
+    def _escribir_archivo(self, pin, nombre, valor):
+        with open(f"{self._rutas[pin]}/{nombre}", "w") as f:
+            f.write(str(valor))
+
+    def _configurar(self, pin, periodo_ns, ciclo_ns):
+        if self._periodos.get(pin) != periodo_ns:
+            # El ciclo no puede superar al periodo en ningún momento
+            os.pwrite(self._ciclos[pin], b"0", 0)
+            self._escribir_archivo(pin, "period", periodo_ns)
+            self._periodos[pin] = periodo_ns
+        os.pwrite(self._ciclos[pin], str(ciclo_ns).encode(), 0)
+
+    def cerrar(self):
+        super().cerrar()
+        for pin, fd in self._ciclos.items():
+            with contextlib.suppress(OSError):
+                self._escribir_archivo(pin, "enable", 0)
+            os.close(fd)
+        self._ciclos.clear()
+
+
+class SalidasPwmSimuladas(SalidasPwm):
+    """PWM en memoria: historial guarda (instante_ns, pin, periodo_ns, ciclo_ns)"""
+
+    def __init__(self, pines, frecuencia=FRECUENCIA_PWM):
+        super().__init__(pines, frecuencia)
+        self.historial = deque(maxlen=MAX_HISTORIAL)
+
+    def _configurar(self, pin, periodo_ns, ciclo_ns):
+        self.historial.append((time.monotonic_ns(), pin, periodo_ns, ciclo_ns))
+
+
+def pwm_disponible(pin, chip=PWM_SYSFS, canales=CANALES_PWM):
+    """True si la línea tiene un canal de PWM por hardware accesible"""
+    return pin in canales and os.path.exists(chip)
+
+
+class Led:
+    """Un LED sobre una línea de un GrupoSalidas (compartido con otros LEDs o propio)"""
+
+    def __init__(self, salidas, pin, propio=False):
+        self.salidas = salidas
+        self.pin = pin
+        self._propio = propio
+
+    @property
+    def encendido(self):
+        return self.salidas.valores[self.pin]
+
+    def fijar(self, encendido):
+        self.salidas.fijar(self.pin, encendido)
+
+    def encender(self):
+        self.fijar(True)
+
+    def apagar(self):
+        self.fijar(False)
+
+    def alternar(self):
+        self.fijar(not self.encendido)
+
+    def cerrar(self):
+        self.apagar()
+        if self._propio:
+            self.salidas.cerrar()
+
+
+# ---------------------------------------------------------------------------
+# Entradas
+# ---------------------------------------------------------------------------
+
+class _SolicitudGpiod1:
+    """Adapta las líneas de libgpiod 1.x a la interfaz de gpiod.LineRequest que usa Botones.
+
+    Cada línea tiene su propio fd de eventos; se agrupan en un epoll, cuyo fd
+    sirve para select y add_reader como el de una solicitud 2.x.
+    """
+
+    def __init__(self, chip, pines, consumidor):
+        import gpiod
+        import select
+
+        self._chip = gpiod.Chip(chip)
+        self._lineas = self._chip.get_lines(list(pines))
+        self._lineas.request(consumer=consumidor, type=gpiod.LINE_REQ_EV_BOTH_EDGES,
+                             flags=getattr(gpiod, "LINE_REQ_FLAG_BIAS_PULL_UP", 0))
+        self._subida = gpiod.LineEvent.RISING_EDGE
+        self._por_pin = {linea.offset(): linea for linea in self._lineas.to_list()}
+        self._por_fd = {}
+        self._epoll = select.epoll()
+        for pin, linea in self._por_pin.items():
+            fd = linea.event_get_fd()
+            self._por_fd[fd] = pin
+            self._epoll.register(fd, select.EPOLLIN)
+        self._secuencia = 0
+
+    @property
+    def fd(self):
+        return self._epoll.fileno()
+
+    def get_value(self, pin):
+        return self._por_pin[pin].get_value()
+
+    def wait_edge_events(self, timeout=None):
+        return bool(self._epoll.poll(-1 if timeout is None else timeout, 1))
+
+    def read_edge_events(self, max_events=None):
+        flancos = []
+        for fd, _ in self._epoll.poll(0):
+            pin = self._por_fd[fd]
+            for evento in self._por_pin[pin].event_read_multiple():
+                instante = evento.sec * 1_000_000_000 + evento.nsec
+                if abs(instante - time.monotonic_ns()) > DESFASE_RELOJ * 1e9:
+                    # Kernels anteriores a 5.7 marcan los eventos v1 con CLOCK_REALTIME
+                    instante = time.monotonic_ns()
+                self._secuencia += 1
+                flancos.append(Flanco(
+                    TipoFlanco.RISING_EDGE if evento.type == self._subida else TipoFlanco.FALLING_EDGE,
+                    instante, pin, self._secuencia, self._secuencia))
+        return flancos[:max_events] if max_events else flancos
+
+    def release(self):
+        self._epoll.close()
+        self._lineas.release()
+        self._chip.close()
+
+
+class _SolicitudGpiozero(SolicitudGpiodFalsa):
+    """Lleva los callbacks de gpiozero.Button a la interfaz de una solicitud de flancos.
+
+    gpiozero no da la marca de tiempo del flanco: se toma al llegar el callback.
+    """
+
+    def __init__(self, pines):
+        from gpiozero import Button
+
+        super().__init__(pines, activo_bajo=True)
+        self._botones = {}
+        for pin in pines:
+            boton = Button(pin, pull_up=True)
+            boton.when_pressed = lambda pin=pin: self.fijar_nivel(pin, False)
+            boton.when_released = lambda pin=pin: self.fijar_nivel(pin, True)
+            self._niveles[pin] = not boton.is_pressed
+            self._botones[pin] = boton
+
+    def release(self):
+        for boton in self._botones.values():
+            boton.close()
+        super().release()
+
+
+class GrupoBotones:
+    """Botones de una solicitud de entradas, con el bucle que los atiende.
+
+    Los eventos (ver boton_gpio.Botones) se reciben con suscribir(). Hay que
+    atenderlos con iniciar() (un hilo con el bucle bloqueante) o con
+    conectar(loop) (add_reader en un bucle de asyncio).
+    """
+
+    def __init__(self, solicitud, pines, **opciones):
+        self.solicitud = solicitud
+        self.pines = tuple(pines)
+        self.botones = Botones(solicitud, self.pines, **opciones)
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def suscribir(self, callback):
+        return self.botones.suscribir(callback)
+
+    def eventos_async(self):
+        return self.botones.eventos_async()
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.botones.ejecutar, args=(self._detener,),
+                                      name="botones", daemon=True)
+        self._hilo.start()
+
+    def conectar(self, loop=None):
+        self.botones.conectar(loop)
+
+    def estadisticas(self):
+        return self.botones.estadisticas()
+
+    def cerrar(self):
+        self.botones.desconectar()
+        if self._hilo is not None:
+            self._detener.set()
+            self._hilo.join()
+            self._hilo = None
+        self.solicitud.release()
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class HalGpio:
+    """Fábrica de salidas, LEDs y botones de un backend; cerrar() libera todo lo abierto"""
+
+    nombre = None
+
+    def __init__(self, chip=CHIP, consumidor="hal_gpio"):
+        self.chip = chip
+        self.consumidor = consumidor
+        self._abiertos = []
+
+    def salidas(self, pines):
+        grupo = self._abrir_salidas(tuple(pines))
+        self._abiertos.append(grupo)
+        return grupo
+
+    def led(self, pin=LED_PIN):
+        return Led(self.salidas((pin,)), pin, propio=True)
+
+    def pwm(self, pines, frecuencia=FRECUENCIA_PWM):
+        """Salidas con PWM por hardware (independiente de la API de GPIO del backend)"""
+        grupo = self._abrir_pwm(tuple(pines), frecuencia)
+        self._abiertos.append(grupo)
+        return grupo
+
+    def _abrir_pwm(self, pines, frecuencia):
+        return SalidasPwmSysfs(pines, frecuencia)
+
+    def botones(self, pines=(BUTTON_PIN,), rebote_kernel=None, **opciones):
+        """Botones con pull-up (activos en nivel bajo); las opciones van a boton_gpio.Botones"""
+        grupo = GrupoBotones(self._abrir_entradas(tuple(pines), rebote_kernel), pines, **opciones)
+        self._abiertos.append(grupo)
+        return grupo
+
+    def boton(self, pin=BUTTON_PIN, **opciones):
+        return self.botones((pin,), **opciones)
+
+    def _abrir_salidas(self, pines):
+        raise NotImplementedError
+
+    def _abrir_entradas(self, pines, rebote_kernel):
+        raise NotImplementedError
+
+    def cerrar(self):
+        while self._abiertos:
+            with contextlib.suppress(Exception):
+                self._abiertos.pop().cerrar()
+
+
+class HalGpiod2(HalGpio):
+    nombre = "gpiod2"
+
+    def _abrir_salidas(self, pines):
+        return _SalidasGpiod2(self.chip, pines, self.consumidor)
+
+    def _abrir_entradas(self, pines, rebote_kernel):
+        return solicitar_botones(self.chip, pines, rebote_kernel, self.consumidor)
+
+
+class HalGpiod1(HalGpio):
+    nombre = "gpiod1"
+
+    def _abrir_salidas(self, pines):
+        return _SalidasGpiod1(self.chip, pines, self.consumidor)
+
+    def _abrir_entradas(self, pines, rebote_kernel):
+        return _SolicitudGpiod1(self.chip, pines, self.consumidor)
+
+
+class HalGpiozero(HalGpio):
+    nombre = "gpiozero"
+
+    def _abrir_salidas(self, pines):
+        return _SalidasGpiozero(pines)
+
+    def _abrir_entradas(self, pines, rebote_kernel):
+        return _SolicitudGpiozero(pines)
+
+
+class HalSimulado(HalGpio):
+    """Backend en memoria. lazos {salida: entrada} conecta una salida con una entrada
+    simulada, como un cable, para medir escritura -> flanco -> evento sin hardware."""
+
+    nombre = "simulado"
+
+    def __init__(self, chip=CHIP, consumidor="hal_gpio", lazos=None):
+        super().__init__(chip, consumidor)
+        self.lazos = dict(lazos or {})
+        self._entradas = {}
+
+    def _abrir_salidas(self, pines):
+        return SalidasSimuladas(pines, self._propagar)
+
+    def _abrir_pwm(self, pines, frecuencia):
+        return SalidasPwmSimuladas(pines, frecuencia)
+
+    def _abrir_entradas(self, pines, rebote_kernel):
+        solicitud = SolicitudGpiodFalsa(pines)
+        for pin in pines:
+            self._entradas[pin] = solicitud
+        return solicitud
+
+    def _propagar(self, cambios):
+        for salida, valor in cambios.items():
+            entrada = self.lazos.get(salida)
+            if entrada in self._entradas:
+                self._entradas[entrada].fijar_nivel(entrada, valor)
+
+
+_CLASES = {"gpiod2": HalGpiod2, "gpiod1": HalGpiod1, "gpiozero": HalGpiozero, "simulado": HalSimulado}
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def _resumen(valores_ns):
+    """Media, p50, p99 y máximo en microsegundos"""
+    if not valores_ns:
+        return {"media": 0.0, "p50": 0.0, "p99": 0.0, "maxima": 0.0}
+    ordenados = sorted(valores_ns)
+    return {
+        "media": sum(ordenados) / len(ordenados) / 1e3,
+        "p50": ordenados[len(ordenados) // 2] / 1e3,
+        "p99": ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))] / 1e3,
+        "maxima": ordenados[-1] / 1e3,
+    }
+
+
+def medir_salidas(hal, pines, iteraciones=2000):
+    """Escribe todas las líneas una a una y en lote; devuelve llamadas y cambios por segundo"""
+    resultados = {}
+    for modo in ("por_linea", "en_lote"):
+        grupo = hal.salidas(pines)
+        inicio = time.perf_counter()
+        for i in range(iteraciones):
+            valor = i % 2 == 0
+            if modo == "en_lote":
+                grupo.escribir({pin: valor for pin in pines})
+            else:
+                for pin in pines:
+                    grupo.fijar(pin, valor)
+        segundos = time.perf_counter() - inicio
+        e = grupo.estadisticas()
+        resultados[modo] = {"escrituras": e["escrituras"], "cambios": e["cambios"], "segundos": segundos,
+                            "cambios_por_segundo": e["cambios"] / segundos if segundos else 0.0,
+                            "us_por_escritura": segundos / e["escrituras"] * 1e6 if e["escrituras"] else 0.0}
+        grupo.cerrar()
+        hal._abiertos.remove(grupo)
+    return resultados
+
+
+def medir_entrada(hal, salida, entrada, iteraciones=500, usar_asyncio=False, pausa=0.001):
+    """Latencia de escritura en una salida -> evento de la entrada conectada en lazo.
+
+    Devuelve las latencias (µs) de extremo a extremo y del flanco en el kernel
+    al callback, y los flancos perdidos (sin evento en 1 s).
+    """
+    grupo = hal.salidas((salida,))
+    # La entrada queda en alto (reposo del pull-up) antes de empezar
+    grupo.fijar(salida, True)
+    time.sleep(0.01)
+    # Sin antirrebote: cada escritura es un flanco limpio
+    botones = hal.botones((entrada,), rebote=0, pulsacion_larga=3600)
+    extremo, kernel = [], []
+    perdidos = 0
+
+    if usar_asyncio:
+        async def medir():
+            nonlocal perdidos
+            loop = asyncio.get_running_loop()
+            futuro = None
+
+            def al_evento(evento):
+                if evento["tipo"] in ("presionado", "liberado") and futuro and not futuro.done():
+                    futuro.set_result((time.perf_counter_ns(), evento))
+            botones.suscribir(al_evento)
+            botones.conectar(loop)
+            for i in range(iteraciones):
+                futuro = loop.create_future()
+                inicio = time.perf_counter_ns()
+                grupo.fijar(salida, i % 2 == 1)
+                try:
+                    fin, evento = await asyncio.wait_for(futuro, 1.0)
+                except asyncio.TimeoutError:
+                    perdidos += 1
+                    continue
+                extremo.append(fin - inicio)
+                kernel.append(evento["latencia"] * 1e9)
+                await asyncio.sleep(pausa)
+            botones.botones.desconectar()
+        asyncio.run(medir())
+    else:
+        recibido = threading.Event()
+        ultimo = []
+
+        def al_evento(evento):
+            if evento["tipo"] in ("presionado", "liberado"):
+                ultimo.append((time.perf_counter_ns(), evento))
+                recibido.set()
+        botones.suscribir(al_evento)
+        botones.iniciar()
+        for i in range(iteraciones):
+            recibido.clear()
+            ultimo.clear()
+            inicio = time.perf_counter_ns()
+            grupo.fijar(salida, i % 2 == 1)
+            if not recibido.wait(1.0):
+                perdidos += 1
+                continue
+            fin, evento = ultimo[0]
+            extremo.append(fin - inicio)
+            kernel.append(evento["latencia"] * 1e9)
+            time.sleep(pausa)
+
+    for objeto in (grupo, botones):
+        objeto.cerrar()
+        hal._abiertos.remove(objeto)
+    return {"extremo_a_extremo": _resumen(extremo), "flanco_a_callback": _resumen(kernel),
+            "medidas": len(extremo), "perdidos": perdidos}
+
+
+def benchmark(nombre, args):
+    if nombre == "simulado":
+        hal = HalSimulado(args.chip, lazos={args.lazo[0]: args.lazo[1]})
+    else:
+        hal = abrir_hal(nombre, args.chip)
+    print(f"\n=== Backend {hal.nombre} ===")
+    try:
+        salidas = medir_salidas(hal, args.salidas, args.iteraciones)
+        for modo, r in salidas.items():
+            print(f"Salidas {modo}: {r['escrituras']} escrituras para {r['cambios']} cambios, "
+                  f"{r['us_por_escritura']:.1f} µs/escritura, {r['cambios_por_segundo']:.0f} cambios/s")
+        if nombre != "simulado" and not args.con_lazo:
+            print(f"Entrada: sin medir (conecta GPIO{args.lazo[0]} con GPIO{args.lazo[1]} y usa --lazo)")
+            return
+        for usar_asyncio in (False, True):
+            r = medir_entrada(hal, args.lazo[0], args.lazo[1], max(1, args.iteraciones // 4), usar_asyncio)
+            ee, fc = r["extremo_a_extremo"], r["flanco_a_callback"]
+            print(f"Entrada ({'asyncio' if usar_asyncio else 'hilo'}): {r['medidas']} flancos, "
+                  f"{r['perdidos']} perdidos")
+            print(f"  escritura -> evento: media {ee['media']:.1f} µs, p50 {ee['p50']:.1f}, "
+                  f"p99 {ee['p99']:.1f}, máx {ee['maxima']:.1f}")
+            print(f"  flanco -> callback:  media {fc['media']:.1f} µs, p50 {fc['p50']:.1f}, "
+                  f"p99 {fc['p99']:.1f}, máx {fc['maxima']:.1f}")
+    finally:
+        hal.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Botón y LED sobre el backend de GPIO de menor latencia")
+    parser.add_argument("--backend", choices=BACKENDS, help="Forzar un backend (predeterminado: el mejor disponible)")
+    parser.add_argument("--chip", default=CHIP)
+    parser.add_argument("--boton", type=int, default=BUTTON_PIN)
+    parser.add_argument("--led", type=int, default=LED_PIN)
+    parser.add_argument("--benchmark", action="store_true", help="Medir escrituras y latencia de entrada")
+    parser.add_argument("--todos", action="store_true", help="Medir todos los backends disponibles")
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    parser.add_argument("--salidas", type=lambda s: tuple(int(p) for p in s.split(",")), default=(LED_PIN, 24),
+                        help="Líneas para medir las escrituras (ej. 25,24)")
+    parser.add_argument("--lazo", type=lambda s: tuple(int(p) for p in s.split(":")), default=None,
+                        metavar="SALIDA:ENTRADA", help="Salida cableada a una entrada para medir la latencia")
+    args = parser.parse_args()
+
+    print(f"Backends disponibles: {', '.join(backends_disponibles(args.chip))}")
+    if args.benchmark:
+        args.con_lazo = args.lazo is not None
+        args.lazo = args.lazo or (args.led, args.boton)
+        disponibles = backends_disponibles(args.chip)
+        nombres = disponibles if args.todos else [args.backend or disponibles[0]]
+        for nombre in nombres:
+            try:
+                benchmark(nombre, args)
+            except Exception as e:
+                print(f"Error midiendo {nombre}: {e}")
+        return
+
+    hal = abrir_hal(args.backend, args.chip)
+    print(f"Usando {hal.nombre}: botón en GPIO{args.boton}, LED en GPIO{args.led} (Ctrl+C para salir)")
+    led = hal.led(args.led)
+    botones = hal.boton(args.boton)
+
+    def al_evento(evento):
+        if evento["tipo"] in ("presionado", "liberado"):
+            led.fijar(evento["tipo"] == "presionado")
+        print(f"{evento['tipo']} (latencia {evento['latencia'] * 1000:.2f} ms)")
+    botones.suscribir(al_evento)
+
+    try:
+        botones.iniciar()
+        if hal.nombre == "simulado":
+            simular_pulsaciones(botones.solicitud, args.boton)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        e = botones.estadisticas()
+        s = led.salidas.estadisticas()
+        hal.cerrar()
+        print(f"Flancos: {e['flancos']}, eventos: {e['eventos']}, escrituras del LED: {s['escrituras']}")
+
+
+if __name__ == "__main__":
+    main()
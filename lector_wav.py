@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lector de archivos WAV con mmap y sin copias
+Mapea en memoria la región de datos PCM del archivo y entrega bloques como
+memoryview, de modo que el bucle de decodificación no crea un objeto bytes
+nuevo en cada iteración (como hace wave.readframes).
+
+Uso:
+    with LectorWav("prueba.wav", frames_por_bloque=4000) as lector:
+        for bloque in lector.bloques_vosk():
+            recognizer.AcceptWaveform(bloque)
+"""
+
+import os
+import sys
+import mmap
+import struct
+
+# Formatos de audio de la cabecera 'fmt '
+FORMATO_PCM = 0x0001
+FORMATO_EXTENSIBLE = 0xFFFE
+
+# Tamaño de bloque predeterminado en frames (igual que los scripts de Vosk)
+FRAMES_POR_BLOQUE = 4000
+
+
+def adaptador_vosk():
+    """Devuelve una función que envuelve un memoryview para AcceptWaveform sin copiarlo.
+
+    KaldiRecognizer pasa los datos directamente a una función C mediante cffi;
+    ffi.from_buffer crea un puntero al mismo buffer. Si Vosk no está instalado
+    (o es una versión sin cffi) se recurre a bytes(), que sí copia.
+    """
+    try:
+        from vosk import _ffi
+        return _ffi.from_buffer
+    except ImportError:
+        return bytes
+
+
+class LectorWav:
+    """Lee un WAV mono de 16 bits PCM mapeando en memoria su región de datos"""
+
+    def __init__(self, ruta, frames_por_bloque=FRAMES_POR_BLOQUE):
+        self.ruta = ruta
+        self.frames_por_bloque = frames_por_bloque
+        self._archivo = open(ruta, "rb")
+        try:
+            self._leer_cabecera()
+            self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._archivo.close()
+            raise
+        self._datos = memoryview(self._mapa)[self._inicio_datos:self._inicio_datos + self._tamano_datos]
+
+    def _leer_cabecera(self):
+        """Valida la cabecera RIFF una sola vez y localiza el bloque 'data'"""
+        tamano_archivo = os.fstat(self._archivo.fileno()).st_size
+        riff, _, wave_id = struct.unpack("<4sI4s", self._archivo.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{self.ruta} no es un archivo WAV")
+
+        formato = None
+        while True:
+            cabecera = self._archivo.read(8)
+            if len(cabecera) < 8:
+                raise ValueError(f"{self.ruta} no tiene bloque de datos")
+            id_bloque, tamano = struct.unpack("<4sI", cabecera)
+
+            if id_bloque == b"fmt ":
+                fmt = self._archivo.read(tamano)
+                formato, self.canales, self.frecuencia, _, _, self.bits = struct.unpack("<HHIIHH", fmt[:16])
+                if formato == FORMATO_EXTENSIBLE and len(fmt) >= 26:
+                    formato = struct.unpack("<H", fmt[24:26])[0]
+                if tamano % 2:
+                    self._archivo.read(1)
+            elif id_bloque == b"data":
+                if formato is None:
+                    raise ValueError(f"{self.ruta} no tiene bloque 'fmt ' antes de los datos")
+                self._inicio_datos = self._archivo.tell()
+                # arecord interrumpido puede dejar el tamaño sin actualizar
+                self._tamano_datos = min(tamano, tamano_archivo - self._inicio_datos)
+                break
+            else:
+                self._archivo.seek(tamano + (tamano % 2), os.SEEK_CUR)
+
+        if formato != FORMATO_PCM or self.canales != 1 or self.bits != 16:
+            raise ValueError(
+                f"Formato no compatible: canales={self.canales}, bits={self.bits}, "
+                f"formato={formato:#06x} (se requiere mono, 16 bits, PCM)"
+            )
+        self._tamano_datos -= self._tamano_datos % 2
+
+    @property
+    def nframes(self):
+        return self._tamano_datos // 2
+
+    @property
+    def duracion(self):
+        return self.nframes / self.frecuencia
+
+    def bloques(self, inicio=0, fin=None, frames_por_bloque=None):
+        """Genera memoryviews consecutivos sobre los datos PCM (sin copias).
+
+        Args:
+            inicio: Primer frame
+            fin: Frame final (exclusivo); None para llegar al final
+            frames_por_bloque: Tamaño de bloque; por defecto el del lector
+        """
+        paso = (frames_por_bloque or self.frames_por_bloque) * 2
+        fin = self.nframes if fin is None else min(fin, self.nframes)
+        for posicion in range(inicio * 2, fin * 2, paso):
+            yield self._datos[posicion:min(posicion + paso, fin * 2)]
+
+    def bloques_vosk(self, inicio=0, fin=None, frames_por_bloque=None):
+        """Igual que bloques(), pero listos para KaldiRecognizer.AcceptWaveform"""
+        adaptar = adaptador_vosk()
+        for bloque in self.bloques(inicio, fin, frames_por_bloque):
+            yield adaptar(bloque)
+
+    def muestras(self):
+        """Devuelve todas las muestras como arreglo int16 de NumPy sobre el mismo mmap"""
+        import numpy as np
+        return np.frombuffer(self._datos, dtype=np.int16)
+
+    def close(self):
+        self._datos.release()
+        try:
+            self._mapa.close()
+        except BufferError:
+            # Todavía hay bloques o arreglos en uso; el mapa se libera al recolectarlos
+            pass
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def copia_mono(ruta, directorio=None):
+    """Ruta de un WAV mono de 16 bits PCM con el audio de ruta.
+
+    Si el archivo ya lo es se devuelve la misma ruta; si no, se promedian los
+    canales (como detector_voz.leer_mono) en un WAV nuevo dentro de
+    directorio, que quien llama se encarga de borrar.
+    """
+    try:
+        with LectorWav(ruta):
+            return ruta
+    except ValueError:
+        pass
+
+    import wave
+    import tempfile
+    import numpy as np
+
+    with wave.open(ruta, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{ruta}: se requieren muestras de 16 bits")
+        canales = wf.getnchannels()
+        frecuencia = wf.getframerate()
+        muestras = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if canales > 1:
+        muestras = muestras.reshape(-1, canales).mean(axis=1).astype(np.int16)
+
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    fd, destino = tempfile.mkstemp(prefix=nombre + "_", suffix="_mono.wav", dir=directorio)
+    with os.fdopen(fd, "wb") as f, wave.open(f, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(frecuencia)
+        wf.writeframes(muestras.tobytes())
+    return destino
+
+
+def main():
+    """Muestra la información de la cabecera de los archivos indicados"""
+    if len(sys.argv) < 2:
+        print("Uso: python lector_wav.py archivo.wav [archivo.wav ...]")
+        sys.exit(1)
+
+    for ruta in sys.argv[1:]:
+        try:
+            with LectorWav(ruta) as lector:
+                print(f"{ruta}: {lector.frecuencia} Hz, {lector.nframes} frames, {lector.duracion:.2f}s")
+        except (OSError, ValueError) as e:
+            print(f"{ruta}: Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
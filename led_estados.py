@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indicación del estado del asistente con el LED
+Los parpadeos con time.sleep() en el hilo principal (gpio_test.py, 7-4) o
+led.on()/led.off() en los callbacks compiten con la decodificación y se
+desfasan cuando la CPU está ocupada. MotorLed reproduce un patrón por estado
+(escuchando, pensando, hablando, bateria_baja...):
+- con PWM por hardware los patrones cuadrados se programan en el periférico
+  (cero despertares) y los demás se escriben como brillos
+- si no, un hilo de baja prioridad precalcula la forma de onda de cada
+  patrón (solo los instantes en que cambia algún LED, con los cambios
+  cercanos juntos) y duerme hasta el siguiente cambio con plazos absolutos;
+  cada cambio de todos los LEDs es una sola escritura (GrupoSalidas)
+Cada escritura registra su desfase respecto al plazo (jitter).
+
+Uso:
+    python led_estados.py [--backend simulado] [--salida gpio] [--segundos 3] [--carga 4] [--ingenuo]
+"""
+
+import os
+import math
+import time
+import argparse
+import threading
+from collections import deque, namedtuple
+
+from hal_gpio import abrir_hal, pwm_disponible, LED_PIN
+
+NICE_HILO = 10              # Prioridad del hilo del LED (la decodificación va primero)
+RESOLUCION = 0.002          # Segundos: cambios más cercanos se escriben juntos
+MAX_DESFASES = 2000         # Desfases que se guardan para las estadísticas
+
+
+def respiracion(periodo=2.0, pasos=20):
+    """Subida y bajada suave del brillo (en GPIO sin PWM queda en encendido/apagado)"""
+    return [(periodo / pasos, (1 - math.cos(2 * math.pi * i / pasos)) / 2) for i in range(pasos)]
+
+
+# Cada patrón es una lista de (segundos, brillo) que se repite; el brillo
+# puede ser un número para todos los LEDs o una tupla con uno por LED
+PATRONES = {
+    "apagado": [(1.0, 0.0)],
+    "escuchando": respiracion(2.0),
+    "pensando": [(0.1, 1.0), (0.1, 0.0)],
+    "hablando": [(0.4, 1.0), (0.1, 0.0)],
+    "bateria_baja": [(0.1, 1.0), (0.15, 0.0), (0.1, 1.0), (1.65, 0.0)],
+}
+
+# transiciones: [(desfase_ns, {pin: valor})]; periodo_ns None si el patrón es fijo;
+# cuadrada: (periodo, ciclo) si es un encendido/apagado simple que puede hacer el PWM
+Forma = namedtuple("Forma", "transiciones periodo_ns cuadrada")
+
+
+def precalcular(patron, pines, admite_brillo=False, resolucion=RESOLUCION):
+    """Convierte un patrón en las escrituras de un periodo"""
+    pasos = []
+    desfase = 0
+    for duracion, brillo in patron:
+        brillos = brillo if isinstance(brillo, (tuple, list)) else (brillo,) * len(pines)
+        valores = {pin: (float(b) if admite_brillo else b >= 0.5) for pin, b in zip(pines, brillos)}
+        pasos.append((desfase, valores))
+        desfase += int(duracion * 1e9)
+    periodo = desfase
+
+    transiciones = []
+    actual = None
+    for desfase, valores in pasos:
+        if valores == actual:
+            continue
+        if transiciones and desfase - transiciones[-1][0] < resolucion * 1e9:
+            # Demasiado cerca del cambio anterior: se escribe en el mismo instante
+            transiciones[-1] = (transiciones[-1][0], valores)
+        else:
+            transiciones.append((desfase, valores))
+        actual = valores
+    if len(transiciones) > 2 and transiciones[-1][1] == transiciones[0][1]:
+        # El final del periodo continúa en el principio: empezar en el segundo cambio
+        # para no despertar en cada vuelta a escribir el mismo valor
+        inicio = transiciones[1][0]
+        transiciones = [(desfase - inicio, valores) for desfase, valores in transiciones[1:]]
+    if len(transiciones) <= 1:
+        return Forma(transiciones[:1], None, None)
+
+    cuadrada = None
+    niveles = [set(v.values()) for _, v in transiciones]
+    if len(transiciones) == 2 and sorted(map(tuple, niveles)) == [(0,), (1,)]:
+        encendido = transiciones[1][0] if niveles[0] == {1} else periodo - transiciones[1][0]
+        cuadrada = (periodo / 1e9, encendido / periodo)
+    return Forma(transiciones, periodo, cuadrada)
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else 0
+
+
+def resumen_desfases(desfases_ns):
+    """Media, p50, p99 y máximo en milisegundos"""
+    ordenados = sorted(desfases_ns)
+    return {
+        "media": sum(ordenados) / len(ordenados) / 1e6 if ordenados else 0.0,
+        "p50": _percentil(ordenados, 0.5) / 1e6,
+        "p99": _percentil(ordenados, 0.99) / 1e6,
+        "maximo": (ordenados[-1] if ordenados else 0) / 1e6,
+    }
+
+
+class MotorLed:
+    """Reproduce el patrón del estado actual en uno o varios LEDs.
+
+    Args:
+        salidas: hal_gpio.GrupoSalidas (niveles) o SalidasPwm (brillos)
+        pines: LEDs del grupo que sigue el patrón (todos si None)
+        patrones: Diccionario {estado: patrón}, por defecto PATRONES
+        nice: Prioridad del hilo (más alto = menos prioridad)
+    """
+
+    def __init__(self, salidas, pines=None, patrones=None, nice=NICE_HILO):
+        self.salidas = salidas
+        self.pines = tuple(pines or salidas.pines)
+        self.nice = nice
+        admite_brillo = getattr(salidas, "admite_brillo", False)
+        self._formas = {nombre: precalcular(patron, self.pines, admite_brillo)
+                        for nombre, patron in (patrones or PATRONES).items()}
+        self._estado = "apagado" if "apagado" in self._formas else next(iter(self._formas))
+        self._cond = threading.Condition()
+        self._cambio = False
+        self._detenido = False
+        self._hilo = None
+
+        # Métricas
+        self.escrituras = 0
+        self.atrasos = 0            # Periodos completos perdidos (reajustes del plazo)
+        self.cambios_estado = 0
+        self.cpu = 0.0              # Segundos de CPU del hilo
+        self._desfases = deque(maxlen=MAX_DESFASES)
+
+    @property
+    def estado(self):
+        return self._estado
+
+    def fijar_estado(self, estado):
+        """Cambia de patrón; el hilo empieza el nuevo enseguida (desde cualquier hilo)"""
+        if estado not in self._formas:
+            raise ValueError(f"Estado de LED desconocido: {estado} (hay {', '.join(self._formas)})")
+        with self._cond:
+            if estado == self._estado:
+                return
+            self._estado = estado
+            self._cambio = True
+            self.cambios_estado += 1
+            self._cond.notify()
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="led", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        with self._cond:
+            self._detenido = True
+            self._cond.notify()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self.salidas.escribir({pin: 0 for pin in self.pines})
+
+    # --- Hilo --------------------------------------------------------------
+
+    def _bajar_prioridad(self):
+        try:
+            # En Linux la prioridad nice es por hilo
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (OSError, AttributeError):
+            pass
+
+    def _bucle(self):
+        self._bajar_prioridad()
+        with self._cond:
+            while not self._detenido:
+                self._cambio = False
+                self._reproducir(self._formas[self._estado])
+
+    def _esperar_hasta(self, plazo_ns=None):
+        """Duerme hasta el plazo (o hasta el próximo cambio si es None); False si antes
+        hubo un cambio de estado o se detuvo"""
+        while not (self._cambio or self._detenido):
+            if plazo_ns is None:
+                self._cond.wait()
+                continue
+            restante = (plazo_ns - time.monotonic_ns()) / 1e9
+            if restante <= 0:
+                return True
+            self._cond.wait(restante)
+        return False
+
+    def _reproducir(self, forma):
+        if forma.cuadrada and hasattr(self.salidas, "parpadear"):
+            # El periférico PWM hace el parpadeo solo
+            for pin in self.pines:
+                self.salidas.parpadear(pin, *forma.cuadrada)
+            self.escrituras += 1
+            self._esperar_hasta()
+            return
+
+        inicio = time.monotonic_ns()
+        if forma.periodo_ns is None:
+            self._escribir(forma.transiciones[0][1], inicio)
+            self._esperar_hasta()
+            return
+
+        ciclo = 0
+        while True:
+            for desfase, valores in forma.transiciones:
+                plazo = inicio + ciclo * forma.periodo_ns + desfase
+                if not self._esperar_hasta(plazo):
+                    return
+                self._escribir(valores, plazo)
+            ciclo += 1
+            retraso = time.monotonic_ns() - (inicio + ciclo * forma.periodo_ns)
+            if retraso > forma.periodo_ns:
+                # Se perdió al menos un periodo entero: seguir desde ahora en lugar de recuperar
+                self.atrasos += 1
+                ciclo += retraso // forma.periodo_ns
+
+    def _escribir(self, valores, plazo_ns):
+        self._desfases.append(max(0, time.monotonic_ns() - plazo_ns))
+        self.salidas.escribir(valores)
+        self.escrituras += 1
+        self.cpu = time.thread_time()
+
+    def estadisticas(self):
+        """Escrituras, periodos perdidos, CPU del hilo y desfase respecto a los plazos (ms)"""
+        return {
+            "estado": self._estado,
+            "escrituras": self.escrituras,
+            "cambios_estado": self.cambios_estado,
+            "atrasos": self.atrasos,
+            "cpu": self.cpu,
+            "desfase": resumen_desfases(list(self._desfases)),
+        }
+
+
+def abrir_motor(hal, pin=LED_PIN, usar_pwm=None):
+    """MotorLed sobre PWM por hardware si la línea lo tiene (o si usar_pwm), si no sobre GPIO"""
+    if usar_pwm is None:
+        usar_pwm = hal.nombre == "simulado" or pwm_disponible(pin)
+    salidas = hal.pwm((pin,)) if usar_pwm else hal.salidas((pin,))
+    return MotorLed(salidas)
+
+
+# ---------------------------------------------------------------------------
+# Comparación
+# ---------------------------------------------------------------------------
+
+def _ocupar_cpu(detener):
+    while not detener.is_set():
+        sum(i * i for i in range(10000))
+
+
+def parpadeo_ingenuo(salidas, pin, patron, segundos):
+    """Como gpio_test.py: escribir y time.sleep(duración) seguidos; devuelve los desfases (ns)"""
+    desfases = []
+    inicio = plazo = time.monotonic_ns()
+    while time.monotonic_ns() - inicio < segundos * 1e9:
+        for duracion, brillo in patron:
+            desfases.append(max(0, time.monotonic_ns() - plazo))
+            salidas.escribir({pin: brillo >= 0.5})
+            time.sleep(duracion)
+            plazo += int(duracion * 1e9)
+    return desfases
+
+
+def main():
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Patrones del LED por estado con medida del jitter")
+    parser.add_argument("--backend", help="Backend de hal_gpio (predeterminado: el mejor disponible)")
+    parser.add_argument("--pin", type=int, default=LED_PIN)
+    parser.add_argument("--salida", choices=("auto", "pwm", "gpio"), default="auto",
+                        help="PWM por hardware, GPIO con el hilo de baja prioridad o según la línea")
+    parser.add_argument("--estado", choices=sorted(PATRONES), help="Mostrar solo este estado")
+    parser.add_argument("--segundos", type=float, default=3.0, help="Duración de cada estado")
+    parser.add_argument("--carga", type=int, default=0, help="Procesos que ocupan la CPU durante la prueba")
+    parser.add_argument("--ingenuo", action="store_true", help="Comparar con el bucle de time.sleep()")
+    args = parser.parse_args()
+
+    hal = abrir_hal(args.backend)
+    detener_carga = multiprocessing.Event()
+    cargas = [multiprocessing.Process(target=_ocupar_cpu, args=(detener_carga,), daemon=True)
+              for _ in range(args.carga)]
+    for proceso in cargas:
+        proceso.start()
+
+    try:
+        motor = abrir_motor(hal, args.pin, None if args.salida == "auto" else args.salida == "pwm")
+        print(f"Backend {hal.nombre}, {'PWM' if motor.salidas.admite_brillo else 'GPIO'} en la línea {args.pin}, "
+              f"{args.carga} procesos de carga")
+        motor.iniciar()
+        for estado in [args.estado] if args.estado else [e for e in PATRONES if e != "apagado"]:
+            escrituras, cpu = motor.escrituras, motor.cpu
+            motor._desfases.clear()
+            motor.fijar_estado(estado)
+            time.sleep(args.segundos)
+            e = motor.estadisticas()
+            d = e["desfase"]
+            print(f"{estado}: {e['escrituras'] - escrituras} escrituras, desfase media {d['media']:.3f} ms, "
+                  f"p99 {d['p99']:.3f} ms, máx {d['maximo']:.3f} ms")
+        motor.detener()
+        e = motor.estadisticas()
+        print(f"CPU del hilo del LED: {e['cpu'] * 1000:.1f} ms, periodos perdidos: {e['atrasos']}")
+
+        if args.ingenuo:
+            salidas = hal.salidas((args.pin,)) if motor.salidas.admite_brillo else motor.salidas
+            patron = PATRONES[args.estado or "pensando"]
+            d = resumen_desfases(parpadeo_ingenuo(salidas, salidas.pines[0], patron, args.segundos))
+            print(f"Bucle con time.sleep(): desfase acumulado media {d['media']:.3f} ms, "
+                  f"p99 {d['p99']:.3f} ms, máx {d['maximo']:.3f} ms")
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        detener_carga.set()
+        for proceso in cargas:
+            proceso.join()
+        hal.cerrar()
+
+
+if __name__ == "__main__":
+    main()
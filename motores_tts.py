@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motores de síntesis de voz intercambiables
+Todos entregan PCM 16-bit mono en chunks con la misma interfaz (generar),
+así ElevenSpeech puede usar Eleven Labs o un motor local sin red:
+espeak-ng (muy rápido, voz robótica) o piper (voz neuronal, más lento).
+SelectorMotores elige el motor de cada frase según su longitud, la
+disponibilidad y la latencia medida, y cae al motor local si la API falla.
+
+Uso:
+    python motores_tts.py "texto" [--motor espeak|piper|auto]
+"""
+
+import os
+import json
+import time
+import shutil
+import struct
+import logging
+import argparse
+import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+# espeak-ng
+VOZ_ESPEAK = os.getenv("ESPEAK_VOZ", "es-419")
+VELOCIDAD_ESPEAK = 165          # Palabras por minuto
+
+# piper
+MODELO_PIPER = os.getenv("PIPER_MODELO", "es_MX-claude-high.onnx")
+
+# Selección automática
+MAX_CARACTERES_LOCAL = 40       # Frases cortas (avisos del sistema) siempre en local
+LATENCIA_MAXIMA_REMOTA = 1.5    # Segundos hasta el primer chunk a partir de los que se prefiere el local
+ENFRIAMIENTO = 30.0             # Segundos sin usar un motor después de un fallo
+SUAVIZADO = 0.3                 # Peso de la última medida en la media de latencia
+
+BYTES_CHUNK = 4096
+
+
+class MotorTTS:
+    """Interfaz común: generar(texto) devuelve chunks PCM 16-bit mono a self.frecuencia"""
+
+    nombre = "base"
+    local = False
+
+    def __init__(self, voz, frecuencia):
+        self.voz = voz
+        self.frecuencia = frecuencia
+
+    @property
+    def formato(self):
+        """Identifica el audio producido (forma parte de la clave de la caché)"""
+        return f"pcm_{self.frecuencia}"
+
+    def disponible(self):
+        return True
+
+    def generar(self, texto):
+        raise NotImplementedError
+
+
+class MotorEleven(MotorTTS):
+    """Eleven Labs a través del cliente compartido (cliente_tts.ClienteTTS)"""
+
+    nombre = "eleven"
+
+    def __init__(self, cliente, voz, modelo, formato):
+        super().__init__(voz, int(formato.split("_")[1]))
+        self.cliente = cliente
+        self.modelo = modelo
+
+    def generar(self, texto):
+        return self.cliente.generar(texto, self.voz, self.modelo, self.formato)
+
+
+class _MotorProceso(MotorTTS):
+    """Motor que ejecuta un programa y lee el audio de su stdout"""
+
+    local = True
+
+    def _comando(self, texto):
+        raise NotImplementedError
+
+    def _leer_cabecera(self, salida):
+        """Consume lo que preceda al PCM en stdout; por defecto no hay cabecera"""
+
+    def generar(self, texto):
+        cmd, entrada = self._comando(texto)
+        proceso = subprocess.Popen(cmd, stdin=subprocess.PIPE if entrada else subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        try:
+            if entrada:
+                proceso.stdin.write(entrada.encode("utf-8"))
+                proceso.stdin.close()
+            self._leer_cabecera(proceso.stdout)
+            while True:
+                data = proceso.stdout.read(BYTES_CHUNK)
+                if not data:
+                    break
+                yield data
+            if proceso.wait() != 0:
+                raise RuntimeError(f"{cmd[0]} terminó con código {proceso.returncode}")
+        finally:
+            # Si se dejó de leer a medias (reproducción interrumpida) no dejar el proceso vivo
+            if proceso.poll() is None:
+                proceso.kill()
+                proceso.wait()
+
+
+class MotorEspeak(_MotorProceso):
+    """espeak-ng (o espeak) con salida WAV por stdout"""
+
+    nombre = "espeak"
+
+    def __init__(self, voz=VOZ_ESPEAK, velocidad=VELOCIDAD_ESPEAK):
+        super().__init__(voz, 22050)
+        self.velocidad = velocidad
+        self.programa = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def disponible(self):
+        return self.programa is not None
+
+    def _comando(self, texto):
+        return [self.programa, "-v", self.voz, "-s", str(self.velocidad), "--stdout", texto], None
+
+    def _leer_cabecera(self, salida):
+        # Recorrer los chunks RIFF hasta "data"; la frecuencia sale del chunk "fmt "
+        if _leer_exacto(salida, 12)[:4] != b"RIFF":
+            raise RuntimeError(f"{self.programa} no devolvió un WAV")
+        while True:
+            cabecera = _leer_exacto(salida, 8)
+            if len(cabecera) < 8:
+                raise RuntimeError(f"{self.programa} no devolvió audio")
+            nombre, tamano = cabecera[:4], struct.unpack("<I", cabecera[4:])[0]
+            if nombre == b"data":
+                return
+            cuerpo = _leer_exacto(salida, tamano + tamano % 2)
+            if nombre == b"fmt " and struct.unpack("<I", cuerpo[4:8])[0] != self.frecuencia:
+                raise RuntimeError(f"{self.programa} genera audio a una frecuencia inesperada")
+
+
+class MotorPiper(_MotorProceso):
+    """piper con un modelo .onnx; lee el texto por stdin y escribe PCM crudo"""
+
+    nombre = "piper"
+
+    def __init__(self, modelo=MODELO_PIPER):
+        frecuencia = 22050
+        try:
+            with open(modelo + ".json", encoding="utf-8") as f:
+                frecuencia = json.load(f)["audio"]["sample_rate"]
+        except (OSError, KeyError, ValueError):
+            pass
+        super().__init__(os.path.basename(modelo), frecuencia)
+        self.modelo = modelo
+        self.programa = shutil.which("piper")
+
+    def disponible(self):
+        return self.programa is not None and os.path.exists(self.modelo)
+
+    def _comando(self, texto):
+        return [self.programa, "--model", self.modelo, "--output-raw"], texto
+
+
+def _leer_exacto(salida, n):
+    data = b""
+    while len(data) < n:
+        parte = salida.read(n - len(data))
+        if not parte:
+            break
+        data += parte
+    return data
+
+
+def motor_local():
+    """El mejor motor local instalado (piper si tiene modelo, si no espeak-ng), o None"""
+    for motor in (MotorPiper(), MotorEspeak()):
+        if motor.disponible():
+            return motor
+    return None
+
+
+class SelectorMotores:
+    """Elige el motor de cada texto y cambia al local si el remoto falla.
+
+    Args:
+        remoto: Motor remoto (MotorEleven) o None
+        local: Motor local o None
+        max_caracteres_local: Textos de hasta esta longitud se dicen con el motor local
+    """
+
+    def __init__(self, remoto=None, local=None, max_caracteres_local=MAX_CARACTERES_LOCAL):
+        self.remoto = remoto
+        self.local = local
+        self.max_caracteres_local = max_caracteres_local
+        self.preferir_local = False     # Ahorro de energía: el motor local primero para cualquier texto
+        self._latencia = {}             # nombre -> (media móvil del tiempo hasta el primer chunk, instante)
+        self._bloqueado_hasta = {}      # nombre -> instante hasta el que no se usa
+        self._lock = threading.Lock()
+
+    def _usable(self, motor):
+        return (motor is not None and motor.disponible()
+                and self._bloqueado_hasta.get(motor.nombre, 0) <= time.monotonic())
+
+    def elegir(self, texto):
+        """Motores a intentar para texto, en orden de preferencia"""
+        remoto, local = self._usable(self.remoto), self._usable(self.local)
+        if local and (self.preferir_local or not remoto or len(texto) <= self.max_caracteres_local
+                      or self._latencia_reciente(self.remoto) > LATENCIA_MAXIMA_REMOTA):
+            candidatos = [self.local, self.remoto]
+        else:
+            candidatos = [self.remoto, self.local]
+        candidatos = [m for m in candidatos if m is not None]
+        if not candidatos:
+            raise RuntimeError("No hay ningún motor de síntesis disponible")
+        return candidatos
+
+    def _latencia_reciente(self, motor):
+        # Una medida vieja no cuenta: así el motor remoto lento se vuelve a probar de vez en cuando
+        latencia, instante = self._latencia.get(motor.nombre, (0.0, 0.0))
+        return latencia if time.monotonic() - instante < ENFRIAMIENTO else 0.0
+
+    def _registrar(self, motor, latencia):
+        with self._lock:
+            anterior = self._latencia.get(motor.nombre, (latencia, 0.0))[0]
+            self._latencia[motor.nombre] = (anterior + SUAVIZADO * (latencia - anterior), time.monotonic())
+
+    def generar(self, texto, candidatos=None):
+        """Chunks del primer motor que funcione; si uno falla antes del audio se prueba el siguiente.
+
+        Todos los candidatos deben producir la misma frecuencia que el primero,
+        porque el reproductor ya está abierto a esa frecuencia.
+        """
+        candidatos = candidatos or self.elegir(texto)
+        frecuencia = candidatos[0].frecuencia
+        ultimo_error = None
+        for motor in candidatos:
+            if motor.frecuencia != frecuencia:
+                continue
+            inicio = time.monotonic()
+            recibido = False
+            try:
+                for chunk in motor.generar(texto):
+                    if not recibido:
+                        recibido = True
+                        self._registrar(motor, time.monotonic() - inicio)
+                    yield chunk
+                return
+            except Exception as e:
+                if recibido:
+                    raise
+                ultimo_error = e
+                self._bloqueado_hasta[motor.nombre] = time.monotonic() + ENFRIAMIENTO
+                logger.warning("Falló el motor %s (%s); se prueba el siguiente", motor.nombre, e)
+        raise RuntimeError(f"Ningún motor pudo sintetizar el texto: {ultimo_error}")
+
+    def latencias(self):
+        """Media móvil del tiempo hasta el primer chunk de cada motor usado"""
+        return {nombre: latencia for nombre, (latencia, _) in self._latencia.items()}
+
+
+def main():
+    import sounddevice as sd
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Sintetiza un texto con un motor local")
+    parser.add_argument("texto", nargs="?", default="Listo, te escucho.")
+    parser.add_argument("--motor", choices=["espeak", "piper", "auto"], default="auto")
+    args = parser.parse_args()
+
+    motor = {"espeak": MotorEspeak, "piper": MotorPiper, "auto": motor_local}[args.motor]()
+    if motor is None or not motor.disponible():
+        print("Error: No hay motor local instalado (sudo apt install espeak-ng, o instala piper y su modelo).")
+        return
+
+    inicio = time.monotonic()
+    primer_chunk = None
+    chunks = []
+    for chunk in motor.generar(args.texto):
+        if primer_chunk is None:
+            primer_chunk = time.monotonic() - inicio
+        chunks.append(chunk)
+    total = time.monotonic() - inicio
+    pcm = b"".join(chunks)
+    print(f"{motor.nombre}: primer chunk en {primer_chunk * 1000:.0f} ms, {total * 1000:.0f} ms en total, "
+          f"{len(pcm) / 2 / motor.frecuencia:.2f}s de audio")
+    sd.play(np.frombuffer(pcm, dtype=np.int16), motor.frecuencia)
+    sd.wait()
+
+
+if __name__ == "__main__":
+    main()
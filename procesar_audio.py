@@ -1,86 +1,362 @@
 #!/usr/bin/env python3
 
 import sys
-import json
-import wave
 import os
-from vosk import Model, KaldiRecognizer
-
-if len(sys.argv) < 2:
-    print("Uso: python procesar_audio.py [archivo_audio.wav] [ruta_modelo]")
-    sys.exit(1)
-
-# Ruta del archivo de audio
-archivo_audio = sys.argv[1]
-
-# Verificar si existe el archivo
-if not os.path.exists(archivo_audio):
-    print(f"Error: El archivo {archivo_audio} no existe.")
-    sys.exit(1)
-
-# Verificar formato
-if not archivo_audio.lower().endswith('.wav'):
-    print("Error: Solo se admiten archivos WAV.")
-    print("Consejo: Puedes convertir otros formatos a WAV con ffmpeg:")
-    print("  ffmpeg -i tu_archivo.mp3 -ar 16000 -ac 1 salida.wav")
-    sys.exit(1)
-
-# Ruta del modelo
-if len(sys.argv) > 2:
-    model_path = sys.argv[2]
-else:
-    model_path = "modelo_vosk_es"  # Ruta predeterminada
-
-# Verificar si existe el modelo
-if not os.path.exists(model_path):
-    print(f"Error: El modelo en {model_path} no existe.")
-    sys.exit(1)
-
-# Cargar modelo
-print(f"Cargando modelo desde {model_path}...")
-model = Model(model_path)
-print("Modelo cargado.")
-
-# Abrir el archivo de audio
-wf = wave.open(archivo_audio, "rb")
-
-# Verificar formato
-if wf.getnchannels() != 1:
-    print("Error: El archivo de audio debe ser mono (1 canal).")
-    sys.exit(1)
-
-sample_rate = wf.getframerate()
-print(f"Frecuencia de muestreo: {sample_rate} Hz")
-
-# Inicializar reconocedor
-rec = KaldiRecognizer(model, sample_rate)
-rec.SetWords(True)
-
-# Procesar el archivo
-print(f"Procesando {archivo_audio}...")
-resultados = []
-
-while True:
-    data = wf.readframes(4000)
-    if len(data) == 0:
-        break
-    
-    if rec.AcceptWaveform(data):
-        resultado = json.loads(rec.Result())
-        if resultado['text']:
-            resultados.append(resultado['text'])
-            print(f"Segmento: {resultado['text']}")
-
-# Obtener cualquier resultado final
-resultado_final = json.loads(rec.FinalResult())
-if resultado_final['text']:
-    resultados.append(resultado_final['text'])
-    print(f"Segmento final: {resultado_final['text']}")
-
-# Guardar resultado completo en un archivo
-nombre_salida = os.path.splitext(os.path.basename(archivo_audio))[0] + "_transcripcion.txt"
-with open(nombre_salida, "w", encoding="utf-8") as f:
-    for i, texto in enumerate(resultados):
-        f.write(f"{texto}\n")
-
-print(f"\nTranscripción completa guardada en {nombre_salida}")
+import json
+import glob
+import time
+import argparse
+import tempfile
+import multiprocessing
+from servidor_vosk import transcribir, transcribir_wav, AlmacenModelos
+from lector_wav import LectorWav, FRAMES_POR_BLOQUE, copia_mono
+
+# Modelo del modo lote (cargado antes de crear el pool, compartido por los
+# procesos hijos), tamaño de bloque de decodificación y directorio de las copias mono
+_modelo_proceso = None
+_bloque_proceso = FRAMES_POR_BLOQUE
+_temporal_proceso = None
+
+# Parámetros para dividir archivos largos en silencios
+DURACION_SEGMENTO = 30.0    # Duración objetivo de cada fragmento en segundos
+VENTANA_BUSQUEDA = 5.0      # Margen en segundos para buscar el silencio más cercano
+DURACION_TRAMA = 0.01       # Resolución del análisis de energía (10 ms)
+DURACION_SUAVIZADO = 0.3    # Ventana de suavizado para no cortar en pausas breves
+
+
+def guardar_transcripcion(archivo_audio, resultados, directorio="", relativo=None):
+    """Guarda los segmentos reconocidos en <nombre>_transcripcion.txt.
+
+    Con relativo (ruta del audio relativa a la raíz del lote) se reproduce su
+    subdirectorio dentro de directorio, para que dos archivos con el mismo
+    nombre en carpetas distintas no se pisen.
+    """
+    nombre_salida = os.path.splitext(relativo or os.path.basename(archivo_audio))[0] + "_transcripcion.txt"
+    nombre_salida = os.path.join(directorio, nombre_salida)
+    os.makedirs(os.path.dirname(nombre_salida) or ".", exist_ok=True)
+    with open(nombre_salida, "w", encoding="utf-8") as f:
+        for texto in resultados:
+            f.write(f"{texto}\n")
+    return nombre_salida
+
+
+def buscar_archivos_wav(entradas):
+    """Expande directorios y patrones glob a una lista ordenada de archivos WAV"""
+    archivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = glob.glob(os.path.join(entrada, "*.wav"))
+        elif glob.has_magic(entrada):
+            candidatos = glob.glob(entrada)
+        else:
+            candidatos = [entrada]
+        archivos.extend(c for c in sorted(candidatos) if c.lower().endswith(".wav"))
+    # Quitar duplicados conservando el orden
+    return list(dict.fromkeys(archivos))
+
+
+def raiz_comun(archivos):
+    """Directorio común de los archivos, para derivar las rutas de salida"""
+    return os.path.commonpath([os.path.dirname(os.path.abspath(a)) for a in archivos])
+
+
+def _iniciar_proceso(frames_por_bloque=FRAMES_POR_BLOQUE, temporal=None):
+    """Configura el proceso del pool; el modelo ya viene cargado del padre"""
+    global _bloque_proceso, _temporal_proceso
+    _bloque_proceso = frames_por_bloque
+    _temporal_proceso = temporal
+
+
+def _crear_pool(procesos, model_path, frames_por_bloque, temporal=None):
+    """Pool de procesos que comparten un único modelo.
+
+    El modelo se carga en este proceso antes de crear los hijos con fork: sus
+    páginas son de solo lectura y quedan compartidas (copy-on-write), en lugar
+    de cargar una copia por proceso.
+    """
+    global _modelo_proceso
+    _modelo_proceso = AlmacenModelos().obtener(model_path)
+    contexto = multiprocessing.get_context("fork")
+    return contexto.Pool(procesos, initializer=_iniciar_proceso, initargs=(frames_por_bloque, temporal))
+
+
+def _transcribir_en_proceso(archivo_audio):
+    """Transcribe un archivo con el modelo compartido (un reconocedor por archivo).
+
+    Los WAV estéreo se decodifican desde una copia mono temporal.
+    """
+    ruta = archivo_audio
+    try:
+        ruta = copia_mono(archivo_audio, _temporal_proceso)
+        return archivo_audio, transcribir_wav(_modelo_proceso, ruta, frames_por_bloque=_bloque_proceso), None
+    except Exception as e:
+        return archivo_audio, None, str(e)
+    finally:
+        if ruta != archivo_audio:
+            os.remove(ruta)
+
+
+def procesar_lote(entradas, model_path, procesos=None, directorio_salida=".",
+                  frames_por_bloque=FRAMES_POR_BLOQUE):
+    """Transcribe varios archivos en paralelo con un pool de procesos.
+
+    Args:
+        entradas: Archivos, directorios o patrones glob
+        model_path: Ruta del modelo de Vosk
+        procesos: Número de procesos (por defecto, uno por núcleo)
+        directorio_salida: Dónde guardar las transcripciones
+        frames_por_bloque: Frames por llamada a AcceptWaveform
+
+    Returns:
+        Diccionario con las estadísticas agregadas del lote
+    """
+    archivos = buscar_archivos_wav(entradas)
+    if not archivos:
+        print("Error: No se encontraron archivos WAV.")
+        return None
+
+    procesos = procesos or os.cpu_count() or 1
+    procesos = min(procesos, len(archivos))
+    os.makedirs(directorio_salida, exist_ok=True)
+    raiz = raiz_comun(archivos)
+
+    print(f"Procesando {len(archivos)} archivos con {procesos} procesos (modelo: {model_path})...")
+    duracion_total = 0.0
+    tiempo_decodificacion = 0.0
+    errores = 0
+
+    inicio = time.time()
+    with tempfile.TemporaryDirectory(prefix="lote_mono_") as temporal, \
+            _crear_pool(procesos, model_path, frames_por_bloque, temporal) as pool:
+        for archivo_audio, transcripcion, error in pool.imap_unordered(_transcribir_en_proceso, archivos):
+            if error:
+                errores += 1
+                print(f"Error en {archivo_audio}: {error}")
+                continue
+
+            relativo = os.path.relpath(os.path.abspath(archivo_audio), raiz)
+            nombre_salida = guardar_transcripcion(archivo_audio, transcripcion["segmentos"], directorio_salida,
+                                                  relativo)
+            duracion_total += transcripcion["duracion_audio"]
+            tiempo_decodificacion += transcripcion["tiempo_decodificacion"]
+            rtf = transcripcion["tiempo_decodificacion"] / max(transcripcion["duracion_audio"], 1e-9)
+            print(f"{archivo_audio}: {transcripcion['duracion_audio']:.1f}s, RTF {rtf:.3f} -> {nombre_salida}")
+    tiempo_total = time.time() - inicio
+
+    estadisticas = {
+        "archivos": len(archivos),
+        "errores": errores,
+        "duracion_audio": duracion_total,
+        "tiempo_total": tiempo_total,
+        "tiempo_decodificacion": tiempo_decodificacion,
+        # RTF de pared (incluye la carga del modelo) y RTF por núcleo
+        "rtf": tiempo_total / duracion_total if duracion_total else 0.0,
+        "rtf_por_proceso": tiempo_decodificacion / duracion_total if duracion_total else 0.0,
+    }
+
+    print(f"\nAudio total: {duracion_total:.1f}s en {tiempo_total:.2f}s "
+          f"(RTF {estadisticas['rtf']:.3f}, RTF por proceso {estadisticas['rtf_por_proceso']:.3f})")
+    print(f"Archivos con error: {errores}")
+    return estadisticas
+
+
+def energia_por_trama(archivo_audio, duracion_trama=DURACION_TRAMA):
+    """Calcula la energía media de cada trama del archivo, por bloques sobre el mmap"""
+    import numpy as np
+
+    with LectorWav(archivo_audio) as lector:
+        frecuencia = lector.frecuencia
+        tamano_trama = max(1, int(frecuencia * duracion_trama))
+        muestras = lector.muestras()
+        total_tramas = len(muestras) // tamano_trama
+        energias = np.empty(total_tramas, dtype=np.float32)
+
+        tramas_por_bloque = 1000
+        for desde in range(0, total_tramas, tramas_por_bloque):
+            hasta = min(desde + tramas_por_bloque, total_tramas)
+            bloque = muestras[desde * tamano_trama:hasta * tamano_trama].astype(np.float32)
+            bloque = bloque.reshape(hasta - desde, tamano_trama)
+            energias[desde:hasta] = np.mean(bloque * bloque, axis=1)
+        del muestras
+    return energias, tamano_trama, frecuencia
+
+
+def buscar_cortes_silencio(archivo_audio, duracion_segmento=DURACION_SEGMENTO,
+                           ventana=VENTANA_BUSQUEDA):
+    """Busca puntos de corte en silencios cercanos a cada múltiplo de duracion_segmento.
+
+    Returns:
+        Lista de rangos (inicio, fin) en frames que cubren todo el archivo
+    """
+    import numpy as np
+
+    energias, tamano_trama, frecuencia = energia_por_trama(archivo_audio)
+    total_tramas = len(energias)
+    with LectorWav(archivo_audio) as lector:
+        total_frames = lector.nframes
+
+    # Suavizar la energía para preferir pausas largas sobre huecos entre sílabas
+    suavizado = max(1, int(DURACION_SUAVIZADO / DURACION_TRAMA))
+    if total_tramas >= suavizado:
+        energias = np.convolve(energias, np.ones(suavizado) / suavizado, mode="same")
+
+    tramas_segmento = max(1, int(duracion_segmento / DURACION_TRAMA))
+    tramas_ventana = int(ventana / DURACION_TRAMA)
+
+    cortes = [0]
+    objetivo = tramas_segmento
+    while objetivo < total_tramas - tramas_ventana:
+        desde = max(cortes[-1] + 1, objetivo - tramas_ventana)
+        hasta = min(total_tramas, objetivo + tramas_ventana)
+        corte = desde + int(np.argmin(energias[desde:hasta]))
+        cortes.append(corte)
+        objetivo = corte + tramas_segmento
+
+    limites = [c * tamano_trama for c in cortes] + [total_frames]
+    return [(limites[i], limites[i + 1]) for i in range(len(limites) - 1)], frecuencia
+
+
+def _transcribir_fragmento_en_proceso(tarea):
+    """Transcribe un rango de frames con el modelo del proceso"""
+    indice, archivo_audio, inicio, fin = tarea
+    return indice, transcribir_wav(_modelo_proceso, archivo_audio, inicio=inicio, fin=fin,
+                                   frames_por_bloque=_bloque_proceso)
+
+
+def procesar_dividido(archivo_audio, model_path, procesos=None, duracion_segmento=None,
+                      frames_por_bloque=FRAMES_POR_BLOQUE):
+    """Divide un archivo largo en silencios y decodifica los fragmentos en paralelo.
+
+    Los fragmentos se vuelven a unir en orden y las marcas de tiempo de las
+    palabras se corrigen con el desplazamiento de cada fragmento.
+
+    Returns:
+        Diccionario con el mismo formato que transcribir_wav()
+    """
+    procesos = procesos or os.cpu_count() or 1
+
+    # Valida la cabecera (mono, 16 bits, PCM)
+    with LectorWav(archivo_audio) as lector:
+        duracion = lector.duracion
+
+    # Por defecto, fragmentos suficientes para repartir la carga entre todos los procesos
+    if duracion_segmento is None:
+        duracion_segmento = min(DURACION_SEGMENTO, max(duracion / (procesos * 2), VENTANA_BUSQUEDA))
+
+    rangos, frecuencia = buscar_cortes_silencio(archivo_audio, duracion_segmento)
+    procesos = min(procesos, len(rangos))
+    print(f"Dividiendo {archivo_audio} ({duracion:.1f}s) en {len(rangos)} fragmentos "
+          f"con {procesos} procesos...")
+
+    tareas = [(i, archivo_audio, inicio, fin) for i, (inicio, fin) in enumerate(rangos)]
+    fragmentos = [None] * len(tareas)
+
+    inicio = time.time()
+    with _crear_pool(procesos, model_path, frames_por_bloque) as pool:
+        for indice, transcripcion in pool.imap_unordered(_transcribir_fragmento_en_proceso, tareas):
+            fragmentos[indice] = transcripcion
+    tiempo_total = time.time() - inicio
+
+    resultados = [r for fragmento in fragmentos for r in fragmento["resultados"]]
+    segmentos = [r["text"] for r in resultados]
+    print(f"Audio: {duracion:.1f}s en {tiempo_total:.2f}s (RTF {tiempo_total / max(duracion, 1e-9):.3f})")
+    return {
+        "texto": " ".join(segmentos),
+        "segmentos": segmentos,
+        "resultados": resultados,
+        "frecuencia": frecuencia,
+        "duracion_audio": duracion,
+        "tiempo_decodificacion": sum(f["tiempo_decodificacion"] for f in fragmentos),
+        "tiempo_total": tiempo_total,
+    }
+
+
+def procesar_archivo(archivo_audio, model_path, dividir=False, procesos=None, duracion_segmento=None,
+                     frames_por_bloque=FRAMES_POR_BLOQUE):
+    """Transcribe un solo archivo con el servidor Vosk"""
+    # Verificar si existe el archivo
+    if not os.path.exists(archivo_audio):
+        print(f"Error: El archivo {archivo_audio} no existe.")
+        sys.exit(1)
+
+    # Verificar formato
+    if not archivo_audio.lower().endswith('.wav'):
+        print("Error: Solo se admiten archivos WAV.")
+        print("Consejo: Puedes convertir otros formatos a WAV con ffmpeg:")
+        print("  ffmpeg -i tu_archivo.mp3 -ar 16000 -ac 1 salida.wav")
+        sys.exit(1)
+
+    try:
+        if dividir:
+            transcripcion = procesar_dividido(archivo_audio, model_path, procesos, duracion_segmento,
+                                              frames_por_bloque)
+        else:
+            # Transcribir con el servidor Vosk (o cargando el modelo localmente si no está activo)
+            print(f"Procesando {archivo_audio} con el modelo {model_path}...")
+            transcripcion = transcribir(archivo_audio, model_path, frames_por_bloque=frames_por_bloque)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Frecuencia de muestreo: {transcripcion['frecuencia']} Hz")
+    resultados = transcripcion['segmentos']
+    for texto in resultados:
+        print(f"Segmento: {texto}")
+
+    # Guardar resultado completo en un archivo
+    nombre_salida = guardar_transcripcion(archivo_audio, resultados)
+    print(f"\nTranscripción completa guardada en {nombre_salida}")
+
+    if dividir:
+        # Guardar también las palabras con sus marcas de tiempo corregidas
+        palabras = [p for r in transcripcion["resultados"] for p in r.get("result", [])]
+        nombre_palabras = os.path.splitext(nombre_salida)[0] + "_palabras.json"
+        with open(nombre_palabras, "w", encoding="utf-8") as f:
+            json.dump(palabras, f, ensure_ascii=False, indent=2)
+        print(f"Marcas de tiempo por palabra guardadas en {nombre_palabras}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python procesar_audio.py [archivo_audio.wav] [ruta_modelo]\n"
+              "       python procesar_audio.py --lote ENTRADA [ENTRADA ...] [--modelo RUTA] [--procesos N]\n"
+              "       python procesar_audio.py archivo_audio.wav --dividir [--segmento SEG] [--procesos N]"
+    )
+    parser.add_argument("archivo", nargs="?", help="Archivo WAV a transcribir")
+    parser.add_argument("ruta_modelo", nargs="?", help="Ruta del modelo de Vosk")
+    parser.add_argument("--lote", nargs="+", metavar="ENTRADA",
+                        help="Directorios, patrones glob o archivos a transcribir en paralelo")
+    parser.add_argument("--modelo", help="Ruta del modelo de Vosk")
+    parser.add_argument("--procesos", type=int, help="Número de procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--salida", default=".", help="Directorio para las transcripciones del lote")
+    parser.add_argument("--bloque", type=int, default=FRAMES_POR_BLOQUE,
+                        help=f"Frames por llamada a AcceptWaveform (por defecto {FRAMES_POR_BLOQUE})")
+    parser.add_argument("--dividir", action="store_true",
+                        help="Dividir un archivo largo en silencios y decodificar los fragmentos en paralelo")
+    parser.add_argument("--segmento", type=float,
+                        help="Duración objetivo de cada fragmento en segundos (modo --dividir)")
+    args = parser.parse_args()
+
+    if not args.archivo and not args.lote:
+        print("Uso: python procesar_audio.py [archivo_audio.wav] [ruta_modelo]")
+        sys.exit(1)
+
+    # Ruta del modelo
+    model_path = args.modelo or args.ruta_modelo or "modelo_vosk_es"  # Ruta predeterminada
+
+    # Verificar si existe el modelo
+    if not os.path.exists(model_path):
+        print(f"Error: El modelo en {model_path} no existe.")
+        sys.exit(1)
+
+    if args.lote:
+        entradas = args.lote + ([args.archivo] if args.archivo else [])
+        if procesar_lote(entradas, model_path, args.procesos, args.salida, args.bloque) is None:
+            sys.exit(1)
+    else:
+        procesar_archivo(args.archivo, model_path, args.dividir, args.procesos, args.segmento,
+                         args.bloque)
+
+
+if __name__ == "__main__":
+    main()
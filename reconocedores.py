@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de motores de reconocimiento de voz (STT)
+Cada motor (Vosk local, Google con SpeechRecognition, o los que se agreguen
+con @registrar) transcribe un WAV con la misma interfaz. EnrutadorSTT mide
+la latencia de cada llamada (normalizada por la duración del audio, RTF) y
+envía cada archivo al motor disponible más rápido; si uno falla se prueba el
+siguiente, así el mismo script funciona sin red.
+
+Uso:
+    python reconocedores.py archivo.wav [--motor vosk|google] [--repeticiones 3]
+"""
+
+import os
+import json
+import time
+import wave
+import socket
+import logging
+import argparse
+import threading
+
+from servidor_vosk import transcribir, crear_reconocedor, ErrorServidorVosk, MODELOS_PREDETERMINADOS
+
+logger = logging.getLogger(__name__)
+
+SUAVIZADO = 0.3                 # Peso de la última medida en la media de RTF
+ENFRIAMIENTO = 30.0             # Segundos sin usar un motor después de un fallo
+CACHE_RED = 60.0                # Segundos que se recuerda si hay conexión a internet
+IDIOMA_GOOGLE = "es-ES"
+
+_motores = {}
+
+
+class ErrorReconocimiento(Exception):
+    """El motor no pudo transcribir el audio (error de red, de formato, etc.)"""
+
+
+def registrar(nombre):
+    """Decorador que agrega una clase de motor al registro con ese nombre"""
+    def decorador(cls):
+        cls.nombre = nombre
+        _motores[nombre] = cls
+        return cls
+    return decorador
+
+
+def motores_registrados():
+    return list(_motores)
+
+
+class MotorSTT:
+    """Interfaz común de los motores de reconocimiento"""
+
+    nombre = "base"
+    local = False
+
+    def disponible(self):
+        return True
+
+    def transcribir(self, ruta):
+        """Devuelve el texto de un WAV ("" si no se entendió nada)"""
+        raise NotImplementedError
+
+
+@registrar("vosk")
+class MotorVosk(MotorSTT):
+    """Vosk con el servidor de servidor_vosk.py, o con el modelo cargado en el proceso"""
+
+    local = True
+
+    def __init__(self, modelo=None):
+        self.modelo = modelo or os.getenv("VOSK_MODELO") or next(
+            (m for m in MODELOS_PREDETERMINADOS if os.path.exists(m)), MODELOS_PREDETERMINADOS[0])
+
+    def disponible(self):
+        if not os.path.exists(self.modelo):
+            return False
+        try:
+            import vosk  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def transcribir(self, ruta):
+        try:
+            return transcribir(ruta, self.modelo, palabras=False)["texto"]
+        except (ValueError, ErrorServidorVosk):
+            # Formato que el lector sin copias no admite (p. ej. estéreo de arecord -f cd)
+            return self._transcribir_convertido(ruta)
+
+    def _transcribir_convertido(self, ruta):
+        from detector_voz import leer_mono
+
+        try:
+            muestras, frecuencia = leer_mono(ruta)
+        except (ValueError, wave.Error) as e:
+            raise ErrorReconocimiento(str(e))
+        reconocedor = crear_reconocedor(self.modelo, frecuencia)
+        data = muestras.tobytes()
+        segmentos = []
+        for inicio in range(0, len(data), 8000):
+            if reconocedor.AcceptWaveform(data[inicio:inicio + 8000]):
+                segmentos.append(json.loads(reconocedor.Result()).get("text", ""))
+        segmentos.append(json.loads(reconocedor.FinalResult()).get("text", ""))
+        return " ".join(s for s in segmentos if s)
+
+
+@registrar("google")
+class MotorGoogle(MotorSTT):
+    """Google Speech Recognition a través de SpeechRecognition (necesita red)"""
+
+    def __init__(self, idioma=IDIOMA_GOOGLE, perfil=None):
+        self.idioma = idioma
+        # Perfil de calibracion_ruido: recorta el ruido inicial sin adjust_for_ambient_noise,
+        # que consume el primer segundo de cada archivo
+        self.perfil = perfil
+        self._red = (0.0, False)
+
+    def disponible(self):
+        try:
+            import speech_recognition  # noqa: F401
+        except ImportError:
+            return False
+        comprobado, hay_red = self._red
+        if time.monotonic() - comprobado > CACHE_RED:
+            try:
+                socket.create_connection(("www.google.com", 443), timeout=1.0).close()
+                hay_red = True
+            except OSError:
+                hay_red = False
+            self._red = (time.monotonic(), hay_red)
+        return hay_red
+
+    def transcribir(self, ruta):
+        import speech_recognition as sr
+
+        recognizer = sr.Recognizer()
+        try:
+            if self.perfil is not None:
+                # record() no usa energy_threshold: el perfil recorta el ruido inicial
+                audio_data = self.perfil.audio_speech_recognition(ruta)
+                if audio_data is None:
+                    return ""
+            else:
+                with sr.AudioFile(ruta) as source:
+                    audio_data = recognizer.record(source)
+            return recognizer.recognize_google(audio_data, language=self.idioma)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            self._red = (time.monotonic(), False)
+            raise ErrorReconocimiento(f"Error en la solicitud a Google Speech Recognition: {e}")
+
+
+def duracion_wav(ruta):
+    with wave.open(ruta, "rb") as wf:
+        return wf.getnframes() / wf.getframerate()
+
+
+class EnrutadorSTT:
+    """Envía cada archivo al motor disponible más rápido y registra la latencia.
+
+    Args:
+        motores: Nombres de motores registrados o instancias de MotorSTT
+            (por defecto todos los registrados)
+    """
+
+    def __init__(self, motores=None):
+        self.motores = [_motores[m]() if isinstance(m, str) else m for m in (motores or _motores)]
+        self._lock = threading.Lock()
+        self._rtf = {}                  # nombre -> media móvil de latencia / duración del audio
+        self._bloqueado_hasta = {}
+        self._estadisticas = {m.nombre: {"llamadas": 0, "errores": 0, "latencia_total": 0.0,
+                                         "latencia_maxima": 0.0} for m in self.motores}
+
+    def orden(self):
+        """Motores disponibles del más rápido al más lento.
+
+        Los que aún no tienen medidas van primero los locales (latencia predecible).
+        """
+        ahora = time.monotonic()
+        disponibles = [m for m in self.motores
+                       if self._bloqueado_hasta.get(m.nombre, 0) <= ahora and m.disponible()]
+        return sorted(disponibles, key=lambda m: (self._rtf.get(m.nombre, 0.0 if m.local else 1.0), not m.local))
+
+    def transcribir(self, ruta, motor=None):
+        """Transcribe ruta con el motor indicado o con el más rápido disponible.
+
+        Returns:
+            Diccionario con el texto, el motor usado, la latencia y el RTF
+        """
+        duracion = duracion_wav(ruta)
+        candidatos = [m for m in self.motores if m.nombre == motor] if motor else self.orden()
+        if not candidatos:
+            raise ErrorReconocimiento(f"No hay motor de reconocimiento disponible{' ' + motor if motor else ''}")
+
+        ultimo_error = None
+        for m in candidatos:
+            inicio = time.monotonic()
+            try:
+                texto = m.transcribir(ruta)
+            except Exception as e:
+                ultimo_error = e
+                with self._lock:
+                    self._estadisticas[m.nombre]["errores"] += 1
+                    self._bloqueado_hasta[m.nombre] = time.monotonic() + ENFRIAMIENTO
+                logger.warning("Falló el motor %s (%s); se prueba el siguiente", m.nombre, e)
+                continue
+            latencia = time.monotonic() - inicio
+            rtf = latencia / duracion if duracion else 0.0
+            self._registrar(m, latencia, rtf)
+            return {"texto": texto, "motor": m.nombre, "latencia": latencia, "rtf": rtf}
+        raise ErrorReconocimiento(f"Ningún motor pudo transcribir {ruta}: {ultimo_error}")
+
+    def _registrar(self, motor, latencia, rtf):
+        with self._lock:
+            anterior = self._rtf.get(motor.nombre, rtf)
+            self._rtf[motor.nombre] = anterior + SUAVIZADO * (rtf - anterior)
+            e = self._estadisticas[motor.nombre]
+            e["llamadas"] += 1
+            e["latencia_total"] += latencia
+            e["latencia_maxima"] = max(e["latencia_maxima"], latencia)
+
+    def estadisticas(self):
+        """Llamadas, errores, latencia media y máxima, y RTF medio de cada motor"""
+        resultado = {}
+        with self._lock:
+            for nombre, e in self._estadisticas.items():
+                resultado[nombre] = {
+                    "llamadas": e["llamadas"],
+                    "errores": e["errores"],
+                    "latencia_media": e["latencia_total"] / e["llamadas"] if e["llamadas"] else 0.0,
+                    "latencia_maxima": e["latencia_maxima"],
+                    "rtf": self._rtf.get(nombre),
+                }
+        return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe un WAV con el motor de STT más rápido")
+    parser.add_argument("archivo")
+    parser.add_argument("--motor", choices=motores_registrados(), help="Forzar un motor")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    enrutador = EnrutadorSTT()
+    print(f"Motores disponibles: {', '.join(m.nombre for m in enrutador.orden()) or 'ninguno'}")
+    for _ in range(args.repeticiones):
+        try:
+            r = enrutador.transcribir(args.archivo, args.motor)
+        except ErrorReconocimiento as e:
+            print(f"Error: {e}")
+            break
+        print(f"[{r['motor']}] {r['latencia']:.2f}s (RTF {r['rtf']:.2f}): \"{r['texto']}\"")
+
+    for nombre, e in enrutador.estadisticas().items():
+        if e["llamadas"] or e["errores"]:
+            print(f"{nombre}: {e['llamadas']} llamadas, {e['errores']} errores, "
+                  f"latencia media {e['latencia_media']:.2f}s, máxima {e['latencia_maxima']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
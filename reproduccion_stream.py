@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reproducción en streaming del audio de Eleven Labs
+En lugar de esperar la respuesta completa, decodificarla y llamar a sd.play(),
+cada chunk que llega del generador se escribe en un sd.RawOutputStream, así
+que el audio empieza a sonar con el primer chunk. Se pide el audio como PCM
+16-bit crudo (output_format="pcm_22050"), que no necesita decodificación.
+
+Uso:
+    python reproduccion_stream.py "texto a decir" [--servidor-falso]
+"""
+
+import sys
+import time
+import argparse
+import threading
+
+import sounddevice as sd
+
+# PCM crudo de Eleven Labs: mono, 16 bits, little endian
+FORMATO_PCM = "pcm_22050"
+
+
+def frecuencia_de_formato(formato):
+    """Frecuencia de muestreo de un output_format de Eleven Labs (p. ej. pcm_22050 -> 22050)"""
+    return int(formato.split("_")[1])
+
+
+class ReproductorStream:
+    """Escribe en la tarjeta de sonido los chunks PCM a medida que llegan.
+
+    Args:
+        frecuencia: Frecuencia de muestreo del PCM recibido
+    """
+
+    def __init__(self, frecuencia=frecuencia_de_formato(FORMATO_PCM)):
+        self.frecuencia = frecuencia
+        self._stream = None
+        self._detenido = threading.Event()
+
+    def reproducir(self, chunks, inicio=None, frecuencia=None):
+        """Reproduce los chunks de un generador y espera a que termine el audio.
+
+        Args:
+            chunks: Iterable de bytes PCM 16-bit mono
+            inicio: Instante (time.monotonic()) desde el que se mide la latencia;
+                normalmente justo antes de hacer la petición
+            frecuencia: Frecuencia de este audio si difiere de la del reproductor
+
+        Returns:
+            Diccionario con el tiempo hasta el primer chunk, el tiempo hasta el
+            primer audio (primer chunk + latencia de salida), la duración del
+            audio, el tiempo total y si se interrumpió
+        """
+        inicio = time.monotonic() if inicio is None else inicio
+        frecuencia = frecuencia or self.frecuencia
+        self._detenido.clear()
+        tiempo_primer_chunk = None
+        tiempo_primer_audio = None
+        total_bytes = 0
+        sobrante = b""  # Medio sample que quedó al final de un chunk
+
+        self._stream = sd.RawOutputStream(samplerate=frecuencia, channels=1, dtype="int16")
+        self._stream.start()
+        try:
+            for chunk in chunks:
+                if self._detenido.is_set():
+                    break
+                if tiempo_primer_chunk is None:
+                    tiempo_primer_chunk = time.monotonic() - inicio
+                if sobrante or len(chunk) % 2:
+                    chunk = sobrante + chunk
+                    corte = len(chunk) - len(chunk) % 2
+                    chunk, sobrante = chunk[:corte], chunk[corte:]
+                if not chunk:
+                    continue
+                # write() bloquea si el buffer de salida está lleno: el ritmo lo marca la tarjeta
+                self._stream.write(chunk)
+                total_bytes += len(chunk)
+                if tiempo_primer_audio is None:
+                    tiempo_primer_audio = time.monotonic() - inicio + self._stream.latency
+        finally:
+            if self._detenido.is_set():
+                self._stream.abort()
+            else:
+                # stop() espera a que suene todo lo que queda en el buffer
+                self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+        return {
+            "tiempo_primer_chunk": tiempo_primer_chunk,
+            "tiempo_primer_audio": tiempo_primer_audio,
+            "duracion_audio": total_bytes / 2 / frecuencia,
+            "tiempo_total": time.monotonic() - inicio,
+            "interrumpido": self._detenido.is_set(),
+        }
+
+    def detener(self):
+        """Interrumpe la reproducción en curso (se puede llamar desde otro hilo)"""
+        self._detenido.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.abort()
+            except sd.PortAudioError:
+                pass
+
+
+def main():
+    from sintesis_voz import ElevenSpeech
+
+    parser = argparse.ArgumentParser(description="Reproduce texto con Eleven Labs en streaming")
+    parser.add_argument("texto", nargs="?", default="Hola, esta es una prueba de reproducción en streaming.")
+    parser.add_argument("--servidor-falso", action="store_true",
+                        help="Usar un servidor local que imita la API (sin red ni API key)")
+    parser.add_argument("--comparar", action="store_true",
+                        help="Medir también el tiempo hasta tener el audio completo (método anterior)")
+    args = parser.parse_args()
+
+    servidor = None
+    if args.servidor_falso:
+        from servidor_eleven_falso import ServidorElevenFalso
+        servidor = ServidorElevenFalso(puerto=0)
+        servidor.iniciar_en_hilo()
+        speech = ElevenSpeech(api_key="falsa", base_url=servidor.url, cache=False)
+    else:
+        # Sin caché: se quiere medir la latencia de la API
+        speech = ElevenSpeech(cache=False)
+
+    try:
+        if args.comparar:
+            inicio = time.monotonic()
+            speech.sintetizar(args.texto)
+            print(f"Audio completo descargado y decodificado en {time.monotonic() - inicio:.3f}s")
+        metricas = speech.reproducir_stream(args.texto)
+        print(f"Primer chunk: {metricas['tiempo_primer_chunk']:.3f}s, "
+              f"primer audio: {metricas['tiempo_primer_audio']:.3f}s, "
+              f"audio: {metricas['duracion_audio']:.2f}s, total: {metricas['tiempo_total']:.2f}s")
+    except KeyboardInterrupt:
+        speech.detener()
+        print("\nReproducción interrumpida.")
+        sys.exit(0)
+    finally:
+        if servidor:
+            servidor.shutdown()
+            servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Publicación de resultados del reconocedor en tiempo real
+En el bucle de decodificación cada bloque no final pedía PartialResult(),
+lo pasaba por json.loads y lo imprimía, aunque el texto no hubiera cambiado.
+PublicadorResultados:
+- limita los parciales a una frecuencia máxima (quiere_parcial() dice si
+  vale la pena pedir uno, así ni siquiera se llama a PartialResult())
+- compara el JSON crudo con el anterior antes de decodificarlo y solo
+  emite un evento si el texto cambió, con la parte nueva
+- usa orjson si está instalado
+- entrega los eventos a suscriptores (callbacks) o por un iterador asíncrono
+
+Uso:
+    python resultados_stt.py [ruta_modelo] [--archivo test.wav] [--frames 2000] [--intervalo 0.25]
+    python resultados_stt.py --comprobar      (verifica el límite de parciales con un reloj simulado)
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+
+try:
+    import orjson
+    _cargar_json = orjson.loads
+except ImportError:
+    orjson = None
+    _cargar_json = json.loads
+
+INTERVALO_PARCIALES = 0.25      # Segundos mínimos entre eventos parciales
+MAX_EVENTOS_COLA = 100          # Eventos pendientes por iterador asíncrono
+
+
+def diferencia(anterior, actual):
+    """Palabras nuevas de actual respecto a anterior y si se corrigió alguna ya emitida"""
+    viejas, nuevas = anterior.split(), actual.split()
+    comunes = 0
+    for a, b in zip(viejas, nuevas):
+        if a != b:
+            break
+        comunes += 1
+    return " ".join(nuevas[comunes:]), comunes < len(viejas)
+
+
+class PublicadorResultados:
+    """Convierte los resultados JSON del reconocedor en eventos para los suscriptores.
+
+    Cada evento es un diccionario con:
+        tipo: "parcial", "final" o "fin" (al cerrar)
+        texto: Texto completo del parcial o del resultado final
+        nuevo: Palabras añadidas respecto al parcial anterior
+        corregido: True si el reconocedor cambió palabras ya emitidas
+        resultado: (solo en los finales) el diccionario completo del reconocedor
+        instante: time.monotonic() del evento
+
+    Args:
+        intervalo: Segundos mínimos entre dos peticiones de parcial (y por tanto entre eventos)
+        reloj: Función que da el instante actual (time.monotonic; otra para pruebas)
+    """
+
+    def __init__(self, intervalo=INTERVALO_PARCIALES, reloj=time.monotonic):
+        self.intervalo = intervalo
+        self._reloj = reloj
+        self._suscriptores = []
+        self._lock = threading.Lock()
+        self._parcial_crudo = None
+        self._parcial = ""
+        self._ultima_peticion = 0.0     # Última vez que quiere_parcial() autorizó un PartialResult()
+
+        # Métricas
+        self.parciales_recibidos = 0
+        self.parciales_repetidos = 0
+        self.parciales_omitidos = 0     # No pedidos al reconocedor por el límite de frecuencia
+        self.eventos_emitidos = 0
+
+    # --- Suscripción -------------------------------------------------------
+
+    def suscribir(self, callback):
+        """Registra callback(evento); devuelve una función que cancela la suscripción"""
+        with self._lock:
+            self._suscriptores.append(callback)
+
+        def cancelar():
+            with self._lock:
+                if callback in self._suscriptores:
+                    self._suscriptores.remove(callback)
+        return cancelar
+
+    async def eventos(self, maximo=MAX_EVENTOS_COLA):
+        """Iterador asíncrono de eventos hasta que se llame a cerrar().
+
+        Los callbacks llegan desde el hilo de decodificación; se pasan al bucle
+        de eventos con call_soon_threadsafe. Si el consumidor se retrasa se
+        descarta el evento más antiguo.
+        """
+        loop = asyncio.get_running_loop()
+        cola = asyncio.Queue(maximo)
+
+        def encolar(evento):
+            if cola.full():
+                cola.get_nowait()
+            cola.put_nowait(evento)
+
+        cancelar = self.suscribir(lambda evento: loop.call_soon_threadsafe(encolar, evento))
+        try:
+            while True:
+                evento = await cola.get()
+                if evento["tipo"] == "fin":
+                    return
+                yield evento
+        finally:
+            cancelar()
+
+    def _emitir(self, evento):
+        self.eventos_emitidos += 1
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for callback in suscriptores:
+            callback(evento)
+
+    # --- Entrada desde el bucle de decodificación --------------------------
+
+    def quiere_parcial(self):
+        """True si ya pasó el intervalo mínimo y vale la pena pedir PartialResult().
+
+        El intervalo cuenta desde la última petición autorizada, no desde el
+        último parcial emitido: con el texto estable no se emite nada, pero
+        igualmente se limita cuántas veces se llama a Kaldi. Es el único límite:
+        un parcial autorizado con texto nuevo siempre se emite.
+        """
+        ahora = self._reloj()
+        if ahora - self._ultima_peticion >= self.intervalo:
+            self._ultima_peticion = ahora
+            return True
+        self.parciales_omitidos += 1
+        return False
+
+    def parcial(self, crudo):
+        """Procesa el JSON de PartialResult(); emite un evento solo si el texto cambió"""
+        self.parciales_recibidos += 1
+        if crudo == self._parcial_crudo:
+            # Mismo JSON que la vez anterior: ni siquiera se decodifica
+            self.parciales_repetidos += 1
+            return
+        self._parcial_crudo = crudo
+        texto = _cargar_json(crudo).get("partial", "")
+        if texto == self._parcial:
+            self.parciales_repetidos += 1
+            return
+        nuevo, corregido = diferencia(self._parcial, texto)
+        self._parcial = texto
+        if texto:
+            self._emitir({"tipo": "parcial", "texto": texto, "nuevo": nuevo, "corregido": corregido,
+                          "instante": self._reloj()})
+
+    def final(self, crudo):
+        """Procesa el JSON de Result()/FinalResult(); emite un evento si hay texto"""
+        resultado = _cargar_json(crudo)
+        texto = resultado.get("text", "")
+        nuevo, corregido = diferencia(self._parcial, texto)
+        self._parcial_crudo = None
+        self._parcial = ""
+        self._ultima_peticion = 0.0
+        if texto:
+            self._emitir({"tipo": "final", "texto": texto, "nuevo": nuevo, "corregido": corregido,
+                          "resultado": resultado, "instante": self._reloj()})
+
+    def cerrar(self):
+        """Avisa a los suscriptores (y termina los iteradores asíncronos)"""
+        self._emitir({"tipo": "fin", "texto": "", "nuevo": "", "corregido": False,
+                      "instante": self._reloj()})
+
+    def estadisticas(self):
+        return {
+            "parciales_recibidos": self.parciales_recibidos,
+            "parciales_repetidos": self.parciales_repetidos,
+            "parciales_omitidos": self.parciales_omitidos,
+            "eventos_emitidos": self.eventos_emitidos,
+            "parser": "orjson" if orjson else "json",
+        }
+
+
+def comprobar_limite(bloques=400, duracion_bloque=0.125, intervalo=0.25):
+    """Con un reloj simulado y PartialResult() de coste variable, cada parcial
+    autorizado con texto nuevo tiene que emitir un evento; devuelve (autorizados, eventos)"""
+    import random
+
+    azar = random.Random(0)
+    instante = [1000.0]
+    publicador = PublicadorResultados(intervalo, reloj=lambda: instante[0])
+    eventos = []
+    publicador.suscribir(eventos.append)
+    autorizados = 0
+    for i in range(bloques):
+        instante[0] += duracion_bloque
+        if publicador.quiere_parcial():
+            autorizados += 1
+            instante[0] += azar.uniform(0.002, 0.010)       # Coste de PartialResult()
+            publicador.parcial(json.dumps({"partial": f"palabra {i}"}))
+    if len(eventos) != autorizados:
+        raise AssertionError(f"{autorizados} parciales autorizados pero {len(eventos)} eventos")
+    return autorizados, len(eventos)
+
+
+def main():
+    import argparse
+    from servidor_vosk import crear_reconocedor
+    from detector_voz import leer_mono
+
+    parser = argparse.ArgumentParser(description="Compara el bucle de parciales con y sin PublicadorResultados")
+    parser.add_argument("ruta_modelo", nargs="?", default="modelo_vosk_es", help="Ruta del modelo de Vosk")
+    parser.add_argument("--archivo", default="test.wav", help="WAV a decodificar")
+    parser.add_argument("--frames", type=int, default=2000, help="Frames por bloque")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_PARCIALES,
+                        help="Segundos mínimos entre parciales")
+    parser.add_argument("--comprobar", action="store_true",
+                        help="Comprobar que cada parcial autorizado con texto nuevo se emite")
+    args = parser.parse_args()
+
+    if args.comprobar:
+        autorizados, eventos = comprobar_limite()
+        print(f"Límite correcto: {autorizados} parciales autorizados, {eventos} eventos")
+        return
+
+    if not os.path.exists(args.ruta_modelo):
+        print(f"Error: El modelo en {args.ruta_modelo} no existe.")
+        sys.exit(1)
+
+    muestras, frecuencia = leer_mono(args.archivo)
+    data = muestras.tobytes()
+    paso = args.frames * 2
+
+    # Bucle original: PartialResult() + json.loads en cada bloque
+    rec = crear_reconocedor(args.ruta_modelo, frecuencia)
+    parciales = 0
+    tiempo_resultados = 0.0
+    for pos in range(0, len(data), paso):
+        if rec.AcceptWaveform(data[pos:pos + paso]):
+            inicio = time.perf_counter()
+            json.loads(rec.Result())
+        else:
+            inicio = time.perf_counter()
+            if json.loads(rec.PartialResult()).get("partial"):
+                parciales += 1
+        tiempo_resultados += time.perf_counter() - inicio
+    json.loads(rec.FinalResult())
+    print(f"Sin publicador: {parciales} parciales, {tiempo_resultados * 1000:.1f} ms en resultados")
+
+    # Con el publicador: parciales limitados y solo si cambian
+    rec = crear_reconocedor(args.ruta_modelo, frecuencia)
+    publicador = PublicadorResultados(args.intervalo)
+    eventos = []
+    publicador.suscribir(eventos.append)
+    tiempo_resultados = 0.0
+    for pos in range(0, len(data), paso):
+        if rec.AcceptWaveform(data[pos:pos + paso]):
+            inicio = time.perf_counter()
+            publicador.final(rec.Result())
+        else:
+            inicio = time.perf_counter()
+            if publicador.quiere_parcial():
+                publicador.parcial(rec.PartialResult())
+        tiempo_resultados += time.perf_counter() - inicio
+        # Ritmo del micrófono, para que el límite de frecuencia tenga efecto
+        time.sleep(args.frames / frecuencia)
+    publicador.final(rec.FinalResult())
+    publicador.cerrar()
+    print(f"Con publicador: {len(eventos) - 1} eventos, {tiempo_resultados * 1000:.1f} ms en resultados")
+    for nombre, valor in publicador.estadisticas().items():
+        print(f"  {nombre}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servicio de reconocimiento de varios flujos de audio a la vez
+Un solo vosk.Model cargado en memoria y un grupo de hilos trabajadores que
+atienden N flujos (micrófono local, flujos que llegan por TCP o WAV
+reproducidos como carga sintética). Cada flujo tiene su KaldiRecognizer y su
+cola de audio:
+- planificación equitativa: los flujos con audio esperan en una cola de
+  listos y cada trabajador decodifica un quantum (0.25 s) del primero y lo
+  devuelve al final, así un flujo con mucho audio no acapara los hilos;
+  un flujo nunca está en dos trabajadores a la vez (Kaldi no lo admite)
+- contrapresión: cada flujo admite como mucho unos segundos de audio
+  pendiente; al llenarse, el productor espera (TCP, archivos) o se descarta
+  el audio más antiguo (micrófono, que no puede esperar)
+- retraso por flujo: audio pendiente y tiempo entre la llegada de cada
+  bloque y su decodificación
+
+Uso:
+    python servicio_multistream.py [ruta_modelo] [--replay 8] [--velocidad 1.0] [--trabajadores 2] [--gobernador]
+                                   [--puerto 2700] [--microfono]
+
+Protocolo TCP: una línea JSON {"id": "sala", "frecuencia": 16000}, luego PCM
+16-bit mono; el servidor responde con una línea JSON por resultado final.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import argparse
+import threading
+import socketserver
+from collections import deque
+
+from servidor_vosk import AlmacenModelos
+from resultados_stt import PublicadorResultados
+
+SEGUNDOS_QUANTUM = 0.25         # Audio que se decodifica en cada turno de un flujo
+MAX_SEGUNDOS_PENDIENTES = 5.0   # Audio en cola por flujo antes de aplicar contrapresión
+SUAVIZADO = 0.1                 # Peso de la última medida en la media del retraso
+
+BLOQUEAR = "bloquear"           # El productor espera a que haya sitio
+DESCARTAR = "descartar"         # Se pierde el audio más antiguo
+
+CORPUS = ["test.wav", "prueba_audio.wav", "nomas.wav", "grabacion_pulse_*.wav", "raspiaudioDebug/*.wav"]
+
+
+class Flujo:
+    """Estado de un flujo: reconocedor, cola de audio y métricas"""
+
+    def __init__(self, id_flujo, reconocedor, frecuencia, politica, max_bytes, bytes_quantum):
+        self.id = id_flujo
+        self.reconocedor = reconocedor
+        self.frecuencia = frecuencia
+        self.politica = politica
+        self.max_bytes = max_bytes
+        self.bytes_quantum = bytes_quantum
+        self.resultados = PublicadorResultados()
+        self.cerrado = threading.Event()
+
+        self._pendiente = deque()       # (instante de llegada, bytes)
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._programado = False        # Está en la cola de listos o en un trabajador
+        self._cerrando = False
+
+        # Métricas
+        self.bytes_recibidos = 0
+        self.bytes_procesados = 0
+        self.bytes_descartados = 0
+        self.esperas = 0                # Veces que el productor tuvo que esperar
+        self.turnos = 0
+        self.tiempo_decodificacion = 0.0
+        self.retraso_medio = 0.0
+        self.retraso_maximo = 0.0
+
+    @property
+    def segundos_pendientes(self):
+        return self._bytes / (2 * self.frecuencia)
+
+    def estado(self):
+        return {
+            "segundos_pendientes": self.segundos_pendientes,
+            "retraso_medio": self.retraso_medio,
+            "retraso_maximo": self.retraso_maximo,
+            "segundos_procesados": self.bytes_procesados / (2 * self.frecuencia),
+            "segundos_descartados": self.bytes_descartados / (2 * self.frecuencia),
+            "esperas": self.esperas,
+            "turnos": self.turnos,
+            "tiempo_decodificacion": self.tiempo_decodificacion,
+        }
+
+
+class ServicioReconocimiento:
+    """Multiplexa flujos de audio sobre trabajadores que comparten un modelo.
+
+    Args:
+        modelo: Ruta del modelo de Vosk (se carga una vez)
+        trabajadores: Hilos de decodificación (por defecto uno por CPU)
+        al_resultado: Función (id_flujo, evento) para cada evento de PublicadorResultados
+        max_segundos_pendientes: Audio en cola por flujo antes de la contrapresión
+    """
+
+    def __init__(self, modelo, trabajadores=None, al_resultado=None,
+                 max_segundos_pendientes=MAX_SEGUNDOS_PENDIENTES, segundos_quantum=SEGUNDOS_QUANTUM):
+        self.modelo = AlmacenModelos().obtener(modelo)
+        self.al_resultado = al_resultado
+        self.max_segundos_pendientes = max_segundos_pendientes
+        self.segundos_quantum = segundos_quantum
+        self._flujos = {}
+        self._lock = threading.Lock()
+        self._listos = queue.Queue()
+        self._detenido = False
+        self._hilos = []
+        self.trabajadores = 0
+        self.ajustar_trabajadores(trabajadores)
+
+    # --- Flujos ------------------------------------------------------------
+
+    def abrir(self, id_flujo, frecuencia=16000, politica=BLOQUEAR):
+        """Crea un flujo con su propio reconocedor sobre el modelo compartido"""
+        from vosk import KaldiRecognizer
+
+        with self._lock:
+            if id_flujo in self._flujos:
+                raise ValueError(f"El flujo {id_flujo} ya existe")
+            flujo = Flujo(id_flujo, KaldiRecognizer(self.modelo, frecuencia), frecuencia, politica,
+                          int(self.max_segundos_pendientes * frecuencia) * 2,
+                          int(self.segundos_quantum * frecuencia) * 2)
+            self._flujos[id_flujo] = flujo
+        if self.al_resultado:
+            flujo.resultados.suscribir(lambda evento: self.al_resultado(id_flujo, evento))
+        return flujo
+
+    def enviar(self, id_flujo, data, timeout=None):
+        """Encola audio de un flujo.
+
+        Con la política BLOQUEAR espera hasta timeout a que haya sitio.
+
+        Returns:
+            False si el audio no se pudo encolar (timeout o servicio detenido)
+        """
+        flujo = self._flujos[id_flujo]
+        with flujo._cond:
+            if flujo._bytes + len(data) > flujo.max_bytes:
+                if flujo.politica == DESCARTAR:
+                    while flujo._pendiente and flujo._bytes + len(data) > flujo.max_bytes:
+                        _, viejo = flujo._pendiente.popleft()
+                        flujo._bytes -= len(viejo)
+                        flujo.bytes_descartados += len(viejo)
+                else:
+                    flujo.esperas += 1
+                    if not flujo._cond.wait_for(
+                            lambda: self._detenido or flujo._bytes + len(data) <= flujo.max_bytes, timeout):
+                        return False
+                    if self._detenido:
+                        return False
+            flujo._pendiente.append((time.monotonic(), data))
+            flujo._bytes += len(data)
+            flujo.bytes_recibidos += len(data)
+            self._programar(flujo)
+        return True
+
+    def cerrar(self, id_flujo, esperar=True):
+        """Termina un flujo: decodifica lo pendiente y emite su resultado final"""
+        flujo = self._flujos[id_flujo]
+        with flujo._cond:
+            flujo._cerrando = True
+            self._programar(flujo)
+        if esperar:
+            flujo.cerrado.wait()
+
+    def _programar(self, flujo):
+        # Con flujo._cond tomado: cada flujo está a lo sumo una vez en la cola de listos
+        if not flujo._programado:
+            flujo._programado = True
+            self._listos.put(flujo)
+
+    # --- Trabajadores ------------------------------------------------------
+
+    def _trabajar(self):
+        while True:
+            flujo = self._listos.get()
+            if flujo is None:
+                return
+            with flujo._cond:
+                partes, n, llegada = [], 0, None
+                while flujo._pendiente and n < flujo.bytes_quantum:
+                    instante, data = flujo._pendiente.popleft()
+                    llegada = llegada or instante
+                    partes.append(data)
+                    n += len(data)
+                flujo._bytes -= n
+                terminar = flujo._cerrando and not flujo._pendiente
+                flujo._cond.notify_all()        # Despertar a los productores bloqueados
+
+            try:
+                if partes:
+                    self._decodificar(flujo, b"".join(partes), llegada)
+                if terminar:
+                    flujo.resultados.final(flujo.reconocedor.FinalResult())
+            except Exception as e:
+                print(f"Error decodificando el flujo {flujo.id}: {e}")
+            if terminar:
+                flujo.resultados.cerrar()
+                with self._lock:
+                    self._flujos.pop(flujo.id, None)
+                flujo.cerrado.set()
+                continue
+
+            with flujo._cond:
+                if flujo._pendiente or flujo._cerrando:
+                    # Al final de la cola: turno para los demás flujos
+                    self._listos.put(flujo)
+                else:
+                    flujo._programado = False
+
+    def _decodificar(self, flujo, data, llegada):
+        inicio = time.monotonic()
+        if flujo.reconocedor.AcceptWaveform(data):
+            flujo.resultados.final(flujo.reconocedor.Result())
+        elif flujo.resultados.quiere_parcial():
+            flujo.resultados.parcial(flujo.reconocedor.PartialResult())
+        fin = time.monotonic()
+        retraso = fin - llegada
+        flujo.turnos += 1
+        flujo.bytes_procesados += len(data)
+        flujo.tiempo_decodificacion += fin - inicio
+        flujo.retraso_medio += SUAVIZADO * (retraso - flujo.retraso_medio)
+        flujo.retraso_maximo = max(flujo.retraso_maximo, retraso)
+
+    def ajustar_trabajadores(self, trabajadores=None):
+        """Cambia el número de hilos de decodificación (None: uno por CPU).
+
+        Los que sobran terminan al sacar su marca de la cola de listos, después
+        de los turnos que ya estaban en ella.
+        """
+        trabajadores = max(1, trabajadores or os.cpu_count() or 1)
+        with self._lock:
+            self._hilos = [hilo for hilo in self._hilos if hilo.is_alive()]
+            for i in range(self.trabajadores, trabajadores):
+                hilo = threading.Thread(target=self._trabajar, name=f"stt-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+            for _ in range(trabajadores, self.trabajadores):
+                self._listos.put(None)
+            self.trabajadores = trabajadores
+
+    # --- Estado ------------------------------------------------------------
+
+    def estado(self):
+        """Métricas de cada flujo abierto"""
+        with self._lock:
+            flujos = list(self._flujos.values())
+        return {f.id: f.estado() for f in flujos}
+
+    def detener(self):
+        """Detiene los trabajadores y libera a los productores bloqueados"""
+        self._detenido = True
+        with self._lock:
+            flujos = list(self._flujos.values())
+        for flujo in flujos:
+            with flujo._cond:
+                flujo._cond.notify_all()
+        for _ in self._hilos:
+            self._listos.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+
+
+# ---------------------------------------------------------------------------
+# Entradas: TCP, micrófono y carga sintética
+# ---------------------------------------------------------------------------
+
+class ManejadorFlujoTCP(socketserver.StreamRequestHandler):
+    """Una conexión TCP es un flujo: cabecera JSON y luego PCM"""
+
+    def handle(self):
+        servicio = self.server.servicio
+        cabecera = json.loads(self.rfile.readline())
+        id_flujo = str(cabecera.get("id") or "%s:%d" % self.client_address)
+        flujo = servicio.abrir(id_flujo, int(cabecera.get("frecuencia", 16000)), BLOQUEAR)
+        lock = threading.Lock()
+
+        def responder(evento):
+            if evento["tipo"] == "final":
+                linea = json.dumps({"id": id_flujo, "texto": evento["texto"]}, ensure_ascii=False) + "\n"
+                with lock:
+                    try:
+                        self.wfile.write(linea.encode("utf-8"))
+                    except OSError:
+                        pass
+        flujo.resultados.suscribir(responder)
+
+        try:
+            while True:
+                data = self.rfile.read1(8192)
+                if not data:
+                    break
+                # Bloquea si el flujo va atrasado: TCP frena al emisor
+                if not servicio.enviar(id_flujo, data):
+                    break
+        finally:
+            servicio.cerrar(id_flujo)
+
+
+class ServidorFlujosTCP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, direccion, servicio):
+        self.servicio = servicio
+        super().__init__(direccion, ManejadorFlujoTCP)
+
+
+def abrir_microfono(servicio, frecuencia=16000, id_flujo="microfono"):
+    """Flujo del micrófono local (descarta audio viejo si el servicio se atrasa)"""
+    import pyaudio
+    from captura_audio import FRAMES_CALLBACK
+
+    servicio.abrir(id_flujo, frecuencia, DESCARTAR)
+    audio = pyaudio.PyAudio()
+
+    def callback(in_data, frame_count, time_info, status):
+        servicio.enviar(id_flujo, in_data)
+        return (None, pyaudio.paContinue)
+
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=frecuencia, input=True,
+                        frames_per_buffer=FRAMES_CALLBACK, stream_callback=callback)
+    stream.start_stream()
+    return audio, stream
+
+
+def reproducir_wav(servicio, id_flujo, ruta, velocidad=1.0, segundos_bloque=0.1):
+    """Envía un WAV como si fuera un flujo en vivo (velocidad 0: lo más rápido posible).
+
+    Returns:
+        El Flujo (ya cerrado, con sus métricas) y la duración del audio
+    """
+    from detector_voz import leer_mono
+
+    muestras, frecuencia = leer_mono(ruta)
+    flujo = servicio.abrir(id_flujo, frecuencia, BLOQUEAR)
+    data = muestras.tobytes()
+    paso = int(frecuencia * segundos_bloque) * 2
+    siguiente = time.monotonic()
+    for pos in range(0, len(data), paso):
+        if not servicio.enviar(id_flujo, data[pos:pos + paso]):
+            break
+        if velocidad > 0:
+            siguiente += segundos_bloque / velocidad
+            espera = siguiente - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+    servicio.cerrar(id_flujo)
+    return flujo, len(muestras) / frecuencia
+
+
+def prueba_carga(servicio, flujos, velocidad=1.0):
+    """Reproduce los WAV del repositorio como flujos simultáneos.
+
+    Returns:
+        ({id_flujo: (ruta, duración, métricas)}, segundos totales)
+    """
+    archivos = sorted({a for patron in CORPUS for a in glob.glob(patron)})
+    if not archivos:
+        raise FileNotFoundError("No se encontraron archivos WAV para la prueba de carga")
+
+    resultados = {}
+
+    def ejecutar(id_flujo, ruta):
+        flujo, duracion = reproducir_wav(servicio, id_flujo, ruta, velocidad)
+        resultados[id_flujo] = (ruta, duracion, flujo.estado())
+
+    inicio = time.monotonic()
+    hilos = [threading.Thread(target=ejecutar, args=(f"wav{i}", archivos[i % len(archivos)]), daemon=True)
+             for i in range(flujos)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, time.monotonic() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconocimiento de varios flujos con un modelo compartido")
+    parser.add_argument("ruta_modelo", nargs="?", default="modelo_vosk_es", help="Ruta del modelo de Vosk")
+    parser.add_argument("--trabajadores", type=int, help="Hilos de decodificación (por defecto, uno por CPU)")
+    parser.add_argument("--replay", type=int, metavar="N", help="Prueba de carga con N flujos de los WAV")
+    parser.add_argument("--velocidad", type=float, default=1.0,
+                        help="Ritmo de la prueba de carga respecto al tiempo real (0: sin esperas)")
+    parser.add_argument("--puerto", type=int, help="Aceptar flujos por TCP en este puerto")
+    parser.add_argument("--microfono", action="store_true", help="Agregar el micrófono local como flujo")
+    parser.add_argument("--gobernador", action="store_true",
+                        help="Ajustar los trabajadores según la batería del UPS (gobernador_energia.py)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta_modelo):
+        print(f"Error: El modelo en {args.ruta_modelo} no existe.")
+        sys.exit(1)
+
+    def imprimir(id_flujo, evento):
+        if evento["tipo"] == "final":
+            print(f"[{id_flujo}] {evento['texto']}")
+
+    inicio = time.monotonic()
+    servicio = ServicioReconocimiento(args.ruta_modelo, args.trabajadores, imprimir)
+    print(f"Modelo cargado en {time.monotonic() - inicio:.2f}s, {servicio.trabajadores} trabajadores")
+
+    if args.gobernador:
+        from gobernador_energia import GobernadorEnergia, conectar_ups
+
+        gobernador = GobernadorEnergia()
+
+        def al_cambiar_perfil(perfil):
+            # Con --trabajadores el máximo lo pone la línea de comandos
+            trabajadores = perfil.trabajadores or args.trabajadores
+            if args.trabajadores:
+                trabajadores = min(trabajadores, args.trabajadores)
+            servicio.ajustar_trabajadores(trabajadores)
+            print(f"Perfil de energía {perfil.nombre}: {servicio.trabajadores} trabajadores")
+        gobernador.suscribir(al_cambiar_perfil)
+        conectar_ups(gobernador)
+
+    if args.replay:
+        resultados, total = prueba_carga(servicio, args.replay, args.velocidad)
+        audio = sum(d for _, d, _ in resultados.values())
+        decodificacion = sum(e["tiempo_decodificacion"] for _, _, e in resultados.values())
+        print(f"{args.replay} flujos, {audio:.1f}s de audio en {total:.1f}s "
+              f"({audio / total:.1f}x tiempo real), RTF de decodificación {decodificacion / audio:.3f}")
+        for id_flujo, (ruta, _, e) in sorted(resultados.items()):
+            print(f"  {id_flujo} ({ruta}): retraso medio {e['retraso_medio']:.3f}s, "
+                  f"máximo {e['retraso_maximo']:.3f}s, {e['turnos']} turnos, esperas {e['esperas']}")
+        servicio.detener()
+        return
+
+    servidor = audio = stream = None
+    try:
+        if args.puerto:
+            servidor = ServidorFlujosTCP(("0.0.0.0", args.puerto), servicio)
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            print(f"Esperando flujos en el puerto {args.puerto}")
+        if args.microfono:
+            audio, stream = abrir_microfono(servicio)
+            print("Escuchando el micrófono...")
+        if not (servidor or stream):
+            print("Nada que escuchar: usa --replay, --puerto o --microfono")
+            return
+        while True:
+            time.sleep(5)
+            for id_flujo, e in servicio.estado().items():
+                print(f"  {id_flujo}: pendiente {e['segundos_pendientes']:.2f}s, "
+                      f"retraso {e['retraso_medio']:.3f}s, descartado {e['segundos_descartados']:.1f}s")
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        if stream:
+            stream.stop_stream()
+            stream.close()
+            audio.terminate()
+        if servidor:
+            servidor.shutdown()
+            servidor.server_close()
+        servicio.detener()
+
+
+if __name__ == "__main__":
+    main()
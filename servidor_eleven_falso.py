@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local que imita la API de Eleven Labs
+Sirve /v1/voices y /v1/text-to-speech/{voice_id}[/stream] con audio de
+prueba enviado en chunks, con retardo configurable antes del primer byte y
+entre chunks. Permite probar la reproducción en streaming y medir latencias
+sin red ni API key. También puede simular el coste de abrir cada conexión
+(TCP + TLS) y responder 503 con cierta probabilidad, para probar keep-alive
+y reintentos.
+
+Uso:
+    python servidor_eleven_falso.py [--puerto 8765] [--wav test.wav] [--retardo 0.3]
+
+    ELEVENLABS_BASE_URL=http://127.0.0.1:8765 ELEVENLABS_API_KEY=falsa python 9-1-testElevenLabs.py
+"""
+
+import io
+import re
+import sys
+import random
+import json
+import time
+import wave
+import math
+import struct
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+PUERTO = 8765
+VOCES = [{"voice_id": "21m00Tcm4TlvDq8ikWAM", "name": "Rachel", "category": "premade"}]
+SEGUNDOS_POR_CARACTER = 0.06    # Duración del audio sintético según el largo del texto
+BYTES_CHUNK = 4096
+RETARDO_PRIMER_BYTE = 0.3       # Simula el tiempo de síntesis antes del primer chunk
+RETARDO_CHUNK = 0.02            # Simula la llegada progresiva del resto
+RETARDO_CONEXION = 0.0          # Simula el handshake TCP + TLS de cada conexión nueva
+
+
+def tono_pcm(frecuencia_muestreo, duracion, tono=440.0):
+    """Genera un tono PCM 16-bit mono (audio de prueba cuando no se da un WAV)"""
+    n = int(frecuencia_muestreo * duracion)
+    muestras = (int(8000 * math.sin(2 * math.pi * tono * i / frecuencia_muestreo)) for i in range(n))
+    return struct.pack(f"<{n}h", *muestras)
+
+
+class ManejadorElevenFalso(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        # Se llama una vez por conexión TCP, no por petición
+        super().setup()
+        self.server.conexiones += 1
+        time.sleep(self.server.retardo_conexion)
+
+    def log_message(self, formato, *args):
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+    def _enviar_json(self, datos, codigo=200):
+        cuerpo = json.dumps(datos).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip("/") == "/v1/voices":
+            self._enviar_json({"voices": VOCES})
+        else:
+            self._enviar_json({"detail": "no encontrado"}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        coincidencia = re.fullmatch(r"/v1/text-to-speech/([^/]+)(/stream)?", url.path)
+        longitud = int(self.headers.get("Content-Length", 0))
+        cuerpo = json.loads(self.rfile.read(longitud) or b"{}")
+        if not coincidencia:
+            self._enviar_json({"detail": "no encontrado"}, 404)
+            return
+
+        self.server.peticiones += 1
+        if random.random() < self.server.tasa_error:
+            self.server.errores += 1
+            self._enviar_json({"detail": "servicio no disponible (simulado)"}, 503)
+            return
+        formato = parse_qs(url.query).get("output_format", ["mp3_44100_128"])[0]
+        audio = self.server.audio_para(formato, cuerpo.get("text", ""))
+
+        time.sleep(self.server.retardo_primer_byte)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/pcm" if formato.startswith("pcm_") else "audio/mpeg")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for inicio in range(0, len(audio), BYTES_CHUNK):
+                chunk = audio[inicio:inicio + BYTES_CHUNK]
+                self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+                self.wfile.flush()
+                time.sleep(self.server.retardo_chunk)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cortó la descarga (reproducción interrumpida)
+            self.close_connection = True
+
+
+class ServidorElevenFalso(ThreadingHTTPServer):
+    """Servidor de prueba; se puede arrancar en un hilo con iniciar_en_hilo()"""
+
+    daemon_threads = True
+
+    def __init__(self, puerto=PUERTO, wav=None, retardo_primer_byte=RETARDO_PRIMER_BYTE,
+                 retardo_chunk=RETARDO_CHUNK, verboso=False, retardo_conexion=RETARDO_CONEXION,
+                 tasa_error=0.0):
+        super().__init__(("127.0.0.1", puerto), ManejadorElevenFalso)
+        self.retardo_primer_byte = retardo_primer_byte
+        self.retardo_chunk = retardo_chunk
+        self.retardo_conexion = retardo_conexion
+        self.tasa_error = tasa_error
+        self.verboso = verboso
+        self.peticiones = 0
+        self.conexiones = 0
+        self.errores = 0
+        self._wav = None
+        if wav:
+            with wave.open(wav, "rb") as wf:
+                if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                    raise ValueError(f"{wav}: se requiere un WAV mono de 16 bits")
+                self._wav = (wf.getframerate(), wf.readframes(wf.getnframes()))
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def audio_para(self, formato, texto):
+        """Audio enlatado para el formato pedido.
+
+        Los formatos pcm_* se sirven como PCM crudo; para el resto (mp3_*) se
+        sirve un WAV, que soundfile decodifica igual que el MP3 real.
+        """
+        frecuencia = int(formato.split("_")[1])
+        if self._wav and self._wav[0] == frecuencia:
+            pcm = self._wav[1]
+        else:
+            pcm = tono_pcm(frecuencia, max(0.2, len(texto) * SEGUNDOS_POR_CARACTER))
+        if formato.startswith("pcm_"):
+            return pcm
+        salida = io.BytesIO()
+        with wave.open(salida, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(frecuencia)
+            wf.writeframes(pcm)
+        return salida.getvalue()
+
+    def iniciar_en_hilo(self):
+        hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        hilo.start()
+        return hilo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de Eleven Labs")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--wav", help="WAV mono de 16 bits que se sirve si coincide la frecuencia pedida")
+    parser.add_argument("--retardo", type=float, default=RETARDO_PRIMER_BYTE, help="Segundos hasta el primer byte")
+    parser.add_argument("--retardo-chunk", type=float, default=RETARDO_CHUNK, help="Segundos entre chunks")
+    parser.add_argument("--retardo-conexion", type=float, default=RETARDO_CONEXION,
+                        help="Segundos extra al abrir cada conexión (simula TLS)")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Probabilidad de responder 503")
+    args = parser.parse_args()
+
+    with ServidorElevenFalso(args.puerto, args.wav, args.retardo, args.retardo_chunk, verboso=True,
+                             retardo_conexion=args.retardo_conexion, tasa_error=args.tasa_error) as servidor:
+        print(f"Servidor Eleven Labs falso en {servidor.url}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServidor detenido.")
+            sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor local de reconocimiento de voz con Vosk
+Carga el modelo una sola vez y atiende peticiones de archivos y de streaming
+a través de un socket Unix. Los scripts del repositorio lo usan como clientes
+para no pagar la carga del modelo en cada ejecución.
+
+Uso:
+    python servidor_vosk.py [--socket /tmp/vosk.sock] [--modelo modelo_vosk_es ...]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import logging
+import hashlib
+import argparse
+import threading
+import functools
+import socketserver
+
+from lector_wav import LectorWav, FRAMES_POR_BLOQUE, adaptador_vosk
+
+logger = logging.getLogger(__name__)
+
+# Ruta del socket (se puede cambiar con la variable de entorno VOSK_SOCKET)
+RUTA_SOCKET = os.getenv("VOSK_SOCKET", "/tmp/vosk.sock")
+
+# Modelos que se cargan al iniciar el servidor
+MODELOS_PREDETERMINADOS = ["modelo_vosk_es", "vosk-model-small-es-0.42"]
+
+# Operaciones del protocolo: 1 byte de operación + 4 bytes de longitud + datos
+OP_TRANSCRIBIR = b"T"   # Transcribir un archivo WAV (datos: JSON)
+OP_INICIAR = b"H"       # Abrir una sesión de streaming (datos: JSON)
+OP_AUDIO = b"A"         # AcceptWaveform (datos: PCM 16-bit)
+OP_RESULTADO = b"R"     # Result()
+OP_PARCIAL = b"P"       # PartialResult()
+OP_FINAL = b"F"         # FinalResult()
+OP_PALABRAS = b"W"      # SetWords(datos == b"1")
+OP_ESTADO = b"S"        # Modelos cargados en el servidor
+
+CABECERA = struct.Struct(">cI")
+LONGITUD = struct.Struct(">I")
+
+
+class ErrorServidorVosk(Exception):
+    """Error devuelto por el servidor o en la comunicación con él"""
+
+
+def _recibir_exacto(sock, n):
+    """Lee exactamente n bytes del socket (None si se cerró la conexión)"""
+    buffer = bytearray(n)
+    vista = memoryview(buffer)
+    leidos = 0
+    while leidos < n:
+        recibidos = sock.recv_into(vista[leidos:], n - leidos)
+        if recibidos == 0:
+            return None
+        leidos += recibidos
+    return buffer
+
+
+def transcribir_wav(model, ruta, palabras=True, inicio=0, fin=None, frames_por_bloque=FRAMES_POR_BLOQUE):
+    """Decodifica un archivo WAV (o un rango de frames) con un modelo ya cargado.
+
+    Args:
+        model: Instancia de vosk.Model
+        ruta: Ruta al archivo WAV (mono, 16-bit, PCM)
+        palabras: Incluir marcas de tiempo por palabra (SetWords)
+        inicio: Primer frame a decodificar
+        fin: Frame final (exclusivo); None para llegar al final del archivo
+        frames_por_bloque: Frames que se pasan en cada llamada a AcceptWaveform
+
+    Returns:
+        Diccionario con el texto, los segmentos y los tiempos de decodificación.
+        Las marcas de tiempo de las palabras son relativas al inicio del archivo.
+    """
+    from vosk import KaldiRecognizer
+
+    try:
+        lector = LectorWav(ruta, frames_por_bloque)
+    except ValueError as e:
+        raise ErrorServidorVosk(str(e))
+
+    with lector:
+        frecuencia = lector.frecuencia
+        fin = lector.nframes if fin is None else min(fin, lector.nframes)
+
+        recognizer = KaldiRecognizer(model, frecuencia)
+        recognizer.SetWords(palabras)
+
+        resultados = []
+        tiempo_inicio = time.time()
+
+        # Bloques sin copia sobre el mmap del archivo
+        for data in lector.bloques_vosk(inicio, fin):
+            if recognizer.AcceptWaveform(data):
+                resultado = json.loads(recognizer.Result())
+                if resultado.get("text", "").strip():
+                    resultados.append(resultado)
+
+        resultado_final = json.loads(recognizer.FinalResult())
+        if resultado_final.get("text", "").strip():
+            resultados.append(resultado_final)
+
+        tiempo = time.time() - tiempo_inicio
+
+    # Corregir las marcas de tiempo cuando se decodifica un fragmento
+    desplazamiento = inicio / frecuencia
+    if desplazamiento:
+        for resultado in resultados:
+            for palabra in resultado.get("result", []):
+                palabra["start"] += desplazamiento
+                palabra["end"] += desplazamiento
+
+    segmentos = [r["text"] for r in resultados]
+    return {
+        "texto": " ".join(segmentos),
+        "segmentos": segmentos,
+        "resultados": resultados,
+        "frecuencia": frecuencia,
+        "duracion_audio": (fin - inicio) / frecuencia,
+        "tiempo_decodificacion": tiempo,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _identidad(ruta):
+    if not os.path.isdir(ruta):
+        return ruta
+    huella = hashlib.sha1()
+    for directorio, subdirectorios, archivos in os.walk(ruta):
+        subdirectorios.sort()
+        for nombre in sorted(archivos):
+            completa = os.path.join(directorio, nombre)
+            huella.update(f"{os.path.relpath(completa, ruta)}:{os.path.getsize(completa)}\n".encode("utf-8"))
+    return huella.hexdigest()
+
+
+def identidad_modelo(ruta):
+    """Huella de un modelo (archivos y tamaños): dos copias del mismo modelo dan la misma"""
+    return _identidad(os.path.realpath(ruta))
+
+
+class AlmacenModelos:
+    """Mantiene los modelos de Vosk cargados en memoria, uno por modelo distinto.
+
+    Dos rutas con copias del mismo modelo (misma identidad_modelo) comparten
+    la instancia cargada.
+    """
+
+    def __init__(self):
+        self._modelos = {}
+        self._tiempos_carga = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, ruta):
+        """Devuelve el modelo de la ruta, cargándolo la primera vez"""
+        from vosk import Model
+
+        ruta = os.path.realpath(ruta)
+        if not os.path.isdir(ruta):
+            raise ErrorServidorVosk(f"El modelo en {ruta} no existe")
+        clave = identidad_modelo(ruta)
+        with self._lock:
+            if clave not in self._modelos:
+                logger.info(f"Cargando modelo desde {ruta}")
+                inicio = time.time()
+                self._modelos[clave] = Model(ruta)
+                self._tiempos_carga[clave] = (ruta, time.time() - inicio)
+                logger.info(f"Modelo cargado en {self._tiempos_carga[clave][1]:.2f} segundos")
+            return self._modelos[clave]
+
+    def liberar(self, ruta):
+        """Quita del almacén el modelo de la ruta; se libera cuando no queden reconocedores que lo usen"""
+        clave = identidad_modelo(ruta)
+        with self._lock:
+            self._tiempos_carga.pop(clave, None)
+            return self._modelos.pop(clave, None) is not None
+
+    def estado(self):
+        """Modelos cargados y su tiempo de carga en segundos"""
+        with self._lock:
+            return dict(self._tiempos_carga.values())
+
+
+class ManejadorVosk(socketserver.BaseRequestHandler):
+    """Atiende una conexión: una transcripción de archivo o una sesión de streaming"""
+
+    def handle(self):
+        recognizer = None
+        adaptar = adaptador_vosk()
+        while True:
+            cabecera = _recibir_exacto(self.request, CABECERA.size)
+            if cabecera is None:
+                break
+            op, longitud = CABECERA.unpack(cabecera)
+            datos = _recibir_exacto(self.request, longitud) if longitud else b""
+            if datos is None:
+                break
+
+            try:
+                if op == OP_AUDIO:
+                    respuesta = b"1" if recognizer.AcceptWaveform(adaptar(datos)) else b"0"
+                elif op == OP_PARCIAL:
+                    respuesta = recognizer.PartialResult().encode("utf-8")
+                elif op == OP_RESULTADO:
+                    respuesta = recognizer.Result().encode("utf-8")
+                elif op == OP_FINAL:
+                    respuesta = recognizer.FinalResult().encode("utf-8")
+                elif op == OP_PALABRAS:
+                    recognizer.SetWords(bytes(datos) == b"1")
+                    respuesta = b""
+                elif op == OP_INICIAR:
+                    recognizer = self._iniciar_sesion(json.loads(datos))
+                    respuesta = b'{"ok": true}'
+                elif op == OP_TRANSCRIBIR:
+                    respuesta = self._transcribir(json.loads(datos))
+                elif op == OP_ESTADO:
+                    respuesta = json.dumps({"modelos": self.server.modelos.estado()}).encode("utf-8")
+                else:
+                    raise ErrorServidorVosk(f"Operación desconocida: {op!r}")
+            except Exception as e:
+                logger.error(f"Error atendiendo petición {op!r}: {e}")
+                respuesta = json.dumps({"error": str(e)}).encode("utf-8")
+                if recognizer is None and op != OP_TRANSCRIBIR:
+                    # Sin sesión válida no tiene sentido seguir leyendo audio
+                    self.request.sendall(LONGITUD.pack(len(respuesta)) + respuesta)
+                    break
+
+            self.request.sendall(LONGITUD.pack(len(respuesta)) + respuesta)
+
+    def _iniciar_sesion(self, peticion):
+        from vosk import KaldiRecognizer
+
+        model = self.server.modelos.obtener(peticion["modelo"])
+        if peticion.get("gramatica"):
+            # Vocabulario cerrado (lista de frases en JSON, como espera Kaldi)
+            recognizer = KaldiRecognizer(model, peticion.get("frecuencia", 16000),
+                                         json.dumps(peticion["gramatica"], ensure_ascii=False))
+        else:
+            recognizer = KaldiRecognizer(model, peticion.get("frecuencia", 16000))
+        if peticion.get("palabras"):
+            recognizer.SetWords(True)
+        return recognizer
+
+    def _transcribir(self, peticion):
+        model = self.server.modelos.obtener(peticion["modelo"])
+        resultado = transcribir_wav(model, peticion["ruta"], peticion.get("palabras", True),
+                                    frames_por_bloque=peticion.get("frames_por_bloque", FRAMES_POR_BLOQUE))
+        logger.info(
+            f"{peticion['ruta']}: {resultado['duracion_audio']:.1f}s de audio "
+            f"en {resultado['tiempo_decodificacion']:.2f}s"
+        )
+        return json.dumps(resultado).encode("utf-8")
+
+
+class ServidorVosk(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor multihilo: cada conexión tiene su reconocedor, el modelo es compartido"""
+
+    daemon_threads = True
+
+    def __init__(self, ruta_socket, modelos):
+        self.modelos = modelos
+        if os.path.exists(ruta_socket):
+            # Solo se borra un socket huérfano: si otro servidor responde, no se le quita
+            if servidor_disponible(ruta_socket):
+                raise ErrorServidorVosk(f"Ya hay un servidor Vosk escuchando en {ruta_socket}")
+            os.remove(ruta_socket)
+        super().__init__(ruta_socket, ManejadorVosk)
+
+
+# ---------------------------------------------------------------------------
+# Cliente
+# ---------------------------------------------------------------------------
+
+def _conectar(ruta_socket):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(ruta_socket)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _peticion(sock, op, datos=b""):
+    """Envía una operación y devuelve la respuesta del servidor"""
+    sock.sendall(CABECERA.pack(op, len(datos)))
+    if datos:
+        sock.sendall(datos)
+    cabecera = _recibir_exacto(sock, LONGITUD.size)
+    if cabecera is None:
+        raise ErrorServidorVosk("El servidor cerró la conexión")
+    (longitud,) = LONGITUD.unpack(cabecera)
+    respuesta = bytes(_recibir_exacto(sock, longitud)) if longitud else b""
+    if respuesta.startswith(b'{"error"'):
+        raise ErrorServidorVosk(json.loads(respuesta)["error"])
+    return respuesta
+
+
+def servidor_disponible(ruta_socket=RUTA_SOCKET):
+    """Comprueba si hay un servidor escuchando en el socket"""
+    try:
+        sock = _conectar(ruta_socket)
+    except OSError:
+        return False
+    sock.close()
+    return True
+
+
+def transcribir_archivo(ruta, modelo, palabras=True, ruta_socket=RUTA_SOCKET,
+                        frames_por_bloque=FRAMES_POR_BLOQUE):
+    """Pide al servidor que transcriba un archivo WAV.
+
+    Returns:
+        Diccionario con el mismo formato que transcribir_wav()
+    """
+    sock = _conectar(ruta_socket)
+    try:
+        peticion = {"ruta": os.path.abspath(ruta), "modelo": os.path.abspath(modelo),
+                    "palabras": palabras, "frames_por_bloque": frames_por_bloque}
+        return json.loads(_peticion(sock, OP_TRANSCRIBIR, json.dumps(peticion).encode("utf-8")))
+    finally:
+        sock.close()
+
+
+class ReconocedorRemoto:
+    """Sesión de streaming con la misma interfaz que KaldiRecognizer"""
+
+    def __init__(self, modelo, frecuencia, ruta_socket=RUTA_SOCKET, gramatica=None):
+        self._sock = _conectar(ruta_socket)
+        peticion = {"modelo": os.path.abspath(modelo), "frecuencia": frecuencia}
+        if gramatica:
+            peticion["gramatica"] = list(gramatica)
+        try:
+            _peticion(self._sock, OP_INICIAR, json.dumps(peticion).encode("utf-8"))
+        except Exception:
+            self._sock.close()
+            raise
+
+    def SetWords(self, activar):
+        _peticion(self._sock, OP_PALABRAS, b"1" if activar else b"0")
+
+    def AcceptWaveform(self, data):
+        return _peticion(self._sock, OP_AUDIO, data) == b"1"
+
+    def Result(self):
+        return _peticion(self._sock, OP_RESULTADO).decode("utf-8")
+
+    def PartialResult(self):
+        return _peticion(self._sock, OP_PARCIAL).decode("utf-8")
+
+    def FinalResult(self):
+        return _peticion(self._sock, OP_FINAL).decode("utf-8")
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Modelos cargados en este proceso cuando no hay servidor disponible
+_modelos_locales = AlmacenModelos()
+
+
+def liberar_modelo_local(modelo):
+    """Descarga un modelo cargado localmente por crear_reconocedor/transcribir (no el del servidor)"""
+    return _modelos_locales.liberar(modelo)
+
+
+def crear_reconocedor(modelo, frecuencia, ruta_socket=RUTA_SOCKET, gramatica=None):
+    """Devuelve un reconocedor del servidor, o uno local si el servidor no está activo.
+
+    gramatica es una lista de frases (más "[unk]") que limita el vocabulario
+    del reconocedor; None para dictado libre.
+    """
+    try:
+        return ReconocedorRemoto(modelo, frecuencia, ruta_socket, gramatica)
+    except OSError:
+        from vosk import KaldiRecognizer
+
+        logger.warning(f"Servidor Vosk no disponible en {ruta_socket}, cargando el modelo localmente")
+        if gramatica:
+            return KaldiRecognizer(_modelos_locales.obtener(modelo), frecuencia,
+                                   json.dumps(list(gramatica), ensure_ascii=False))
+        return KaldiRecognizer(_modelos_locales.obtener(modelo), frecuencia)
+
+
+def transcribir(ruta, modelo, palabras=True, ruta_socket=RUTA_SOCKET,
+                frames_por_bloque=FRAMES_POR_BLOQUE):
+    """Transcribe un archivo con el servidor, o localmente si el servidor no está activo"""
+    try:
+        return transcribir_archivo(ruta, modelo, palabras, ruta_socket, frames_por_bloque)
+    except OSError:
+        logger.warning(f"Servidor Vosk no disponible en {ruta_socket}, cargando el modelo localmente")
+        return transcribir_wav(_modelos_locales.obtener(modelo), ruta, palabras,
+                               frames_por_bloque=frames_por_bloque)
+
+
+def main():
+    """Función principal"""
+    # Configurar logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+    )
+
+    parser = argparse.ArgumentParser(description="Servidor local de reconocimiento de voz con Vosk")
+    parser.add_argument("--socket", default=RUTA_SOCKET, help="Ruta del socket Unix")
+    parser.add_argument("--modelo", action="append", help="Modelo a precargar (se puede repetir)")
+    args = parser.parse_args()
+
+    modelos = AlmacenModelos()
+    try:
+        servidor = ServidorVosk(args.socket, modelos)
+    except ErrorServidorVosk as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    # Los modelos se precargan una vez con el socket reservado (las conexiones esperan en cola)
+    for ruta in args.modelo or MODELOS_PREDETERMINADOS:
+        try:
+            modelos.obtener(ruta)
+        except Exception as e:
+            logger.error(f"No se pudo cargar el modelo {ruta}: {e}")
+
+    with servidor:
+        logger.info(f"Servidor Vosk escuchando en {args.socket}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServidor detenido.")
+        finally:
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Síntesis de voz con Eleven Labs
+Clase ElevenSpeech compartida por 9-1-testElevenLabs.py y el asistente.
+Separa la síntesis (petición HTTP) de la reproducción para que se puedan
+ejecutar en hilos distintos y la reproducción se pueda interrumpir.
+reproducir_stream() empieza a sonar con el primer chunk de la respuesta.
+Las frases ya sintetizadas se sirven desde la caché en disco (cache_voz.py).
+Todas las instancias comparten un cliente HTTP con keep-alive (cliente_tts.py).
+Los textos largos se sintetizan por frases en paralelo (voz_por_frases.py).
+Sin red, o para frases cortas, se usa un motor local (motores_tts.py).
+
+ELEVENLABS_BASE_URL permite apuntar a otro servidor (p. ej. servidor_eleven_falso.py).
+TTS_MOTOR elige el motor: auto (predeterminado), eleven, espeak o piper.
+"""
+
+import os
+import time
+import logging
+import numpy as np
+import sounddevice as sd
+from dotenv import load_dotenv
+
+from reproduccion_stream import ReproductorStream, FORMATO_PCM, frecuencia_de_formato
+from cache_voz import CacheVoz, clave
+from cliente_tts import obtener_cliente
+from voz_por_frases import SintesisPorFrases
+from motores_tts import MotorEleven, MotorEspeak, MotorPiper, SelectorMotores, motor_local
+
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno desde el archivo .env
+load_dotenv()
+
+# Obtener la API key de Eleven Labs desde las variables de entorno
+ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
+ELEVENLABS_BASE_URL = os.getenv('ELEVENLABS_BASE_URL')
+TTS_MOTOR = os.getenv('TTS_MOTOR', 'auto')
+
+# Voz y modelo predeterminados
+VOZ = "Rachel"
+MODELO = "eleven_multilingual_v2"
+
+
+class ElevenSpeech:
+    def __init__(self, voice=VOZ, model=MODELO, api_key=None, base_url=None, cache=True, motor=TTS_MOTOR):
+        api_key = api_key or ELEVENLABS_API_KEY
+        if motor == "eleven" and not api_key:
+            raise ValueError("No se encontró la API key de Eleven Labs. Por favor, configúrala en el archivo .env")
+
+        self.voice = voice
+        self.model = model
+        self.tts = self.client = None
+        remoto = local = None
+        if api_key and motor in ("auto", "eleven"):
+            # Cliente de Eleven Labs compartido (pool de conexiones, reintentos y métricas)
+            self.tts = obtener_cliente(api_key, base_url or ELEVENLABS_BASE_URL)
+            self.client = self.tts.client
+            remoto = MotorEleven(self.tts, voice, model, FORMATO_PCM)
+        if motor == "auto":
+            local = motor_local()
+        elif motor in ("espeak", "piper"):
+            local = MotorEspeak() if motor == "espeak" else MotorPiper()
+            if not local.disponible():
+                raise ValueError(f"El motor {motor} no está instalado")
+        if remoto is None and local is None:
+            raise ValueError("No hay API key de Eleven Labs ni motor local instalado (p. ej. espeak-ng)")
+        if remoto is None:
+            logger.info("Sin API key de Eleven Labs: se usa el motor %s", local.nombre)
+        self.selector = SelectorMotores(remoto, local)
+        self.reproductor = ReproductorStream(frecuencia_de_formato(FORMATO_PCM))
+        # cache=True usa la caché predeterminada; también se puede pasar una CacheVoz
+        self.cache = CacheVoz() if cache is True else (cache or None)
+        self.por_frases = SintesisPorFrases(self)
+
+    def elegir(self, text):
+        """Motores a intentar para text; con selector.preferir_local, si la frase ya está
+        en caché con otro motor se usa esa (sin red ni síntesis local)"""
+        candidatos = self.selector.elegir(text)
+        if self.selector.preferir_local and self.cache is not None:
+            for motor in candidatos[1:]:
+                if self.cache.contiene(clave(text, motor.voz, getattr(motor, "modelo", motor.nombre),
+                                             motor.formato)):
+                    return [motor] + [m for m in candidatos if m is not motor]
+        return candidatos
+
+    def sintetizar(self, text):
+        """Genera el audio de text y lo devuelve como (datos int16, frecuencia)"""
+        candidatos = self.elegir(text)
+        # Todos los motores dan PCM, que no hay que decodificar
+        pcm = b"".join(self.sintetizar_stream(text, candidatos))
+        return np.frombuffer(pcm, dtype=np.int16), candidatos[0].frecuencia
+
+    def sintetizar_stream(self, text, candidatos=None):
+        """Generador de chunks PCM crudo a medida que llegan del motor (o de la caché).
+
+        Args:
+            candidatos: Motores a intentar en orden (por defecto los elige el selector)
+        """
+        candidatos = candidatos or self.elegir(text)
+        motor = candidatos[0]
+        k = None
+        if self.cache is not None:
+            k = clave(text, motor.voz, getattr(motor, "modelo", motor.nombre), motor.formato)
+            chunks = self.cache.leer(k)
+            if chunks is not None:
+                return chunks
+        return self._generar_con_respaldo(text, motor, candidatos[1:], k)
+
+    def _generar_con_respaldo(self, text, motor, respaldo, k):
+        audio_stream = self.selector.generar(text, [motor])
+        if k is not None:
+            # Se guarda mientras se reproduce; solo queda en caché si llega completo
+            audio_stream = self.cache.guardar_mientras(k, audio_stream)
+        recibido = False
+        try:
+            for chunk in audio_stream:
+                recibido = True
+                yield chunk
+        except Exception:
+            # Si el motor falla antes de dar audio se usa el siguiente (sin guardarlo en caché,
+            # para volver a intentar el preferido la próxima vez)
+            respaldo = [m for m in respaldo if m.frecuencia == motor.frecuencia]
+            if recibido or not respaldo:
+                raise
+            yield from self.selector.generar(text, respaldo)
+
+    def reproducir_stream(self, text):
+        """Pide el audio en streaming y lo reproduce mientras llega.
+
+        Returns:
+            Métricas de ReproductorStream.reproducir (incluye tiempo_primer_audio)
+        """
+        inicio = time.monotonic()
+        candidatos = self.elegir(text)
+        return self.reproductor.reproducir(self.sintetizar_stream(text, candidatos), inicio,
+                                           candidatos[0].frecuencia)
+
+    def reproducir_por_frases(self, text):
+        """Como reproducir_stream, pero pide las frases en paralelo y las reproduce en orden"""
+        return self.por_frases.reproducir(text)
+
+    def reproducir(self, data, samplerate):
+        """Reproduce el audio y espera a que termine (o a que se llame a detener())"""
+        sd.play(data, samplerate)
+        sd.wait()
+
+    def detener(self):
+        """Interrumpe la reproducción en curso (se puede llamar desde otro hilo)"""
+        sd.stop()
+        self.por_frases.detener()
+
+    def gen_dub(self, text, stream=True):
+        try:
+            print("Generando audio...")
+
+            if not text.strip():
+                print("Error: El texto está vacío")
+                return
+
+            if stream:
+                # Reproducir a medida que llega el audio, frase por frase
+                metricas = self.reproducir_por_frases(text)
+                print(f"Primer audio a los {metricas['tiempo_primer_audio']:.2f}s "
+                      f"({metricas['duracion_audio']:.1f}s de audio)")
+            else:
+                data, samplerate = self.sintetizar(text)
+
+                # Reproducir el audio
+                print("Reproduciendo audio...")
+                self.reproducir(data, samplerate)
+
+            print("Audio reproducido exitosamente")
+
+        except Exception as e:
+            print(f"Error generando/reproduciendo audio: {e}")
+            import traceback
+            traceback.print_exc()
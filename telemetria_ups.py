@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Telemetría del UPS en segundo plano
+basic_checkUPS.py abre SMBus(1), hace tres lecturas bloqueantes y termina, y
+cualquier otro programa que quiera el estado de la batería tiene que repetir
+las transacciones I2C y competir por el bus. Este demonio es el único que
+habla con el UPS:
+- muestrea estado, voltaje y capacidad con la frecuencia configurada, con
+  una sola lectura de bloque de los registros 0x01-0x05 (si el adaptador no
+  la admite, o la primera lectura de bloque no coincide con las lecturas
+  por registro, vuelve a las tres lecturas de basic_checkUPS.py)
+- publica cada muestra con su marca de tiempo en un anillo de memoria
+  compartida; LectorTelemetria lo lee desde otros procesos sin tráfico I2C
+- SMBusFalso simula el UPS (descarga, carga) para probar sin hardware
+
+Uso:
+    python telemetria_ups.py [--intervalo 1.0] [--bus 1] [--falso] [--mostrar]
+    python telemetria_ups.py --leer [--seguir]          (lee el anillo, sin I2C)
+"""
+
+import os
+import sys
+import time
+import errno
+import fcntl
+import signal
+import struct
+import argparse
+import tempfile
+import threading
+from multiprocessing import shared_memory
+
+UPS_ADDRESS = 0x36          # Dirección I2C típica para UPS X1203 (ver basic_checkUPS.py)
+STATUS_REG = 0x01
+VOLTAGE_REG = 0x02
+CAPACITY_REG = 0x04
+BUS_I2C = 1                 # 1 es el bus I2C en Pi 2 o superior, 0 para Pi 1
+INTERVALO = 1.0             # Segundos entre muestras
+NOMBRE_ANILLO = "ups_telemetria"
+CAPACIDAD_ANILLO = 3600     # Muestras que conserva el anillo (una hora a 1 Hz)
+
+# Cabecera: firma, capacidad, tamaño de registro, intervalo en ms, última secuencia escrita
+_CABECERA = struct.Struct("<4sIIIQ")
+# Registro: secuencia, instante_ns (CLOCK_MONOTONIC), hora (time.time), voltaje, capacidad,
+# estado, banderas
+_REGISTRO = struct.Struct("<QqdddBB6x")
+_SECUENCIA = struct.Struct("<Q")
+_FIRMA = b"UPS1"
+_BANDERA_BLOQUE = 0x01      # La muestra se leyó con una sola transacción
+# Errores de read_i2c_block_data tras los que se pasa a leer registro a registro
+_ERRORES_BLOQUE = (errno.EOPNOTSUPP, errno.EINVAL, errno.EIO, errno.EREMOTEIO)
+TOLERANCIA_VOLTAJE = 0.05   # V de diferencia admitidos al verificar la lectura de bloque
+TOLERANCIA_CAPACIDAD = 1.0  # Puntos de % de diferencia admitidos al verificar
+
+
+def convertir_voltaje(dato):
+    """Palabra del registro de voltaje a voltios (mismo factor que basic_checkUPS.py)"""
+    return dato * 1.25 / 1000.0
+
+
+def convertir_capacidad(dato):
+    """Palabra del registro de capacidad a porcentaje"""
+    return dato / 256.0
+
+
+def _muestra(secuencia, instante_ns, hora, voltaje, capacidad, estado, banderas):
+    return {"secuencia": secuencia, "instante_ns": instante_ns, "hora": hora, "voltaje": voltaje,
+            "capacidad": capacidad, "estado": estado, "cargando": bool(estado & 0x01),
+            "bloque": bool(banderas & _BANDERA_BLOQUE)}
+
+
+# ---------------------------------------------------------------------------
+# Anillo en memoria compartida
+# ---------------------------------------------------------------------------
+
+def _abrir_memoria(nombre):
+    try:
+        return shared_memory.SharedMemory(nombre, track=False)
+    except TypeError:
+        # Antes de Python 3.13 el resource_tracker borraría la memoria al salir el lector
+        from multiprocessing import resource_tracker
+        memoria = shared_memory.SharedMemory(nombre)
+        resource_tracker.unregister(memoria._name, "shared_memory")
+        return memoria
+
+
+class AnilloTelemetria:
+    """Anillo de muestras en memoria compartida (un escritor, muchos lectores).
+
+    Cada registro lleva su número de secuencia: el escritor lo pone a 0,
+    escribe los datos y después la secuencia, y al final la de la cabecera.
+    El lector comprueba la secuencia del registro antes y después de
+    copiarlo, así nunca devuelve una muestra a medio escribir.
+    """
+
+    def __init__(self, memoria, creador=False, bloqueo=None):
+        self._memoria = memoria
+        self._bloqueo = bloqueo
+        self._buffer = memoria.buf
+        self._creador = creador
+        firma, self.capacidad, tamano, self.intervalo_ms, _ = _CABECERA.unpack_from(self._buffer, 0)
+        if firma != _FIRMA or tamano != _REGISTRO.size:
+            raise ValueError(f"La memoria compartida {memoria.name} no es un anillo de telemetría")
+
+    @staticmethod
+    def _bloquear(nombre):
+        """Toma el cerrojo del anillo (flock, se suelta solo si el demonio muere)"""
+        ruta = os.path.join(tempfile.gettempdir(), f"{nombre}.lock")
+        fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            with open(ruta, encoding="ascii", errors="replace") as f:
+                pid = f.read().strip() or "?"
+            os.close(fd)
+            raise RuntimeError(f"Ya hay un demonio de telemetría (PID {pid}) publicando en {nombre}")
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode("ascii"))
+        return fd
+
+    @classmethod
+    def crear(cls, nombre=NOMBRE_ANILLO, capacidad=CAPACIDAD_ANILLO, intervalo=INTERVALO):
+        """Crea el anillo del demonio (RuntimeError si otro demonio vivo ya lo tiene)"""
+        bloqueo = cls._bloquear(nombre)
+        tamano = _CABECERA.size + capacidad * _REGISTRO.size
+        try:
+            try:
+                memoria = shared_memory.SharedMemory(nombre, create=True, size=tamano)
+            except FileExistsError:
+                # Con el cerrojo tomado, son restos de un demonio que no terminó bien
+                anterior = shared_memory.SharedMemory(nombre)
+                anterior.close()
+                anterior.unlink()
+                memoria = shared_memory.SharedMemory(nombre, create=True, size=tamano)
+        except Exception:
+            os.close(bloqueo)
+            raise
+        _CABECERA.pack_into(memoria.buf, 0, _FIRMA, capacidad, _REGISTRO.size, int(intervalo * 1000), 0)
+        return cls(memoria, creador=True, bloqueo=bloqueo)
+
+    @classmethod
+    def abrir(cls, nombre=NOMBRE_ANILLO):
+        """Abre el anillo de un demonio en marcha (FileNotFoundError si no hay)"""
+        return cls(_abrir_memoria(nombre))
+
+    @property
+    def secuencia(self):
+        """Secuencia de la última muestra publicada (0 si aún no hay ninguna)"""
+        return _SECUENCIA.unpack_from(self._buffer, _CABECERA.size - _SECUENCIA.size)[0]
+
+    def _posicion(self, secuencia):
+        return _CABECERA.size + (secuencia % self.capacidad) * _REGISTRO.size
+
+    def publicar(self, instante_ns, hora, voltaje, capacidad, estado, banderas=0):
+        secuencia = self.secuencia + 1
+        posicion = self._posicion(secuencia)
+        _SECUENCIA.pack_into(self._buffer, posicion, 0)
+        _REGISTRO.pack_into(self._buffer, posicion, 0, instante_ns, hora, voltaje, capacidad, estado, banderas)
+        _SECUENCIA.pack_into(self._buffer, posicion, secuencia)
+        _SECUENCIA.pack_into(self._buffer, _CABECERA.size - _SECUENCIA.size, secuencia)
+        return secuencia
+
+    def leer(self, secuencia):
+        """Muestra con esa secuencia, o None si ya se sobrescribió o se está escribiendo"""
+        posicion = self._posicion(secuencia)
+        datos = _REGISTRO.unpack_from(self._buffer, posicion)
+        if datos[0] != secuencia or _SECUENCIA.unpack_from(self._buffer, posicion)[0] != secuencia:
+            return None
+        return _muestra(*datos)
+
+    def ultima(self):
+        """Última muestra publicada, con su edad en segundos, o None"""
+        for _ in range(3):
+            secuencia = self.secuencia
+            if not secuencia:
+                return None
+            muestra = self.leer(secuencia)
+            if muestra is not None:
+                muestra["edad"] = (time.monotonic_ns() - muestra["instante_ns"]) / 1e9
+                return muestra
+        return None
+
+    def desde(self, secuencia):
+        """Muestras posteriores a secuencia que siguen en el anillo, de la más antigua a la más nueva"""
+        ultima = self.secuencia
+        inicio = max(secuencia + 1, ultima - self.capacidad + 1, 1)
+        return [m for m in (self.leer(s) for s in range(inicio, ultima + 1)) if m is not None]
+
+    def cerrar(self):
+        self._buffer = None
+        self._memoria.close()
+        if self._creador:
+            self._memoria.unlink()
+        if self._bloqueo is not None:
+            os.close(self._bloqueo)
+            self._bloqueo = None
+
+
+class LectorTelemetria(AnilloTelemetria):
+    """Acceso de solo lectura al anillo del demonio (sin transacciones I2C)"""
+
+    def __init__(self, nombre=NOMBRE_ANILLO):
+        super().__init__(_abrir_memoria(nombre))
+
+    def publicar(self, *args, **kwargs):
+        raise TypeError("LectorTelemetria es de solo lectura")
+
+    def seguir(self, intervalo=None, detener=None):
+        """Generador de las muestras nuevas a medida que el demonio las publica"""
+        intervalo = intervalo or max(0.01, self.intervalo_ms / 2000)
+        detener = detener or threading.Event()
+        secuencia = self.secuencia
+        while not detener.is_set():
+            for muestra in self.desde(secuencia):
+                secuencia = muestra["secuencia"]
+                yield muestra
+            detener.wait(intervalo)
+
+
+# ---------------------------------------------------------------------------
+# Muestreo
+# ---------------------------------------------------------------------------
+
+class MuestreadorUPS:
+    """Lee el UPS a intervalos fijos y publica las muestras.
+
+    Args:
+        bus: smbus2.SMBus (o SMBusFalso)
+        anillo: AnilloTelemetria donde publicar (opcional)
+        intervalo: Segundos entre muestras
+        usar_bloque: Intentar leer los registros con una sola transacción
+    """
+
+    def __init__(self, bus, anillo=None, intervalo=INTERVALO, direccion=UPS_ADDRESS, usar_bloque=True):
+        self.bus = bus
+        self.anillo = anillo
+        self.intervalo = intervalo
+        self.direccion = direccion
+        self.usar_bloque = usar_bloque
+        self._bloque_verificado = False
+        self._suscriptores = []
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.muestras = 0
+        self.errores = 0
+        self.transacciones = 0
+        self.atrasos = 0
+        self.tiempo_lectura = 0.0
+
+    def suscribir(self, callback):
+        """Registra callback(muestra) en el proceso del demonio; devuelve la función que cancela"""
+        with self._lock:
+            self._suscriptores.append(callback)
+
+        def cancelar():
+            with self._lock:
+                if callback in self._suscriptores:
+                    self._suscriptores.remove(callback)
+        return cancelar
+
+    def _leer_bloque(self):
+        # Estado (0x01), voltaje (0x02-0x03) y capacidad (0x04-0x05) de una vez; supone
+        # que el dispositivo avanza el registro byte a byte
+        datos = self.bus.read_i2c_block_data(self.direccion, STATUS_REG, 5)
+        self.transacciones += 1
+        return (convertir_voltaje(datos[1] | datos[2] << 8),
+                convertir_capacidad(datos[3] | datos[4] << 8), datos[0], _BANDERA_BLOQUE)
+
+    def _verificar_bloque(self, bloque):
+        """Compara la primera lectura de bloque con las lecturas por registro"""
+        por_registro = self._leer_registros()
+        self._bloque_verificado = True
+        coincide = (bloque[2] == por_registro[2]
+                    and abs(bloque[0] - por_registro[0]) <= TOLERANCIA_VOLTAJE
+                    and abs(bloque[1] - por_registro[1]) <= TOLERANCIA_CAPACIDAD)
+        if not coincide:
+            print(f"La lectura de bloque ({bloque[0]:.2f}V, {bloque[1]:.1f}%, estado {bloque[2]:#04x}) no "
+                  f"coincide con la de registros ({por_registro[0]:.2f}V, {por_registro[1]:.1f}%, "
+                  f"estado {por_registro[2]:#04x}): se usan lecturas por registro")
+            self.usar_bloque = False
+            return por_registro
+        return bloque
+
+    def leer(self):
+        """Una muestra del UPS: (voltaje, capacidad, estado, banderas)"""
+        if self.usar_bloque:
+            try:
+                muestra = self._leer_bloque()
+            except OSError as e:
+                if e.errno not in _ERRORES_BLOQUE:
+                    raise
+                print(f"La lectura de bloque falló ({e}): se usan lecturas por registro")
+                self.usar_bloque = False
+            else:
+                return muestra if self._bloque_verificado else self._verificar_bloque(muestra)
+        return self._leer_registros()
+
+    def _leer_registros(self):
+        voltaje = convertir_voltaje(self.bus.read_word_data(self.direccion, VOLTAGE_REG))
+        capacidad = convertir_capacidad(self.bus.read_word_data(self.direccion, CAPACITY_REG))
+        estado = self.bus.read_byte_data(self.direccion, STATUS_REG)
+        self.transacciones += 3
+        return voltaje, capacidad, estado, 0
+
+    def muestrear(self):
+        """Lee y publica una muestra; devuelve el diccionario o None si la lectura falló"""
+        inicio = time.perf_counter()
+        try:
+            voltaje, capacidad, estado, banderas = self.leer()
+        except OSError as e:
+            self.errores += 1
+            if self.errores == 1 or self.errores % 60 == 0:
+                print(f"Error al leer el UPS ({self.errores} errores): {e}")
+            return None
+        self.tiempo_lectura += time.perf_counter() - inicio
+        self.muestras += 1
+        instante, hora = time.monotonic_ns(), time.time()
+        secuencia = self.muestras
+        if self.anillo is not None:
+            secuencia = self.anillo.publicar(instante, hora, voltaje, capacidad, estado, banderas)
+        muestra = _muestra(secuencia, instante, hora, voltaje, capacidad, estado, banderas)
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for callback in suscriptores:
+            callback(muestra)
+        return muestra
+
+    def ejecutar(self, detener=None):
+        """Bucle de muestreo con plazos absolutos (no acumula deriva)"""
+        detener = detener or threading.Event()
+        plazo = time.monotonic()
+        while not detener.is_set():
+            self.muestrear()
+            plazo += self.intervalo
+            restante = plazo - time.monotonic()
+            if restante < 0:
+                # La lectura tardó más que el intervalo: seguir desde ahora
+                self.atrasos += 1
+                plazo = time.monotonic()
+                continue
+            detener.wait(restante)
+
+    def estadisticas(self):
+        return {
+            "muestras": self.muestras,
+            "errores": self.errores,
+            "transacciones_i2c": self.transacciones,
+            "transacciones_por_muestra": self.transacciones / self.muestras if self.muestras else 0.0,
+            "tiempo_medio_lectura": self.tiempo_lectura / self.muestras if self.muestras else 0.0,
+            "atrasos": self.atrasos,
+            "lectura_bloque": self.usar_bloque,
+        }
+
+
+# ---------------------------------------------------------------------------
+# UPS simulado
+# ---------------------------------------------------------------------------
+
+class SMBusFalso:
+    """Sustituto de smbus2.SMBus con un UPS que se descarga (o se carga) con el tiempo.
+
+    Args:
+        capacidad: Porcentaje inicial
+        descarga_por_hora: Puntos de porcentaje por hora (negativo: cargando)
+        soporta_bloque: Si False, read_i2c_block_data falla como en adaptadores sin I2C_RDWR
+        retardo: Segundos que tarda cada transacción (100 kHz ~ 0.5 ms por palabra)
+        autoincremento: Si False, la lectura de bloque repite el primer registro en lugar
+            de avanzar (dispositivos sin autoincremento)
+    """
+
+    def __init__(self, capacidad=100.0, descarga_por_hora=20.0, soporta_bloque=True, retardo=0.0005,
+                 autoincremento=True):
+        self.soporta_bloque = soporta_bloque
+        self.autoincremento = autoincremento
+        self.retardo = retardo
+        self.transacciones = 0
+        self._lock = threading.Lock()
+        self.fijar(capacidad, descarga_por_hora)
+
+    def fijar(self, capacidad=None, descarga_por_hora=None):
+        """Cambia la capacidad actual y/o el ritmo de descarga"""
+        with self._lock:
+            if capacidad is None:
+                capacidad = self.capacidad()
+            self._capacidad_inicial = capacidad
+            self._inicio = time.monotonic()
+            if descarga_por_hora is not None:
+                self.descarga_por_hora = descarga_por_hora
+
+    def capacidad(self):
+        horas = (time.monotonic() - self._inicio) / 3600
+        return min(100.0, max(0.0, self._capacidad_inicial - self.descarga_por_hora * horas))
+
+    def _registros(self):
+        capacidad = self.capacidad()
+        voltaje = 3.0 + 1.2 * capacidad / 100         # Celda de litio: 3.0 V vacía, 4.2 V llena
+        v = int(voltaje * 1000 / 1.25)
+        c = int(capacidad * 256)
+        estado = 0x01 if self.descarga_por_hora < 0 else 0x00
+        return bytes([0, estado, v & 0xFF, v >> 8, c & 0xFF, c >> 8, 0, 0])
+
+    def _transaccion(self, direccion):
+        if direccion != UPS_ADDRESS:
+            raise OSError(errno.ENXIO, "No such device or address")
+        self.transacciones += 1
+        if self.retardo:
+            time.sleep(self.retardo)
+
+    def read_byte_data(self, direccion, registro):
+        self._transaccion(direccion)
+        return self._registros()[registro]
+
+    def read_word_data(self, direccion, registro):
+        self._transaccion(direccion)
+        registros = self._registros()
+        return registros[registro] | registros[registro + 1] << 8
+
+    def read_i2c_block_data(self, direccion, registro, longitud):
+        if not self.soporta_bloque:
+            raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+        self._transaccion(direccion)
+        if not self.autoincremento:
+            return [self._registros()[registro]] * longitud
+        return list(self._registros()[registro:registro + longitud])
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _imprimir(muestra):
+    print(f"#{muestra['secuencia']}: {muestra['voltaje']:.2f}V, {muestra['capacidad']:.1f}%, "
+          f"{'cargando' if muestra['cargando'] else 'descargando o inactivo'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Demonio de telemetría del UPS (anillo en memoria compartida)")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO, help="Segundos entre muestras")
+    parser.add_argument("--bus", type=int, default=BUS_I2C, help="Número del bus I2C")
+    parser.add_argument("--anillo", default=NOMBRE_ANILLO, help="Nombre de la memoria compartida")
+    parser.add_argument("--capacidad-anillo", type=int, default=CAPACIDAD_ANILLO)
+    parser.add_argument("--falso", action="store_true", help="Simular el UPS con SMBusFalso")
+    parser.add_argument("--sin-bloque", action="store_true", help="Leer registro a registro")
+    parser.add_argument("--mostrar", action="store_true", help="Imprimir cada muestra")
+    parser.add_argument("--leer", action="store_true", help="Leer la última muestra del anillo y salir")
+    parser.add_argument("--seguir", action="store_true", help="Con --leer, imprimir las muestras nuevas")
+    args = parser.parse_args()
+
+    if args.leer:
+        try:
+            lector = LectorTelemetria(args.anillo)
+        except FileNotFoundError:
+            print(f"No hay un demonio de telemetría publicando en {args.anillo}")
+            return
+        try:
+            muestra = lector.ultima()
+            if muestra is None:
+                print("El anillo todavía no tiene muestras")
+            else:
+                _imprimir(muestra)
+                print(f"Edad de la muestra: {muestra['edad']:.2f}s")
+            if args.seguir:
+                for muestra in lector.seguir():
+                    _imprimir(muestra)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            lector.cerrar()
+        return
+
+    if args.falso:
+        bus = SMBusFalso(descarga_por_hora=3600.0)     # 1 % por segundo, para verlo cambiar
+    else:
+        from smbus2 import SMBus
+        bus = SMBus(args.bus)
+    try:
+        anillo = AnilloTelemetria.crear(args.anillo, args.capacidad_anillo, args.intervalo)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        bus.close()
+        sys.exit(1)
+    muestreador = MuestreadorUPS(bus, anillo, args.intervalo, usar_bloque=not args.sin_bloque)
+    if args.mostrar:
+        muestreador.suscribir(_imprimir)
+
+    # Como demonio (systemd) se detiene con SIGTERM: terminar igual que con Ctrl+C
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+
+    print(f"Muestreando el UPS cada {args.intervalo}s en /dev/shm/{args.anillo} (Ctrl+C para salir)")
+    try:
+        muestreador.ejecutar(detener)
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        anillo.cerrar()
+        bus.close()
+        for nombre, valor in muestreador.estadisticas().items():
+            print(f"  {nombre}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
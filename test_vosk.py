@@ -2,10 +2,10 @@
 
 import os
 import sys
-import json
-import wave
-import pyaudio
-from vosk import Model, KaldiRecognizer
+from servidor_vosk import crear_reconocedor
+from detector_voz import DetectorVoz
+from calibracion_ruido import obtener_perfil
+from captura_audio import CapturaMicrofono
 
 # Verificar si se proporciona la ruta del modelo
 if len(sys.argv) > 1:
@@ -19,42 +19,52 @@ if not os.path.exists(model_path):
     print("Ejecute primero la opción de descargar el modelo o especifique la ruta correcta.")
     sys.exit(1)
 
-# Cargar modelo
-print(f"Cargando modelo desde {model_path}...")
-model = Model(model_path)
-print("Modelo cargado.")
-
 # Configuración de audio
 FRAME_RATE = 16000
 CHUNK_SIZE = 8000
+# Con CHUNK_ADAPTATIVO=1 el tamaño de bloque se ajusta en vivo: pequeño con voz, grande en silencio
+CHUNK_ADAPTATIVO = os.getenv("CHUNK_ADAPTATIVO", "0") == "1"
+
+# Detector de voz: los bloques en silencio no se envían al reconocedor
+UMBRAL_VAD_DB = float(os.getenv("VAD_UMBRAL_DB", "8.0"))  # dB sobre el piso de ruido
+ARCHIVO_RUIDO = "ruido.wav"  # Muestra de ruido para la primera calibración (luego se usa el perfil guardado)
+
+# Inicializar reconocedor (sesión en el servidor Vosk, o modelo local si no está activo)
+rec = crear_reconocedor(model_path, FRAME_RATE)
 
-# Inicializar reconocedor
-rec = KaldiRecognizer(model, FRAME_RATE)
+# Inicializar detector de voz
+vad = DetectorVoz(FRAME_RATE, umbral_db=UMBRAL_VAD_DB)
+filtro = vad.filtrar
+perfil = obtener_perfil(archivo_ruido=ARCHIVO_RUIDO)
+if perfil is not None:
+    # El piso guardado se sigue refinando con los silencios de esta sesión
+    filtro = perfil.filtro(vad)
+    print(f"Piso de ruido del perfil guardado ({perfil.fuente}): {perfil.piso_db:.1f} dB")
 
-# Inicializar PyAudio
-p = pyaudio.PyAudio()
-stream = p.open(format=pyaudio.paInt16, channels=1, rate=FRAME_RATE, input=True, frames_per_buffer=CHUNK_SIZE)
+# Captura en modo callback: el micrófono escribe en un buffer circular y un
+# hilo aparte decodifica, así un AcceptWaveform lento no pierde audio
+captura = CapturaMicrofono(rec, FRAME_RATE, CHUNK_SIZE, filtro=filtro, adaptativo=CHUNK_ADAPTATIVO)
 
 print("Escuchando... (Habla en español, presiona Ctrl+C para salir)")
 
 try:
-    while True:
-        data = stream.read(CHUNK_SIZE)
-        if len(data) == 0:
-            break
-            
-        if rec.AcceptWaveform(data):
-            result = json.loads(rec.Result())
-            if result['text']:
-                print(f"Reconocido: {result['text']}")
-        else:
-            partial = json.loads(rec.PartialResult())
-            if partial['partial']:
-                print(f"Parcial: {partial['partial']}", end='\r')
+    captura.iniciar()
+    while not captura.esperar(1.0):
+        pass
 except KeyboardInterrupt:
     print("\nSaliendo...")
 finally:
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
+    captura.detener()
+    metricas = captura.metricas()
+    print(f"Desbordes: entrada {metricas['desbordes_entrada']}, buffer {metricas['desbordes_buffer']}")
+    print(f"Latencia de decodificación: media {metricas['latencia_media']:.3f}s, "
+          f"máxima {metricas['latencia_maxima']:.3f}s")
+    print(f"Audio omitido por el detector de voz: {vad.fraccion_omitida * 100:.1f}%")
+    if captura.tamano is not None:
+        tamanos = captura.tamano.estadisticas()
+        print(f"Bloques por tamaño (s): {tamanos['bloques']}, cambios: {tamanos['cambios']}")
+        print(f"Latencia con voz: media {tamanos['latencia_media_voz']:.3f}s, "
+              f"máxima {tamanos['latencia_maxima_voz']:.3f}s")
+    if perfil is not None:
+        perfil.guardar()
     print("Reconocimiento de voz finalizado.")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Síntesis por frases en paralelo para respuestas largas
+Divide el texto en frases, las pide a la API en paralelo (frase N+1 mientras
+suena la N) y las reproduce en orden por un único stream de salida, sin
+huecos entre frases. La espera percibida pasa a ser lo que tarda en llegar
+el primer chunk de la primera frase, no la síntesis del texto completo.
+
+Uso:
+    python voz_por_frases.py "texto largo..." [--paralelo 2] [--servidor-falso]
+"""
+
+import re
+import sys
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PARALELO = 2                # Frases que se sintetizan a la vez
+MIN_CARACTERES = 20         # Las frases más cortas se juntan con la siguiente
+
+_FIN = object()             # Marca de fin de frase en las colas
+
+
+def dividir_frases(texto, min_caracteres=MIN_CARACTERES):
+    """Divide texto en frases por la puntuación final, juntando las muy cortas"""
+    partes = [p.strip() for p in re.split(r"(?<=[.!?…;:])\s+|\n+", texto) if p.strip()]
+    frases = []
+    for parte in partes:
+        if frases and len(frases[-1]) < min_caracteres:
+            frases[-1] += " " + parte
+        else:
+            frases.append(parte)
+    if len(frases) > 1 and len(frases[-1]) < min_caracteres:
+        ultima = frases.pop()
+        frases[-1] += " " + ultima
+    return frases
+
+
+class SintesisPorFrases:
+    """Canal de frases sintetizadas en paralelo hacia un reproductor en orden.
+
+    Args:
+        speech: ElevenSpeech (se usan sintetizar_stream y su reproductor)
+        paralelo: Frases que se descargan a la vez
+    """
+
+    def __init__(self, speech, paralelo=PARALELO):
+        self.speech = speech
+        self.paralelo = paralelo
+        # Evento de parada de la reproducción en curso: cada llamada tiene el suyo,
+        # así las descargas de una respuesta interrumpida no siguen con la siguiente
+        self._detenido = threading.Event()
+
+    def _descargar(self, frase, candidatos, cola, tiempos, i, detenido):
+        inicio = time.monotonic()
+        try:
+            if detenido.is_set():
+                return
+            for chunk in self.speech.sintetizar_stream(frase, candidatos):
+                if detenido.is_set():
+                    return
+                cola.put(chunk)
+            tiempos[i] = time.monotonic() - inicio
+        except Exception as e:
+            cola.put(e)
+        finally:
+            cola.put(_FIN)
+
+    def _chunks_en_orden(self, colas, esperas):
+        for i, cola in enumerate(colas):
+            primero = True
+            inicio = time.monotonic()
+            while True:
+                item = cola.get()
+                if item is _FIN:
+                    break
+                if isinstance(item, Exception):
+                    # Se salta la frase que falló y sigue con las demás
+                    print(f"Error sintetizando la frase {i + 1}: {item}")
+                    continue
+                if primero and i > 0:
+                    # Tiempo que el reproductor esperó a la frase (hueco si > buffer de salida)
+                    esperas.append(time.monotonic() - inicio)
+                primero = False
+                yield item
+
+    def reproducir(self, texto):
+        """Sintetiza y reproduce texto frase por frase.
+
+        Returns:
+            Métricas de ReproductorStream.reproducir más el número de frases,
+            el tiempo de síntesis de cada una y la espera máxima entre frases
+        """
+        inicio = time.monotonic()
+        detenido = self._detenido = threading.Event()
+        frases = dividir_frases(texto)
+        colas = [queue.Queue() for _ in frases]
+        tiempos = [None] * len(frases)
+        esperas = []
+        # El motor se elige una vez para todo el texto (con la caché primero si se prefiere local):
+        # el stream de salida tiene una sola frecuencia
+        candidatos = self.speech.elegir(texto)
+
+        executor = ThreadPoolExecutor(self.paralelo, thread_name_prefix="frase")
+        try:
+            # El executor atiende las frases en orden: las siguientes se piden mientras suena la actual
+            for i, (frase, cola) in enumerate(zip(frases, colas)):
+                executor.submit(self._descargar, frase, candidatos, cola, tiempos, i, detenido)
+            metricas = self.speech.reproductor.reproducir(self._chunks_en_orden(colas, esperas), inicio,
+                                                          candidatos[0].frecuencia)
+        finally:
+            detenido.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        metricas.update({
+            "motor": candidatos[0].nombre,
+            "frases": len(frases),
+            "tiempos_frase": tiempos,
+            "espera_maxima_entre_frases": max(esperas, default=0.0),
+        })
+        return metricas
+
+    def detener(self):
+        """Interrumpe la reproducción y las descargas pendientes"""
+        self._detenido.set()
+        self.speech.reproductor.detener()
+
+
+def main():
+    from sintesis_voz import ElevenSpeech
+
+    parser = argparse.ArgumentParser(description="Reproduce un texto largo sintetizando por frases")
+    parser.add_argument("texto", nargs="?", default=(
+        "Hola, soy el asistente. Esta es una respuesta larga para probar la síntesis por frases. "
+        "Mientras escuchas esta frase, la siguiente ya se está descargando. "
+        "Así no hay que esperar a que se sintetice todo el texto."))
+    parser.add_argument("--paralelo", type=int, default=PARALELO, help="Frases sintetizadas a la vez")
+    parser.add_argument("--servidor-falso", action="store_true",
+                        help="Usar un servidor local que imita la API (sin red ni API key)")
+    args = parser.parse_args()
+
+    servidor = None
+    if args.servidor_falso:
+        from servidor_eleven_falso import ServidorElevenFalso
+        servidor = ServidorElevenFalso(puerto=0)
+        servidor.iniciar_en_hilo()
+        speech = ElevenSpeech(api_key="falsa", base_url=servidor.url, cache=False)
+    else:
+        speech = ElevenSpeech(cache=False)
+
+    try:
+        inicio = time.monotonic()
+        speech.sintetizar(args.texto)
+        print(f"Texto completo en una petición: {time.monotonic() - inicio:.2f}s hasta poder reproducir")
+
+        metricas = SintesisPorFrases(speech, args.paralelo).reproducir(args.texto)
+        print(f"Por frases ({metricas['frases']}): primer audio a los {metricas['tiempo_primer_audio']:.2f}s, "
+              f"espera máxima entre frases {metricas['espera_maxima_entre_frases']:.3f}s, "
+              f"audio {metricas['duracion_audio']:.1f}s en {metricas['tiempo_total']:.1f}s")
+    except KeyboardInterrupt:
+        speech.detener()
+        print("\nReproducción interrumpida.")
+        sys.exit(0)
+    finally:
+        if servidor:
+            servidor.shutdown()
+            servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()